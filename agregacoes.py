@@ -0,0 +1,80 @@
+"""
+Agregações em fluxo sobre blocos tipados de lançamentos (esquema.py).
+
+As funções recebem qualquer iterável de DataFrames no esquema tipado — os blocos de
+Armazenamento.ler_em_blocos(), lidos do disco sob demanda, ou uma lista com o
+DataFrame do livro-caixa — e acumulam só os totais, em centavos. A memória usada fica
+limitada ao tamanho de um bloco, independentemente do tamanho do histórico.
+"""
+import pandas as pd
+
+from esquema import em_reais
+
+
+def filtrar_periodo(blocos, inicio=None, fim=None):
+    """Gera os blocos só com as linhas entre os dias inicio e fim (inclusivos; None = sem limite)"""
+    inicio = pd.Timestamp(inicio).normalize() if inicio is not None else None
+    fim = pd.Timestamp(fim).normalize() + pd.Timedelta(days=1) if fim is not None else None
+    for bloco in blocos:
+        if inicio is not None:
+            bloco = bloco[bloco['Data'] >= inicio]
+        if fim is not None:
+            bloco = bloco[bloco['Data'] < fim]
+        if not bloco.empty:
+            yield bloco
+
+
+def _somar_por(bloco, coluna):
+    """Soma de Valor (centavos) por valor da coluna, com índice de textos"""
+    somas = bloco.groupby(coluna, observed=True)['Valor'].sum()
+    somas.index = somas.index.astype(object)
+    return somas
+
+
+def _acumular(acumulado, somas):
+    return somas if acumulado is None else acumulado.add(somas, fill_value=0)
+
+
+def _em_reais_ordenado(somas):
+    if somas is None:
+        return pd.Series(dtype='float64')
+    return em_reais(somas.astype('int64')).sort_values(ascending=False)
+
+
+def totais_por_tipo(blocos, inicio=None, fim=None):
+    """Soma de Valor (em reais) por Tipo entre os dias inicio e fim"""
+    acumulado = None
+    for bloco in filtrar_periodo(blocos, inicio, fim):
+        acumulado = _acumular(acumulado, _somar_por(bloco, 'Tipo'))
+    if acumulado is None:
+        return {}
+    return {tipo: em_reais(int(total)) for tipo, total in acumulado.items()}
+
+
+def resumo(blocos):
+    """Totais da aba Resumo: receitas, despesas, por Categoria de cada Tipo e por Método.
+
+    Retorna um dicionário com 'receitas' e 'despesas' (reais) e as séries
+    'despesas_por_categoria', 'receitas_por_categoria' e 'por_metodo' (reais, em
+    ordem decrescente).
+    """
+    despesas_categoria = receitas_categoria = por_metodo = None
+    receitas = despesas = 0
+    for bloco in blocos:
+        if bloco.empty:
+            continue
+        bloco_despesas = bloco[bloco['Tipo'] == 'Despesa']
+        bloco_receitas = bloco[bloco['Tipo'] == 'Receita']
+        despesas += int(bloco_despesas['Valor'].sum())
+        receitas += int(bloco_receitas['Valor'].sum())
+        despesas_categoria = _acumular(despesas_categoria, _somar_por(bloco_despesas, 'Categoria'))
+        receitas_categoria = _acumular(receitas_categoria, _somar_por(bloco_receitas, 'Categoria'))
+        por_metodo = _acumular(por_metodo, _somar_por(bloco, 'Método'))
+
+    return {
+        'receitas': em_reais(receitas),
+        'despesas': em_reais(despesas),
+        'despesas_por_categoria': _em_reais_ordenado(despesas_categoria),
+        'receitas_por_categoria': _em_reais_ordenado(receitas_categoria),
+        'por_metodo': _em_reais_ordenado(por_metodo),
+    }
@@ -1,11 +1,18 @@
+import logging
 import streamlit as st
 import pandas as pd
-import openpyxl
-from openpyxl.utils.dataframe import dataframe_to_rows
 from datetime import datetime
-import os
+import time
 import warnings
-from openpyxl import Workbook
+from contextlib import contextmanager
+import armazenamento
+import importacao
+import log_estruturado
+import metricas
+from esquema import em_reais
+
+# Início do rerun (o script inteiro é reexecutado a cada interação)
+inicio_rerun = time.perf_counter()
 
 # Ignorar avisos do openpyxl
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
@@ -18,48 +25,53 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Caminho do arquivo Excel
-ARQUIVO_EXCEL = "planilha_financeira.xlsx"
+# Paginação do Histórico de Lançamentos
+TAMANHOS_PAGINA = [25, 50, 100, 250, 500]
+ORDEM_LANCAMENTO = "Ordem de lançamento"
+
+# Tempo de cada rerun e de cada seção da página (registro único no processo)
+DURACAO_RERUN = metricas.histograma('app_rerun_duracao_segundos', "Duração total de um rerun do app")
+DURACAO_SECOES = metricas.histograma('app_secao_duracao_segundos', "Duração de cada seção da página por rerun")
+metricas.iniciar_servidor('app')
+
+# Registros estruturados do app (log_estruturado.py; configurado uma vez por processo)
+log_estruturado.configurar('app')
+LOGGER = logging.getLogger('app')
 
-# Função para carregar categorias e métodos da planilha
-@st.cache_data
+def tamanho_livro():
+    return armazenamento.obter_livro_caixa().tamanho()
+
+@contextmanager
+def secao(nome):
+    """Mede a seção da página no histograma e registra a execução no log estruturado"""
+    with DURACAO_SECOES.medir(secao=nome), log_estruturado.span(LOGGER, nome, tamanho_livro):
+        yield
+
+# Função para carregar categorias e métodos (catálogo compartilhado com o bot,
+# relido só quando a aba Configurações muda)
+@DURACAO_SECOES.cronometrar(secao='configuracoes')
 def carregar_configuracoes():
     """Carrega as configurações da aba Configurações"""
     try:
-        df_config = pd.read_excel(ARQUIVO_EXCEL, sheet_name='Configurações', header=None)
-        
-        # Extrair categorias
-        necessidades = df_config.iloc[1:, 0].dropna().tolist()
-        desejos = df_config.iloc[1:, 1].dropna().tolist()
-        investimentos = df_config.iloc[1:, 2].dropna().tolist()
-        
-        # Extrair métodos
-        metodos = df_config.iloc[1:, 3].dropna().tolist()
-        
-        # Extrair tipos
-        tipos = df_config.iloc[1:, 4].dropna().tolist()
-        
-        todas_categorias = necessidades + desejos + investimentos
-        
-        return {
-            'necessidades': necessidades,
-            'desejos': desejos,
-            'investimentos': investimentos,
-            'todas_categorias': todas_categorias,
-            'metodos': metodos,
-            'tipos': tipos
-        }
+        return armazenamento.carregar_configuracoes()
     except Exception as e:
+        LOGGER.exception("Erro ao carregar configurações")
         st.error(f"Erro ao carregar configurações: {e}")
         return None
 
 # Função para carregar lançamentos existentes
+@DURACAO_SECOES.cronometrar(secao='lancamentos')
 def carregar_lancamentos():
-    """Carrega os lançamentos da aba Lançamentos"""
+    """Carrega os lançamentos, relendo o armazenamento só quando a versão muda.
+    
+    O livro-caixa é único no processo, compartilhado entre reruns e sessões; o
+    DataFrame retornado é somente leitura: quem precisar alterá-lo deve fazer uma cópia.
+    """
     try:
-        df = pd.read_excel(ARQUIVO_EXCEL, sheet_name='Lançamentos')
+        df = armazenamento.obter_livro_caixa().lancamentos()
         return df
     except Exception as e:
+        LOGGER.exception("Erro ao carregar lançamentos")
         st.error(f"Erro ao carregar lançamentos: {e}")
         return pd.DataFrame()
 
@@ -67,28 +79,12 @@ def carregar_lancamentos():
 def adicionar_lancamento(data, descricao, categoria, tipo, valor, metodo, status='Realizado'):
     """Adiciona um novo lançamento à planilha"""
     try:
-        # Carregar o arquivo Excel
-        wb = openpyxl.load_workbook(ARQUIVO_EXCEL)
-        ws = wb['Lançamentos']
-        
-        # Encontrar a próxima linha vazia
-        ultima_linha = ws.max_row + 1
-        
-        # Inserir dados
-        ws[f'A{ultima_linha}'] = data
-        ws[f'B{ultima_linha}'] = descricao
-        ws[f'C{ultima_linha}'] = categoria
-        ws[f'D{ultima_linha}'] = tipo
-        ws[f'E{ultima_linha}'] = valor
-        ws[f'F{ultima_linha}'] = metodo
-        ws[f'G{ultima_linha}'] = status
-        
-        # Salvar o arquivo
-        wb.save(ARQUIVO_EXCEL)
-        wb.close()
+        # Gravar e aplicar no livro-caixa do processo (snapshot e rollup)
+        armazenamento.obter_livro_caixa().adicionar_lancamento(data, descricao, categoria, tipo, valor, metodo, status)
         
         return True
     except Exception as e:
+        LOGGER.exception("Erro ao adicionar lançamento")
         st.error(f"Erro ao adicionar lançamento: {e}")
         return False
 
@@ -129,30 +125,33 @@ if config is None:
     st.error("Não foi possível carregar as configurações. Verifique se o arquivo Excel está correto.")
     st.stop()
 
+# Carregar lançamentos uma única vez por rerun (sidebar e abas usam o mesmo snapshot)
+df_lancamentos = carregar_lancamentos()
+
 # Sidebar com informações
-with st.sidebar:
+with st.sidebar, secao('sidebar'):
     st.header("📊 Informações")
     st.info("Use este aplicativo para registrar seus gastos e receitas de forma simples e rápida.")
     
     # Mostrar últimos lançamentos
     st.subheader("📝 Últimos Lançamentos")
-    df_lancamentos = carregar_lancamentos()
-    
-    # Corrigir tipos de dados no DataFrame
-    for col in df_lancamentos.select_dtypes(include=['object']).columns:
-        df_lancamentos[col] = df_lancamentos[col].astype(str)
     
     if not df_lancamentos.empty:
-        ultimos = df_lancamentos.tail(5)[['Data', 'Descrição', 'Tipo', 'Valor']].copy()
+        # Os 5 mais recentes até hoje, pelo índice de datas do livro-caixa (como o /historico do bot)
+        ultimos = armazenamento.obter_livro_caixa().ultimos(5, ate=pd.Timestamp(datetime.now().date()))
+        ultimos = ultimos[['Data', 'Descrição', 'Tipo', 'Valor']].copy()
+        # Valor fica em centavos no livro-caixa; reais só na exibição
+        ultimos['Valor'] = em_reais(ultimos['Valor'])
+        
         st.dataframe(ultimos, use_container_width=True)
     else:
         st.write("Nenhum lançamento registrado ainda.")
 
 # Abas principais
-tab1, tab2, tab3 = st.tabs(["📥 Novo Lançamento", "📊 Visualizar Lançamentos", "📈 Resumo"])
+tab1, tab2, tab3, tab4 = st.tabs(["📥 Novo Lançamento", "📊 Visualizar Lançamentos", "📈 Resumo", "📤 Importar Extrato"])
 
 # TAB 1: Novo Lançamento
-with tab1:
+with tab1, secao('novo_lancamento'):
     st.subheader("Adicione um novo lançamento")
     
     col1, col2 = st.columns(2)
@@ -216,8 +215,8 @@ with tab1:
                         f"<div class='success-box'><strong>✅ Sucesso!</strong> Lançamento adicionado com sucesso!</div>",
                         unsafe_allow_html=True
                     )
-                    # Limpar cache para atualizar dados
-                    st.cache_data.clear()
+                    # A versão do armazenamento mudou: recarregar o snapshot para as abas
+                    df_lancamentos = carregar_lancamentos()
                 else:
                     st.error("❌ Erro ao adicionar lançamento.")
     
@@ -229,8 +228,7 @@ with tab1:
     st.divider()
     st.subheader("💰 Resumo Financeiro")
     
-    # Carregar lançamentos
-    df_resumo = carregar_lancamentos()
+    df_resumo = df_lancamentos
     
     if not df_resumo.empty:
         # Data atual
@@ -249,19 +247,17 @@ with tab1:
             ultimo_dia_mes_seguinte = proximo_mes.replace(month=proximo_mes.month + 1, day=1) - pd.Timedelta(days=1)
         
         # Realizados: até hoje (inclusive)
-        df_realizados = df_resumo[df_resumo['Data'].dt.date <= hoje.date()]
-        receitas_realizadas = df_realizados[df_realizados['Tipo'] == 'Receita']['Valor'].sum()
-        despesas_realizadas = df_realizados[df_realizados['Tipo'] == 'Despesa']['Valor'].sum()
+        livro = armazenamento.obter_livro_caixa()
+        realizados = livro.totais_por_tipo(fim=hoje)
+        receitas_realizadas = realizados.get('Receita', 0.0)
+        despesas_realizadas = realizados.get('Despesa', 0.0)
         saldo_realizado = receitas_realizadas - despesas_realizadas
         
         # A transcorrer: de amanhã até o final do mês seguinte
         amanha = hoje + pd.Timedelta(days=1)
-        df_transcorrer = df_resumo[
-            (df_resumo['Data'].dt.date >= amanha.date()) & 
-            (df_resumo['Data'].dt.date <= ultimo_dia_mes_seguinte.date())
-        ]
-        receitas_transcorrer = df_transcorrer[df_transcorrer['Tipo'] == 'Receita']['Valor'].sum()
-        despesas_transcorrer = df_transcorrer[df_transcorrer['Tipo'] == 'Despesa']['Valor'].sum()
+        transcorrer = livro.totais_por_tipo(amanha, ultimo_dia_mes_seguinte)
+        receitas_transcorrer = transcorrer.get('Receita', 0.0)
+        despesas_transcorrer = transcorrer.get('Despesa', 0.0)
         
         # Exibir métricas
         col_res1, col_res2, col_res3 = st.columns(3)
@@ -278,47 +274,111 @@ with tab1:
         st.info("📭 Nenhum lançamento registrado ainda.")
 
 # TAB 2: Visualizar Lançamentos
-with tab2:
+with tab2, secao('visualizar_lancamentos'):
     st.subheader("Histórico de Lançamentos")
     
-    df_lancamentos = carregar_lancamentos()
-    
-    # Corrigir tipos de dados no DataFrame
-    for col in df_lancamentos.select_dtypes(include=['object']).columns:
-        df_lancamentos[col] = df_lancamentos[col].astype(str)
+    # Motor de consulta da versão atual (opções, bitmaps e datas ordenadas já prontos)
+    consulta = armazenamento.obter_livro_caixa().consulta()
     
-    if not df_lancamentos.empty:
+    if consulta.n:
         # Filtros
         col_filt1, col_filt2, col_filt3 = st.columns(3)
         
         with col_filt1:
             tipo_filtro = st.multiselect(
                 "Filtrar por Tipo",
-                options=df_lancamentos['Tipo'].unique(),
-                default=df_lancamentos['Tipo'].unique()
+                options=consulta.opcoes['Tipo'],
+                default=consulta.opcoes['Tipo']
             )
         
         with col_filt2:
             categoria_filtro = st.multiselect(
                 "Filtrar por Categoria",
-                options=df_lancamentos['Categoria'].unique(),
-                default=df_lancamentos['Categoria'].unique()
+                options=consulta.opcoes['Categoria'],
+                default=consulta.opcoes['Categoria']
             )
         
         with col_filt3:
-            data_inicio = st.date_input("Data Inicial", value=df_lancamentos['Data'].min())
-            data_fim = st.date_input("Data Final", value=df_lancamentos['Data'].max())
+            data_inicio = st.date_input("Data Inicial", value=consulta.data_minima)
+            data_fim = st.date_input("Data Final", value=consulta.data_maxima)
+        
+        # Aplicar filtros (fatia de datas + AND dos bitmaps de Tipo e Categoria)
+        with armazenamento.DURACAO_AGREGACOES.medir(agregacao='filtro_visualizar'):
+            faixa = consulta.filtrar(data_inicio, data_fim, Tipo=tipo_filtro, Categoria=categoria_filtro)
+        
+        # Ordenação e paginação (mudar a ordem ou o tamanho volta para a primeira página)
+        col_pag1, col_pag2, col_pag3 = st.columns([2, 1, 1])
         
-        # Aplicar filtros
-        df_filtrado = df_lancamentos[
-            (df_lancamentos['Tipo'].isin(tipo_filtro)) &
-            (df_lancamentos['Categoria'].isin(categoria_filtro)) &
-            (df_lancamentos['Data'].dt.date >= data_inicio) &
-            (df_lancamentos['Data'].dt.date <= data_fim)
-        ]
+        def voltar_primeira_pagina():
+            st.session_state['pagina_historico'] = 1
+        
+        with col_pag1:
+            ordenar_por = st.selectbox(
+                "Ordenar por",
+                options=[ORDEM_LANCAMENTO] + list(consulta.exibicao.columns),
+                on_change=voltar_primeira_pagina
+            )
+        
+        with col_pag2:
+            ordem = st.radio(
+                "Ordem", options=["Crescente", "Decrescente"], horizontal=True,
+                on_change=voltar_primeira_pagina
+            )
+        
+        with col_pag3:
+            tamanho_pagina = st.selectbox(
+                "Linhas por página", options=TAMANHOS_PAGINA, index=1,
+                on_change=voltar_primeira_pagina
+            )
+        
+        total_paginas = max(1, -(-len(faixa) // tamanho_pagina))
+        # Filtros mais restritos podem reduzir o número de páginas
+        if st.session_state.get('pagina_historico', 1) > total_paginas:
+            st.session_state['pagina_historico'] = total_paginas
+        
+        # Só a página visível é materializada e enviada ao navegador
+        with armazenamento.DURACAO_AGREGACOES.medir(agregacao='pagina_visualizar'):
+            df_pagina = consulta.pagina(
+                faixa,
+                numero=st.session_state.get('pagina_historico', 1),
+                tamanho=tamanho_pagina,
+                coluna=None if ordenar_por == ORDEM_LANCAMENTO else ordenar_por,
+                decrescente=ordem == "Decrescente"
+            )
         
         # Exibir tabela
-        st.dataframe(df_filtrado, use_container_width=True, hide_index=True)
+        st.dataframe(df_pagina, use_container_width=True, hide_index=True)
+        
+        # Navegação entre páginas
+        col_nav1, col_nav2, col_nav3 = st.columns([1, 2, 1])
+        
+        with col_nav1:
+            st.button(
+                "◀ Anterior", use_container_width=True,
+                disabled=st.session_state.get('pagina_historico', 1) <= 1,
+                on_click=lambda: st.session_state.update(pagina_historico=st.session_state['pagina_historico'] - 1)
+            )
+        
+        with col_nav2:
+            pagina_atual = st.number_input(
+                f"Página (de {total_paginas})",
+                min_value=1,
+                max_value=total_paginas,
+                step=1,
+                key='pagina_historico'
+            )
+            primeira_linha = (pagina_atual - 1) * tamanho_pagina
+            st.caption(
+                f"Mostrando {min(primeira_linha + 1, len(faixa))}–{min(primeira_linha + tamanho_pagina, len(faixa))} "
+                f"de {len(faixa)} lançamentos"
+            )
+        
+        with col_nav3:
+            st.button(
+                "Próxima ▶", use_container_width=True,
+                disabled=st.session_state.get('pagina_historico', 1) >= total_paginas,
+                on_click=lambda: st.session_state.update(pagina_historico=st.session_state['pagina_historico'] + 1)
+            )
         
         # Estatísticas
         st.divider()
@@ -326,8 +386,9 @@ with tab2:
         
         col_stat1, col_stat2, col_stat3 = st.columns(3)
         
-        receitas = df_filtrado[df_filtrado['Tipo'] == 'Receita']['Valor'].sum()
-        despesas = df_filtrado[df_filtrado['Tipo'] == 'Despesa']['Valor'].sum()
+        totais = consulta.totais_por_tipo(faixa)
+        receitas = totais.get('Receita', 0.0)
+        despesas = totais.get('Despesa', 0.0)
         saldo = receitas - despesas
         
         with col_stat1:
@@ -343,17 +404,18 @@ with tab2:
         st.info("📭 Nenhum lançamento registrado ainda.")
 
 # TAB 3: Resumo
-with tab3:
+with tab3, secao('resumo'):
     st.subheader("📈 Resumo Financeiro")
     
-    df_lancamentos = carregar_lancamentos()
-    
     if not df_lancamentos.empty:
         # Totais gerais
         col_total1, col_total2, col_total3 = st.columns(3)
         
-        total_receitas = df_lancamentos[df_lancamentos['Tipo'] == 'Receita']['Valor'].sum()
-        total_despesas = df_lancamentos[df_lancamentos['Tipo'] == 'Despesa']['Valor'].sum()
+        # Tabelas por (Tipo, Categoria) e por Método mantidas pelo livro-caixa a cada
+        # inserção: o rerun não reagrupa o histórico
+        resumo = armazenamento.obter_livro_caixa().resumo()
+        total_receitas = resumo['receitas']
+        total_despesas = resumo['despesas']
         saldo_geral = total_receitas - total_despesas
         
         with col_total1:
@@ -372,7 +434,7 @@ with tab3:
         
         with col_chart1:
             st.subheader("Despesas por Categoria")
-            despesas_cat = df_lancamentos[df_lancamentos['Tipo'] == 'Despesa'].groupby('Categoria')['Valor'].sum().sort_values(ascending=False)
+            despesas_cat = resumo['despesas_por_categoria']
             if not despesas_cat.empty:
                 st.bar_chart(despesas_cat)
             else:
@@ -380,7 +442,7 @@ with tab3:
         
         with col_chart2:
             st.subheader("Receitas por Categoria")
-            receitas_cat = df_lancamentos[df_lancamentos['Tipo'] == 'Receita'].groupby('Categoria')['Valor'].sum().sort_values(ascending=False)
+            receitas_cat = resumo['receitas_por_categoria']
             if not receitas_cat.empty:
                 st.bar_chart(receitas_cat)
             else:
@@ -390,7 +452,7 @@ with tab3:
         
         # Resumo por método
         st.subheader("Métodos de Pagamento Utilizados")
-        metodos_uso = df_lancamentos.groupby('Método')['Valor'].sum().sort_values(ascending=False)
+        metodos_uso = resumo['por_metodo']
         if not metodos_uso.empty:
             st.bar_chart(metodos_uso)
         else:
@@ -398,6 +460,88 @@ with tab3:
     else:
         st.info("📭 Nenhum lançamento registrado ainda. Comece adicionando um novo lançamento!")
 
+# TAB 4: Importar Extrato
+with tab4, secao('importar_extrato'):
+    st.subheader("Importe um extrato bancário")
+    st.caption("Arquivos CSV ou OFX; as linhas são gravadas em blocos, um commit por bloco.")
+    
+    arquivo_extrato = st.file_uploader("📄 Extrato (CSV ou OFX)", type=['csv', 'ofx', 'qfx'])
+    
+    if arquivo_extrato is not None:
+        formato = importacao.detectar_formato(arquivo_extrato.name)
+        mapeamento = {}
+        
+        if formato == 'csv':
+            # Prévia das primeiras linhas para mapear as colunas
+            try:
+                previa, _ = next(importacao.ler_csv_em_blocos(arquivo_extrato, tamanho_bloco=5))
+            except Exception as e:
+                LOGGER.exception("Erro ao ler o extrato")
+                st.error(f"Erro ao ler o extrato: {e}")
+                previa = None
+            finally:
+                arquivo_extrato.seek(0)
+            
+            if previa is not None:
+                st.dataframe(previa, use_container_width=True, hide_index=True)
+                
+                st.markdown("**Mapeamento de colunas**")
+                sugestao = importacao.mapear_colunas(list(previa.columns))
+                opcoes_colunas = ["(nenhuma)"] + list(previa.columns)
+                colunas_mapa = st.columns(len(importacao.SINONIMOS_COLUNAS))
+                for coluna_mapa, destino in zip(colunas_mapa, importacao.SINONIMOS_COLUNAS):
+                    with coluna_mapa:
+                        escolhida = st.selectbox(
+                            destino,
+                            options=opcoes_colunas,
+                            index=opcoes_colunas.index(sugestao[destino]) if sugestao[destino] else 0,
+                            key=f"mapa_{destino}"
+                        )
+                    if escolhida != "(nenhuma)":
+                        mapeamento[destino] = escolhida
+        
+        col_imp1, col_imp2 = st.columns(2)
+        
+        with col_imp1:
+            categoria_padrao = st.selectbox(
+                "🏷️ Categoria padrão",
+                options=config['todas_categorias'],
+                help="Usada nas linhas sem categoria, ou com categoria fora do catálogo, no extrato"
+            )
+        
+        with col_imp2:
+            metodo_padrao = st.selectbox(
+                "💳 Método padrão",
+                options=config['metodos'],
+                help="Usado nas linhas sem método, ou com método fora do catálogo, no extrato"
+            )
+        
+        if st.button("📤 Importar Extrato", use_container_width=True):
+            barra = st.progress(0.0, text="Importando...")
+            
+            def atualizar_progresso(importados, fracao):
+                barra.progress(fracao, text=f"{importados} lançamentos importados")
+            
+            try:
+                resultado = importacao.importar_extrato(
+                    arquivo_extrato, formato=formato, mapeamento=mapeamento or None,
+                    categoria_padrao=categoria_padrao, metodo_padrao=metodo_padrao,
+                    progresso=atualizar_progresso
+                )
+                st.markdown(
+                    f"<div class='success-box'><strong>✅ Sucesso!</strong> {resultado['importados']} lançamentos "
+                    f"importados ({resultado['descartados']} linhas descartadas).</div>",
+                    unsafe_allow_html=True
+                )
+                if resultado['fora_do_catalogo']:
+                    st.warning(
+                        f"⚠️ {resultado['fora_do_catalogo']} lançamentos com categoria ou método fora da aba "
+                        f"Configurações foram gravados como {categoria_padrao} / {metodo_padrao}."
+                    )
+            except Exception as e:
+                LOGGER.exception("Erro ao importar extrato")
+                st.error(f"❌ Erro ao importar extrato: {e}")
+
 # Rodapé
 st.divider()
 st.markdown("""
@@ -405,3 +549,10 @@ st.markdown("""
     💰 Aplicativo de Registro de Lançamentos Financeiros | Desenvolvido com Python e Streamlit
     </div>
 """, unsafe_allow_html=True)
+
+# Registrar a duração total do rerun
+duracao_rerun = time.perf_counter() - inicio_rerun
+DURACAO_RERUN.observar(duracao_rerun)
+LOGGER.info("rerun concluído", extra={
+    'handler': 'rerun', 'duracao_ms': round(duracao_rerun * 1000, 3), 'lancamentos': tamanho_livro()
+})
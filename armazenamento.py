@@ -0,0 +1,1336 @@
+"""
+Camada de armazenamento dos lançamentos, compartilhada pelo app Streamlit e pelo Bot Telegram.
+
+Há dois backends intercambiáveis, escolhidos pela variável de ambiente ARMAZENAMENTO:
+
+- "sqlite" (padrão): banco SQLite com índices em Data/Tipo/Categoria. A planilha
+  planilha_financeira.xlsx passa a ser apenas formato de importação/exportação; se o
+  banco ainda não existir, ele é criado a partir da planilha na primeira utilização.
+- "excel": a própria planilha, com novos lançamentos gravados em um journal
+  append-only (uma linha JSON com fsync por registro) e compactados em background na
+  aba Lançamentos com um único save.
+
+Uso pela linha de comando:
+    python armazenamento.py migrar     - cria o banco SQLite a partir da planilha
+    python armazenamento.py exportar   - regenera a planilha a partir do banco
+    python armazenamento.py compactar  - incorpora o journal na planilha
+    python armazenamento.py resumo     - totais da aba Resumo lidos em blocos do disco
+
+Contas: além do livro-caixa compartilhado, cada conta (ex.: um usuário do Bot Telegram)
+pode ter o seu, em contas/<conta>.db (ou contas/<conta>.xlsx no backend "excel"), com
+partições, travas, caches e agregados próprios; o catálogo de configurações continua
+sendo o compartilhado.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+
+import agregacoes
+import esquema
+import metricas
+from indices import AgregadosResumo, ConsultaLancamentos, IndiceDatas, RollupDiario
+
+LOGGER = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Caminho do arquivo Excel
+ARQUIVO_EXCEL = "planilha_financeira.xlsx"
+
+# Caminho do banco SQLite
+ARQUIVO_DB = "planilha_financeira.db"
+
+# Diretório dos armazenamentos por conta (contas/<conta>.db ou contas/<conta>.xlsx)
+DIRETORIO_CONTAS = "contas"
+
+# Contas viram nomes de arquivo: só letras, dígitos e _ (ids de chat podem ser negativos)
+_CONTA_VALIDA = re.compile(r'-?[A-Za-z0-9_]+')
+
+# Colunas da aba Lançamentos, na ordem da planilha
+COLUNAS = ['Data', 'Descrição', 'Categoria', 'Tipo', 'Valor', 'Método', 'Status']
+
+# Prefixo das tabelas mensais de lançamentos no SQLite (lancamentos_AAAA_MM)
+PREFIXO_PARTICAO = "lancamentos_"
+
+# Threads usadas para ler as partições mensais em paralelo
+THREADS_LEITURA = min(4, os.cpu_count() or 1)
+
+# Tamanho do journal a partir do qual a compactação em background é disparada
+LIMITE_JOURNAL_BYTES = 64 * 1024
+
+# Tentativas de leitura consistente enquanto uma compactação substitui a planilha
+TENTATIVAS_LEITURA = 5
+
+# Linhas por bloco nas leituras em fluxo (ler_em_blocos)
+TAMANHO_BLOCO_LEITURA = 50_000
+
+# Spans de tempo do armazenamento e das agregações em memória
+DURACAO_ARMAZENAMENTO = metricas.histograma(
+    'armazenamento_duracao_segundos', "Leituras e gravações no backend de armazenamento"
+)
+DURACAO_AGREGACOES = metricas.histograma(
+    'agregacao_duracao_segundos', "Agregações e índices sobre os lançamentos em memória"
+)
+LANCAMENTOS_GRAVADOS = metricas.contador(
+    'lancamentos_gravados_total', "Lançamentos gravados por este processo"
+)
+
+
+@contextmanager
+def _trava_arquivo(caminho, bloquear=True):
+    """Trava exclusiva entre processos sobre um arquivo auxiliar.
+
+    Retorna True se a trava foi obtida; com bloquear=False, retorna False se outro
+    processo já a detém.
+    """
+    fd = os.open(caminho, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if bloquear else fcntl.LOCK_NB))
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK if bloquear else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            if bloquear:
+                raise
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+def _para_datetime(data):
+    """Normaliza datas recebidas do app (Timestamp/date) e do bot (datetime)"""
+    return pd.Timestamp(data).to_pydatetime()
+
+
+def novo_lancamento(data, descricao, categoria, tipo, valor, metodo, status='Realizado'):
+    """Monta o registro de um lançamento com as colunas da aba Lançamentos.
+
+    Valor ausente ou não numérico levanta ValueError (esquema.para_centavos).
+    """
+    esquema.para_centavos(valor)
+    return {
+        'Data': pd.Timestamp(data),
+        'Descrição': descricao,
+        'Categoria': categoria,
+        'Tipo': tipo,
+        'Valor': float(valor),
+        'Método': metodo,
+        'Status': status,
+    }
+
+
+def _intervalo_datas(inicio=None, fim=None):
+    """Converte dias inclusivos [inicio, fim] em instantes [início, fim exclusivo)"""
+    inicio = pd.Timestamp(inicio).normalize() if inicio is not None else None
+    fim = pd.Timestamp(fim).normalize() + pd.Timedelta(days=1) if fim is not None else None
+    return inicio, fim
+
+
+def _totais_por_tipo_df(df, inicio=None, fim=None):
+    """Soma de Valor por Tipo entre os dias inicio e fim (inclusivos) de um DataFrame"""
+    if df.empty:
+        return {}
+    inicio, fim = _intervalo_datas(inicio, fim)
+    mascara = pd.Series(True, index=df.index)
+    if inicio is not None:
+        mascara &= df['Data'] >= inicio
+    if fim is not None:
+        mascara &= df['Data'] < fim
+    return df.loc[mascara].groupby('Tipo')['Valor'].sum().to_dict()
+
+
+def _configuracoes_da_grade(df_config):
+    """Extrai categorias, métodos e tipos da grade da aba Configurações (sem cabeçalho)"""
+    necessidades = df_config.iloc[1:, 0].dropna().tolist()
+    desejos = df_config.iloc[1:, 1].dropna().tolist()
+    investimentos = df_config.iloc[1:, 2].dropna().tolist()
+    metodos = df_config.iloc[1:, 3].dropna().tolist()
+    tipos = df_config.iloc[1:, 4].dropna().tolist()
+
+    return {
+        'necessidades': necessidades,
+        'desejos': desejos,
+        'investimentos': investimentos,
+        'todas_categorias': necessidades + desejos + investimentos,
+        'metodos': metodos,
+        'tipos': tipos
+    }
+
+
+class Armazenamento:
+    """Interface comum dos backends de armazenamento"""
+
+    def carregar_lancamentos(self):
+        """Retorna um DataFrame com as colunas de COLUNAS"""
+        raise NotImplementedError
+
+    def adicionar_lancamentos(self, lancamentos):
+        """Persiste vários lançamentos (registros de novo_lancamento) em um único commit.
+
+        Retorna (versão anterior, versão nova) dos lançamentos, lidas atomicamente com a
+        gravação: se a anterior for a que o chamador já conhece, a nova corresponde
+        exatamente ao conteúdo dele acrescido destes lançamentos.
+        """
+        raise NotImplementedError
+
+    def adicionar_lancamento(self, data, descricao, categoria, tipo, valor, metodo, status='Realizado'):
+        """Persiste um novo lançamento; mesmo retorno de adicionar_lancamentos"""
+        return self.adicionar_lancamentos([
+            novo_lancamento(data, descricao, categoria, tipo, valor, metodo, status)
+        ])
+
+    def carregar_grade_configuracoes(self):
+        """Retorna a aba Configurações como grade sem cabeçalho (header=None)"""
+        raise NotImplementedError
+
+    def carregar_configuracoes(self):
+        """Retorna categorias, métodos e tipos cadastrados"""
+        return _configuracoes_da_grade(self.carregar_grade_configuracoes())
+
+    def versao_lancamentos(self):
+        """Identificador barato que muda sempre que os lançamentos mudam.
+
+        Serve de chave para caches: dois valores iguais garantem o mesmo conteúdo.
+        """
+        raise NotImplementedError
+
+    def versao_configuracoes(self):
+        """Identificador barato que muda sempre que a aba Configurações pode ter mudado"""
+        raise NotImplementedError
+
+    def carregar_periodo(self, inicio=None, fim=None):
+        """Lançamentos entre os dias inicio e fim (inclusivos; None = sem limite)"""
+        df = self.carregar_lancamentos()
+        inicio, fim = _intervalo_datas(inicio, fim)
+        mascara = pd.Series(True, index=df.index)
+        if inicio is not None:
+            mascara &= df['Data'] >= inicio
+        if fim is not None:
+            mascara &= df['Data'] < fim
+        return df.loc[mascara].reset_index(drop=True)
+
+    def totais_por_tipo(self, inicio=None, fim=None):
+        """Soma de Valor por Tipo entre os dias inicio e fim (inclusivos; None = sem limite)"""
+        return _totais_por_tipo_df(self.carregar_lancamentos(), inicio, fim)
+
+    def ler_em_blocos(self, tamanho_bloco=TAMANHO_BLOCO_LEITURA):
+        """Gera os lançamentos em blocos tipados (esquema.py) de até tamanho_bloco linhas"""
+        df = self.carregar_lancamentos()
+        for inicio in range(0, len(df), tamanho_bloco):
+            yield esquema.tipar_lancamentos(df.iloc[inicio:inicio + tamanho_bloco])
+
+
+def ler_planilha_em_blocos(arquivo_excel, tamanho_bloco=TAMANHO_BLOCO_LEITURA, workbook=None):
+    """Gera a aba Lançamentos em blocos tipados, sem carregar a planilha inteira.
+
+    Usa o modo read_only do openpyxl, que percorre o XML da aba linha a linha; só o
+    bloco atual fica em memória. Linhas inteiramente vazias são ignoradas. Um workbook
+    já aberto em read_only pode ser passado em workbook (e é fechado ao fim).
+    """
+    wb = workbook or openpyxl.load_workbook(arquivo_excel, read_only=True, data_only=True)
+    try:
+        linhas = wb['Lançamentos'].iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        bloco = []
+        for linha in linhas:
+            if all(valor is None for valor in linha):
+                continue
+            bloco.append(linha)
+            if len(bloco) == tamanho_bloco:
+                yield esquema.tipar_lancamentos(pd.DataFrame.from_records(bloco, columns=cabecalho))
+                bloco = []
+        if bloco:
+            yield esquema.tipar_lancamentos(pd.DataFrame.from_records(bloco, columns=cabecalho))
+    finally:
+        wb.close()
+
+
+class ArmazenamentoExcel(Armazenamento):
+    """Planilha Excel + journal append-only de lançamentos pendentes de compactação"""
+
+    def __init__(self, arquivo_excel=ARQUIVO_EXCEL):
+        self.arquivo_excel = arquivo_excel
+        self.arquivo_journal = f"{arquivo_excel}.journal"
+        self._arquivo_trava_journal = f"{arquivo_excel}.journal.lock"
+        self._arquivo_trava_compactacao = f"{arquivo_excel}.compactacao.lock"
+        self._compactando = threading.Lock()
+
+    # Escrita
+
+    def adicionar_lancamentos(self, lancamentos):
+        """Grava os lançamentos no journal com um único fsync; custo independe da planilha"""
+        linhas = b''.join(
+            (json.dumps(
+                {'id': uuid.uuid4().hex, **lancamento, 'Data': _para_datetime(lancamento['Data']).isoformat()},
+                ensure_ascii=False
+            ) + "\n").encode('utf-8')
+            for lancamento in lancamentos
+        )
+
+        # A trava só cobre a escrita da linha, para não perder registros durante a
+        # troca do journal feita pela compactação
+        with _trava_arquivo(self._arquivo_trava_journal):
+            fd = os.open(self.arquivo_journal, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                tamanho_anterior = os.fstat(fd).st_size
+                os.write(fd, linhas)
+                os.fsync(fd)
+                tamanho = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            versao_excel = self._versao_excel()
+            compactando = tuple(self._arquivos_compactando())
+
+        if tamanho >= LIMITE_JOURNAL_BYTES:
+            self.compactar_em_background()
+
+        return (versao_excel, tamanho_anterior, compactando), (versao_excel, tamanho, compactando)
+
+    # Leitura
+
+    def _ler_journal(self, caminho):
+        """Lê os registros de um arquivo de journal, ignorando uma linha final incompleta"""
+        registros = []
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        registros.append(json.loads(linha))
+                    except json.JSONDecodeError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return registros
+
+    def _registros_journal(self):
+        """Registros do journal e dos lotes de uma compactação em andamento"""
+        registros = self._ler_journal(self.arquivo_journal)
+        for caminho in self._arquivos_compactando():
+            registros.extend(self._ler_journal(caminho))
+        return registros
+
+    def _arquivos_compactando(self):
+        return sorted(glob.glob(glob.escape(self.arquivo_journal) + ".*.compactando"))
+
+    def _versao_excel(self):
+        try:
+            st = os.stat(self.arquivo_excel)
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def carregar_lancamentos(self):
+        """Carrega a aba Lançamentos somada aos registros ainda no journal"""
+        for _ in range(TENTATIVAS_LEITURA):
+            versao = self._versao_excel()
+
+            # Journal antes da planilha: se uma compactação trocar a planilha no meio
+            # da leitura, a versão muda e a leitura é refeita
+            registros = self._registros_journal()
+            df = pd.read_excel(self.arquivo_excel, sheet_name='Lançamentos')
+
+            if self._versao_excel() == versao:
+                break
+        else:
+            # Compactações seguidas trocaram a planilha em todas as tentativas: sob a
+            # trava da compactação, a planilha não muda até o fim da leitura
+            with _trava_arquivo(self._arquivo_trava_compactacao):
+                registros = self._registros_journal()
+                df = pd.read_excel(self.arquivo_excel, sheet_name='Lançamentos')
+
+        if not registros:
+            return df
+
+        df_journal = pd.DataFrame(registros).drop_duplicates(subset='id')
+        df_journal['Data'] = pd.to_datetime(df_journal['Data'], format='ISO8601')
+        df_journal = df_journal.reindex(columns=df.columns if len(df.columns) else COLUNAS)
+        if df.empty:
+            return df_journal.reset_index(drop=True)
+        return pd.concat([df, df_journal], ignore_index=True)
+
+    def ler_em_blocos(self, tamanho_bloco=TAMANHO_BLOCO_LEITURA):
+        """Gera a planilha em blocos (ler_planilha_em_blocos) e, por último, o journal"""
+        for _ in range(TENTATIVAS_LEITURA):
+            versao = self._versao_excel()
+            registros = self._registros_journal()
+            # O workbook aberto fixa o arquivo lido: se a versão não mudou até aqui, a
+            # planilha e o journal correspondem ao mesmo momento
+            wb = openpyxl.load_workbook(self.arquivo_excel, read_only=True, data_only=True)
+            if self._versao_excel() == versao:
+                break
+            wb.close()
+        else:
+            # Compactações seguidas trocaram a planilha em todas as tentativas: sob a
+            # trava da compactação, nenhuma outra começa até o workbook estar aberto
+            with _trava_arquivo(self._arquivo_trava_compactacao):
+                registros = self._registros_journal()
+                wb = openpyxl.load_workbook(self.arquivo_excel, read_only=True, data_only=True)
+
+        yield from ler_planilha_em_blocos(self.arquivo_excel, tamanho_bloco, workbook=wb)
+
+        if registros:
+            df_journal = pd.DataFrame(registros).drop_duplicates(subset='id')
+            for inicio in range(0, len(df_journal), tamanho_bloco):
+                yield esquema.tipar_lancamentos(df_journal.iloc[inicio:inicio + tamanho_bloco])
+
+    def carregar_periodo(self, inicio=None, fim=None):
+        """Lançamentos do período, filtrados bloco a bloco (só o período fica em memória)"""
+        partes = [esquema.destipar_lancamentos(bloco) for bloco in agregacoes.filtrar_periodo(self.ler_em_blocos(), inicio, fim)]
+        if not partes:
+            df = pd.DataFrame(columns=COLUNAS)
+            df['Data'] = pd.to_datetime(df['Data'])
+            return df
+        return pd.concat(partes, ignore_index=True)
+
+    def totais_por_tipo(self, inicio=None, fim=None):
+        """Soma de Valor por Tipo, acumulada bloco a bloco com memória limitada"""
+        return agregacoes.totais_por_tipo(self.ler_em_blocos(), inicio, fim)
+
+    def carregar_grade_configuracoes(self):
+        return pd.read_excel(self.arquivo_excel, sheet_name='Configurações', header=None)
+
+    def versao_lancamentos(self):
+        # O journal só cresce, então o tamanho basta; os lotes em compactação entram
+        # pelo nome e a planilha pela data de modificação/tamanho
+        try:
+            tamanho_journal = os.stat(self.arquivo_journal).st_size
+        except FileNotFoundError:
+            tamanho_journal = 0
+        return (self._versao_excel(), tamanho_journal, tuple(self._arquivos_compactando()))
+
+    def versao_configuracoes(self):
+        # Também muda a cada compactação; o catálogo compara o conteúdo antes de
+        # considerar as configurações alteradas
+        return self._versao_excel()
+
+    # Compactação
+
+    def compactar(self):
+        """Incorpora o journal na planilha com um único save.
+
+        Retorna o número de lançamentos incorporados, ou None se outra compactação já
+        estiver em andamento.
+        """
+        with _trava_arquivo(self._arquivo_trava_compactacao, bloquear=False) as obtida:
+            if not obtida:
+                return None
+
+            # Troca o journal por um lote nomeado; novos lançamentos vão para um
+            # journal novo enquanto a planilha é regravada
+            with _trava_arquivo(self._arquivo_trava_journal):
+                if os.path.exists(self.arquivo_journal):
+                    lote = f"{self.arquivo_journal}.{uuid.uuid4().hex}.compactando"
+                    os.replace(self.arquivo_journal, lote)
+
+            lotes = self._arquivos_compactando()
+            if not lotes:
+                return 0
+
+            wb = openpyxl.load_workbook(self.arquivo_excel)
+            try:
+                ws = wb['Lançamentos']
+
+                # Lotes já aplicados por uma compactação interrompida antes da limpeza
+                aplicados = set(filter(None, (wb.properties.identifier or '').split(',')))
+                ids_lotes = [os.path.basename(lote).split('.')[-2] for lote in lotes]
+
+                total = 0
+                vistos = set()
+                for lote, id_lote in zip(lotes, ids_lotes):
+                    if id_lote in aplicados:
+                        continue
+                    for registro in self._ler_journal(lote):
+                        if registro['id'] in vistos:
+                            continue
+                        vistos.add(registro['id'])
+                        ws.append([
+                            datetime.fromisoformat(registro['Data']),
+                            registro['Descrição'],
+                            registro['Categoria'],
+                            registro['Tipo'],
+                            registro['Valor'],
+                            registro['Método'],
+                            registro['Status'],
+                        ])
+                        total += 1
+
+                wb.properties.identifier = ','.join(ids_lotes)
+                temporario = f"{self.arquivo_excel}.tmp"
+                wb.save(temporario)
+            finally:
+                wb.close()
+
+            os.replace(temporario, self.arquivo_excel)
+            for lote in lotes:
+                os.remove(lote)
+
+            return total
+
+    def compactar_em_background(self):
+        """Dispara a compactação em uma thread, se nenhuma estiver rodando neste processo"""
+        if not self._compactando.acquire(blocking=False):
+            return
+
+        def executar():
+            try:
+                self.compactar()
+            except Exception:
+                LOGGER.exception("Erro ao compactar journal")
+            finally:
+                self._compactando.release()
+
+        threading.Thread(target=executar, name="compactacao-journal", daemon=True).start()
+
+
+class ArmazenamentoSQLite(Armazenamento):
+    """Banco SQLite com os lançamentos particionados por mês e a grade de configurações.
+
+    Cada mês fica em uma tabela própria (lancamentos_AAAA_MM, índice em tipo/data), e a
+    tabela particoes é o manifesto: datas mínima e máxima e número de linhas de cada
+    mês, com os totais por Tipo em particoes_totais (centavos inteiros, exatos a cada
+    gravação incremental). Gravações só tocam a partição do
+    mês do lançamento e atualizam o manifesto na mesma transação; consultas por período
+    descartam as partições fora do intervalo e usam os totais do manifesto para os meses
+    inteiramente cobertos. A leitura do histórico completo lê as partições em paralelo.
+
+    Os ids vêm de uma sequência global, preservando a ordem de inserção entre partições.
+    """
+
+    # Soma exata de valor (reais, REAL nas partições) em centavos inteiros
+    _SOMA_CENTAVOS = f"SUM(CAST(ROUND(valor * {esquema.CENTAVOS_POR_REAL}) AS INTEGER))"
+
+    def __init__(self, arquivo_db=ARQUIVO_DB):
+        self.arquivo_db = arquivo_db
+        self._local = threading.local()
+        self._particoes_criadas = set()
+        self._executor = None
+        self._executor_trava = threading.Lock()
+        self._criar_esquema()
+
+    def _conexao(self):
+        """Uma conexão por thread (sqlite3 não compartilha conexões entre threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.arquivo_db, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _criar_esquema(self):
+        self._conexao().executescript("""
+            CREATE TABLE IF NOT EXISTS particoes (
+                mes TEXT PRIMARY KEY,
+                tabela TEXT NOT NULL,
+                data_minima TEXT,
+                data_maxima TEXT,
+                linhas INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS particoes_totais (
+                mes TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                centavos INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (mes, tipo)
+            );
+            CREATE TABLE IF NOT EXISTS sequencias (
+                nome TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO sequencias (nome, valor) VALUES ('lancamentos', 0);
+
+            CREATE TABLE IF NOT EXISTS configuracoes (
+                linha INTEGER NOT NULL,
+                coluna INTEGER NOT NULL,
+                valor TEXT,
+                PRIMARY KEY (linha, coluna)
+            );
+
+            -- Contadores de versão mantidos por triggers, visíveis a todos os processos
+            CREATE TABLE IF NOT EXISTS versoes (
+                tabela TEXT PRIMARY KEY,
+                versao INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO versoes (tabela, versao) VALUES ('lancamentos', 0), ('configuracoes', 0);
+        """)
+        for evento in ('INSERT', 'UPDATE', 'DELETE'):
+            self._conexao().execute(f"""
+                CREATE TRIGGER IF NOT EXISTS versao_configuracoes_{evento.lower()}
+                AFTER {evento} ON configuracoes FOR EACH ROW
+                BEGIN
+                    UPDATE versoes SET versao = versao + 1 WHERE tabela = 'configuracoes';
+                END
+            """)
+        self._migrar_totais_em_reais()
+        self._migrar_tabela_unica()
+
+    # Partições
+
+    @staticmethod
+    def _tabela_particao(mes):
+        return f"{PREFIXO_PARTICAO}{mes.replace('-', '_')}"
+
+    def _garantir_particao(self, conn, mes):
+        """Cria a tabela do mês (com índices e triggers de versão) se ainda não existir"""
+        if mes in self._particoes_criadas:
+            return
+        tabela = self._tabela_particao(mes)
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {tabela} (
+                id INTEGER PRIMARY KEY,
+                data TEXT NOT NULL,
+                descricao TEXT,
+                categoria TEXT,
+                tipo TEXT,
+                valor REAL,
+                metodo TEXT,
+                status TEXT
+            )
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_tipo ON {tabela} (tipo, data)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_data ON {tabela} (data)")
+        for evento in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS versao_{tabela}_{evento.lower()}
+                AFTER {evento} ON {tabela} FOR EACH ROW
+                BEGIN
+                    UPDATE versoes SET versao = versao + 1 WHERE tabela = 'lancamentos';
+                END
+            """)
+        conn.execute("INSERT OR IGNORE INTO particoes (mes, tabela) VALUES (?, ?)", (mes, tabela))
+        self._particoes_criadas.add(mes)
+
+    def _inserir(self, conn, registros):
+        """Insere registros (data ISO, descrição, ..., status) nas partições e no manifesto.
+
+        Deve ser chamado dentro de uma transação; os ids saem da sequência global.
+        """
+        (ultimo_id,) = conn.execute("SELECT valor FROM sequencias WHERE nome = 'lancamentos'").fetchone()
+
+        por_mes = {}
+        for id_, registro in enumerate(registros, start=ultimo_id + 1):
+            por_mes.setdefault(registro[0][:7], []).append((id_,) + registro)
+
+        for mes, linhas in por_mes.items():
+            self._garantir_particao(conn, mes)
+            conn.executemany(
+                f"INSERT INTO {self._tabela_particao(mes)} "
+                "(id, data, descricao, categoria, tipo, valor, metodo, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                linhas
+            )
+            datas = [linha[1] for linha in linhas]
+            conn.execute(
+                "UPDATE particoes SET "
+                "data_minima = min(coalesce(data_minima, ?), ?), "
+                "data_maxima = max(coalesce(data_maxima, ?), ?), "
+                "linhas = linhas + ? WHERE mes = ?",
+                (min(datas), min(datas), max(datas), max(datas), len(linhas), mes)
+            )
+            totais = {}
+            for linha in linhas:
+                if linha[4] is not None and linha[5] is not None:
+                    totais[linha[4]] = totais.get(linha[4], 0) + esquema.para_centavos(linha[5], padrao=0)
+            conn.executemany(
+                "INSERT INTO particoes_totais (mes, tipo, centavos) VALUES (?, ?, ?) "
+                "ON CONFLICT (mes, tipo) DO UPDATE SET centavos = centavos + excluded.centavos",
+                [(mes, tipo, total) for tipo, total in totais.items()]
+            )
+
+        conn.execute(
+            "UPDATE sequencias SET valor = ? WHERE nome = 'lancamentos'", (ultimo_id + len(registros),)
+        )
+
+    def _migrar_totais_em_reais(self):
+        """Recalcula em centavos os totais do manifesto gravados em reais (coluna total REAL)"""
+        conn = self._conexao()
+        colunas = "SELECT name FROM pragma_table_info('particoes_totais')"
+        if 'total' not in {nome for (nome,) in conn.execute(colunas)}:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if 'total' in {nome for (nome,) in conn.execute(colunas)}:
+                conn.execute("DROP TABLE particoes_totais")
+                conn.execute("""
+                    CREATE TABLE particoes_totais (
+                        mes TEXT NOT NULL,
+                        tipo TEXT NOT NULL,
+                        centavos INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (mes, tipo)
+                    )
+                """)
+                for mes, tabela in conn.execute("SELECT mes, tabela FROM particoes").fetchall():
+                    conn.execute(
+                        f"INSERT INTO particoes_totais (mes, tipo, centavos) "
+                        f"SELECT ?, tipo, {self._SOMA_CENTAVOS} FROM {tabela} "
+                        "WHERE tipo IS NOT NULL AND valor IS NOT NULL GROUP BY tipo",
+                        (mes,)
+                    )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _migrar_tabela_unica(self):
+        """Move a tabela única de lançamentos (esquema anterior) para as partições mensais"""
+        conn = self._conexao()
+        existe = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'lancamentos'"
+        if conn.execute(existe).fetchone() is None:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Outro processo pode ter migrado enquanto esperávamos a trava
+            if conn.execute(existe).fetchone() is not None:
+                linhas = conn.execute(
+                    "SELECT data, descricao, categoria, tipo, valor, metodo, status FROM lancamentos ORDER BY id"
+                ).fetchall()
+                self._inserir(conn, linhas)
+                conn.execute("DROP TABLE lancamentos")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            self._particoes_criadas.clear()
+            raise
+
+    def manifesto(self):
+        """Partições em ordem de mês: mes, tabela, data_minima, data_maxima, linhas e totais por Tipo (centavos)"""
+        conn = self._conexao()
+        particoes = conn.execute(
+            "SELECT mes, tabela, data_minima, data_maxima, linhas FROM particoes ORDER BY mes"
+        ).fetchall()
+        totais = {}
+        for mes, tipo, total in conn.execute("SELECT mes, tipo, centavos FROM particoes_totais"):
+            totais.setdefault(mes, {})[tipo] = total
+        return [
+            {
+                'mes': mes, 'tabela': tabela, 'data_minima': data_minima, 'data_maxima': data_maxima,
+                'linhas': linhas, 'totais': totais.get(mes, {}),
+            }
+            for mes, tabela, data_minima, data_maxima, linhas in particoes
+        ]
+
+    @staticmethod
+    def _podar(manifesto, inicio=None, fim=None):
+        """Partições com lançamentos em [inicio, fim) (datas ISO; None = sem limite)"""
+        return [
+            particao for particao in manifesto
+            if particao['linhas']
+            and (inicio is None or particao['data_maxima'] >= inicio)
+            and (fim is None or particao['data_minima'] < fim)
+        ]
+
+    def _ler_particao(self, tabela, inicio=None, fim=None):
+        condicoes, parametros = self._condicoes_periodo(inicio, fim)
+        return pd.read_sql_query(
+            "SELECT id, data AS 'Data', descricao AS 'Descrição', categoria AS 'Categoria', "
+            "tipo AS 'Tipo', valor AS 'Valor', metodo AS 'Método', status AS 'Status' "
+            f"FROM {tabela} {condicoes}",
+            self._conexao(),
+            params=parametros
+        )
+
+    @staticmethod
+    def _condicoes_periodo(inicio=None, fim=None):
+        condicoes, parametros = [], []
+        if inicio is not None:
+            condicoes.append("data >= ?")
+            parametros.append(inicio)
+        if fim is not None:
+            condicoes.append("data < ?")
+            parametros.append(fim)
+        return (f"WHERE {' AND '.join(condicoes)}" if condicoes else ""), parametros
+
+    def _ler_particoes(self, particoes, inicio=None, fim=None):
+        """Lê as partições (em paralelo, uma conexão por thread) na ordem de inserção"""
+        if len(particoes) > 1:
+            with self._executor_trava:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(THREADS_LEITURA, thread_name_prefix='particoes')
+            partes = list(self._executor.map(lambda p: self._ler_particao(p['tabela'], inicio, fim), particoes))
+        else:
+            partes = [self._ler_particao(p['tabela'], inicio, fim) for p in particoes]
+
+        partes = [parte for parte in partes if not parte.empty]
+        if not partes:
+            df = pd.DataFrame(columns=COLUNAS)
+            df['Data'] = pd.to_datetime(df['Data'])
+            return df
+
+        df = pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+        df = df.sort_values('id', kind='stable').drop(columns='id').reset_index(drop=True)
+        df['Data'] = pd.to_datetime(df['Data'], format='ISO8601')
+        return df
+
+    @staticmethod
+    def _limites_iso(inicio=None, fim=None):
+        inicio, fim = _intervalo_datas(inicio, fim)
+        return (
+            inicio.isoformat(sep=' ') if inicio is not None else None,
+            fim.isoformat(sep=' ') if fim is not None else None,
+        )
+
+    # Leitura e escrita
+
+    def carregar_lancamentos(self):
+        return self._ler_particoes(self.manifesto())
+
+    def carregar_periodo(self, inicio=None, fim=None):
+        inicio, fim = self._limites_iso(inicio, fim)
+        return self._ler_particoes(self._podar(self.manifesto(), inicio, fim), inicio, fim)
+
+    def ler_em_blocos(self, tamanho_bloco=TAMANHO_BLOCO_LEITURA):
+        """Gera os lançamentos partição a partição (em ordem de mês), em blocos tipados"""
+        for particao in self._podar(self.manifesto()):
+            consulta = (
+                "SELECT data AS 'Data', descricao AS 'Descrição', categoria AS 'Categoria', "
+                "tipo AS 'Tipo', valor AS 'Valor', metodo AS 'Método', status AS 'Status' "
+                f"FROM {particao['tabela']} ORDER BY id"
+            )
+            for bloco in pd.read_sql_query(consulta, self._conexao(), chunksize=tamanho_bloco):
+                bloco['Data'] = pd.to_datetime(bloco['Data'], format='ISO8601')
+                yield esquema.tipar_lancamentos(bloco)
+
+    def adicionar_lancamentos(self, lancamentos):
+        registros = [
+            (
+                _para_datetime(l['Data']).isoformat(sep=' '), l['Descrição'], l['Categoria'],
+                l['Tipo'], float(l['Valor']), l['Método'], l['Status']
+            )
+            for l in lancamentos
+        ]
+        conn = self._conexao()
+        for tentativa in range(2):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                versao_anterior = self.versao_lancamentos()
+                self._inserir(conn, registros)
+                versao_nova = self.versao_lancamentos()
+                conn.execute("COMMIT")
+                return versao_anterior, versao_nova
+            except Exception as e:
+                conn.execute("ROLLBACK")
+                # Partições criadas na transação desfeita (ou removidas por uma importação
+                # em outro processo) não existem mais: esquecer o cache e tentar de novo
+                self._particoes_criadas.clear()
+                if tentativa or not (isinstance(e, sqlite3.OperationalError) and 'no such table' in str(e)):
+                    raise
+
+    def carregar_grade_configuracoes(self):
+        celulas = self._conexao().execute("SELECT linha, coluna, valor FROM configuracoes").fetchall()
+        if not celulas:
+            return pd.DataFrame()
+        df = pd.DataFrame(celulas, columns=['linha', 'coluna', 'valor'])
+        grade = df.pivot(index='linha', columns='coluna', values='valor')
+        return grade.reindex(index=range(df['linha'].max() + 1), columns=range(df['coluna'].max() + 1))
+
+    def _versao(self, tabela):
+        # O inode distingue um banco recriado do anterior com o mesmo contador
+        (versao,) = self._conexao().execute(
+            "SELECT versao FROM versoes WHERE tabela = ?", (tabela,)
+        ).fetchone()
+        return (os.stat(self.arquivo_db).st_ino, versao)
+
+    def versao_lancamentos(self):
+        return self._versao('lancamentos')
+
+    def versao_configuracoes(self):
+        return self._versao('configuracoes')
+
+    def totais_por_tipo(self, inicio=None, fim=None):
+        # Meses inteiramente no intervalo saem do manifesto; só as bordas vão às tabelas
+        inicio, fim = self._limites_iso(inicio, fim)
+        condicoes, parametros = self._condicoes_periodo(inicio, fim)
+        totais = {}
+        for particao in self._podar(self.manifesto(), inicio, fim):
+            coberta = (
+                (inicio is None or particao['data_minima'] >= inicio)
+                and (fim is None or particao['data_maxima'] < fim)
+            )
+            if coberta:
+                parciais = particao['totais'].items()
+            else:
+                parciais = self._conexao().execute(
+                    f"SELECT tipo, {self._SOMA_CENTAVOS} FROM {particao['tabela']} {condicoes} GROUP BY tipo", parametros
+                ).fetchall()
+            for tipo, total in parciais:
+                if tipo is not None and total is not None:
+                    totais[tipo] = totais.get(tipo, 0) + total
+        return {tipo: esquema.em_reais(total) for tipo, total in totais.items()}
+
+    @staticmethod
+    def _registros(df_lancamentos):
+        return [
+            (
+                _para_datetime(row['Data']).isoformat(sep=' '),
+                row['Descrição'], row['Categoria'], row['Tipo'],
+                float(row['Valor']), row['Método'], row['Status']
+            )
+            for row in df_lancamentos.reindex(columns=COLUNAS).to_dict('records')
+            if pd.notna(row['Data'])
+        ]
+
+    def importar(self, df_lancamentos, df_config):
+        """Substitui o conteúdo do banco pelos lançamentos e pela grade, em uma transação.
+
+        df_lancamentos pode ser um DataFrame ou um iterável de blocos (formato da
+        planilha), gravados um a um sem juntar o histórico em memória.
+        """
+        blocos = [df_lancamentos] if isinstance(df_lancamentos, pd.DataFrame) else df_lancamentos
+        celulas = [
+            (linha, coluna, str(valor))
+            for linha, valores in enumerate(df_config.itertuples(index=False, name=None))
+            for coluna, valor in enumerate(valores)
+            if pd.notna(valor)
+        ]
+
+        conn = self._conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for (tabela,) in conn.execute("SELECT tabela FROM particoes").fetchall():
+                conn.execute(f"DROP TABLE IF EXISTS {tabela}")
+            conn.execute("DELETE FROM particoes")
+            conn.execute("DELETE FROM particoes_totais")
+            # Sem triggers nas tabelas removidas: registrar a mudança explicitamente
+            conn.execute("UPDATE versoes SET versao = versao + 1 WHERE tabela = 'lancamentos'")
+            self._particoes_criadas.clear()
+            conn.execute("DELETE FROM configuracoes")
+            total = 0
+            for bloco in blocos:
+                registros = self._registros(bloco)
+                self._inserir(conn, registros)
+                total += len(registros)
+            conn.executemany("INSERT INTO configuracoes (linha, coluna, valor) VALUES (?, ?, ?)", celulas)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            self._particoes_criadas.clear()
+            raise
+        return total
+
+
+def migrar_excel_para_sqlite(arquivo_excel=ARQUIVO_EXCEL, arquivo_db=ARQUIVO_DB):
+    """Cria (ou recria) o banco SQLite com os lançamentos e configurações da planilha"""
+    origem = ArmazenamentoExcel(arquivo_excel)
+    df_config = origem.carregar_grade_configuracoes()
+    # Lida e gravada em blocos: planilhas grandes não passam inteiras pela memória
+    blocos = (esquema.destipar_lancamentos(bloco) for bloco in origem.ler_em_blocos())
+    return ArmazenamentoSQLite(arquivo_db).importar(blocos, df_config)
+
+
+def exportar_sqlite_para_excel(arquivo_db=ARQUIVO_DB, arquivo_excel=ARQUIVO_EXCEL):
+    """Regenera a planilha (abas Lançamentos e Configurações) a partir do banco SQLite"""
+    origem = ArmazenamentoSQLite(arquivo_db)
+    df_lancamentos = origem.carregar_lancamentos()
+    df_config = origem.carregar_grade_configuracoes()
+
+    temporario = f"{arquivo_excel}.tmp"
+    with open(temporario, 'wb') as f, pd.ExcelWriter(f, engine='openpyxl') as writer:
+        df_lancamentos.to_excel(writer, sheet_name='Lançamentos', index=False)
+        df_config.to_excel(writer, sheet_name='Configurações', index=False, header=False)
+    os.replace(temporario, arquivo_excel)
+    return len(df_lancamentos)
+
+
+class LivroCaixa:
+    """Cópia residente em memória dos lançamentos de um backend.
+
+    É carregada uma vez e mantida em dia incrementalmente: lançamentos gravados por
+    este processo são aplicados direto na memória, e alterações feitas por outros
+    processos (ex.: o app Streamlit) são detectadas pela versão do armazenamento,
+    disparando uma nova leitura só quando ela muda.
+
+    Também mantém um rollup diário por Tipo (indices.RollupDiario) e um índice das
+    linhas por Data (indices.IndiceDatas), reconstruídos a cada releitura e
+    atualizados a cada lançamento gravado por este processo.
+
+    O DataFrame em memória segue o esquema tipado de esquema.py (Valor em centavos,
+    colunas categóricas), aplicado a cada leitura do backend.
+    """
+
+    def __init__(self, armazenamento):
+        self.armazenamento = armazenamento
+        self._trava = threading.RLock()
+        self._df = None
+        self._versao = None
+        self._pendentes = []
+        self._rollup = RollupDiario()
+        self._agregados = AgregadosResumo()
+        self._indice_datas = IndiceDatas.de_lancamentos(pd.DataFrame())
+        self._consulta = None
+
+    def sincronizar(self):
+        """Relê o armazenamento se a versão mudou desde a última leitura"""
+        backend = type(self.armazenamento).__name__
+        with DURACAO_ARMAZENAMENTO.medir(operacao='versao_lancamentos', backend=backend):
+            versao = self.armazenamento.versao_lancamentos()
+        with self._trava:
+            if versao != self._versao:
+                with DURACAO_ARMAZENAMENTO.medir(operacao='carregar_lancamentos', backend=backend):
+                    df = self.armazenamento.carregar_lancamentos()
+                with DURACAO_AGREGACOES.medir(agregacao='tipar_lancamentos'):
+                    self._df = esquema.tipar_lancamentos(df)
+                self._versao = versao
+                self._pendentes = []
+                with DURACAO_AGREGACOES.medir(agregacao='rollup_diario'):
+                    self._rollup = RollupDiario.de_lancamentos(self._df)
+                with DURACAO_AGREGACOES.medir(agregacao='agregados_resumo'):
+                    self._agregados = AgregadosResumo.de_lancamentos(self._df)
+                with DURACAO_AGREGACOES.medir(agregacao='indice_datas'):
+                    self._indice_datas = IndiceDatas.de_lancamentos(self._df)
+                self._consulta = None
+
+    def lancamentos(self):
+        """DataFrame tipado atual dos lançamentos (somente leitura; Valor em centavos)"""
+        self.sincronizar()
+        with self._trava:
+            if self._pendentes:
+                # Inserções recentes são anexadas de uma vez só, na próxima leitura
+                with DURACAO_AGREGACOES.medir(agregacao='anexar_pendentes'):
+                    novos = esquema.tipar_lancamentos(pd.DataFrame(self._pendentes))
+                    self._df = esquema.anexar_lancamentos(self._df, novos)
+                self._pendentes = []
+            return self._df
+
+    def tamanho(self):
+        """Número de lançamentos na cópia em memória, sem consultar o armazenamento"""
+        # Leitura sem a trava: usada em registros de log, não pode esperar uma gravação
+        df = self._df
+        return (len(df) if df is not None else 0) + len(self._pendentes)
+
+    def consulta(self):
+        """Motor de consulta (indices.ConsultaLancamentos) da versão atual, montado sob demanda"""
+        df = self.lancamentos()
+        with self._trava:
+            # O DataFrame é substituído (nunca alterado) a cada mudança
+            if self._consulta is None or self._consulta[0] is not df:
+                with DURACAO_AGREGACOES.medir(agregacao='consulta_lancamentos'):
+                    self._consulta = (df, ConsultaLancamentos(df))
+            return self._consulta[1]
+
+    def versao(self):
+        """Versão do armazenamento refletida pela cópia em memória"""
+        self.sincronizar()
+        return self._versao
+
+    def totais_por_tipo(self, inicio=None, fim=None):
+        """Soma de Valor (em reais) por Tipo entre os dias inicio e fim, em O(log n) pelo rollup"""
+        self.sincronizar()
+        with self._trava, DURACAO_AGREGACOES.medir(agregacao='totais_por_tipo'):
+            return self._rollup.totais(inicio, fim)
+
+    def resumo(self):
+        """Totais da aba Resumo (formato de agregacoes.resumo), das tabelas mantidas a cada inserção"""
+        self.sincronizar()
+        with self._trava, DURACAO_AGREGACOES.medir(agregacao='resumo'):
+            return self._agregados.resumo()
+
+    def ultimos(self, quantidade=5, ate=None):
+        """Os N lançamentos mais recentes até o dia ate (inclusivo), do mais recente ao mais antigo"""
+        # Sob a trava: o índice e o DataFrame precisam ser da mesma versão
+        with self._trava:
+            df = self.lancamentos()
+            with DURACAO_AGREGACOES.medir(agregacao='ultimos'):
+                return df.iloc[self._indice_datas.ultimas(quantidade, ate)]
+
+    def ultimo(self, ate=None):
+        """Lançamento mais recente até o dia ate (Series), ou None"""
+        ultimos = self.ultimos(1, ate)
+        return None if ultimos.empty else ultimos.iloc[0]
+
+    def proximo(self, tipo, inicio):
+        """Primeiro dia a partir de inicio com lançamentos do Tipo e seu total em reais, ou None"""
+        self.sincronizar()
+        with self._trava:
+            return self._rollup.proximo_dia(tipo, inicio)
+
+    def adicionar_lancamento(self, data, descricao, categoria, tipo, valor, metodo, status='Realizado'):
+        """Grava o lançamento no armazenamento e o aplica na cópia em memória"""
+        self.adicionar_lancamentos([novo_lancamento(data, descricao, categoria, tipo, valor, metodo, status)])
+
+    def adicionar_lancamentos(self, lancamentos):
+        """Grava os lançamentos em um único commit e os aplica na cópia em memória.
+
+        Retorna o par de versões informado pelo armazenamento.
+        """
+        # Um Valor inválido recusa o grupo inteiro antes de gravar
+        centavos = [esquema.para_centavos(lancamento['Valor']) for lancamento in lancamentos]
+        with self._trava:
+            with DURACAO_ARMAZENAMENTO.medir(operacao='adicionar_lancamentos', backend=type(self.armazenamento).__name__):
+                versao_anterior, versao_nova = self.armazenamento.adicionar_lancamentos(lancamentos)
+            LANCAMENTOS_GRAVADOS.incrementar(len(lancamentos))
+            if self._df is not None and versao_anterior == self._versao:
+                # Linha que cada lançamento ocupará quando os pendentes forem anexados
+                posicao = len(self._df) + len(self._pendentes)
+                self._pendentes.extend(lancamentos)
+                self._versao = versao_nova
+                for deslocamento, (lancamento, valor) in enumerate(zip(lancamentos, centavos)):
+                    self._rollup.adicionar(lancamento['Data'], lancamento['Tipo'], valor)
+                    self._agregados.adicionar(lancamento['Tipo'], lancamento['Categoria'], lancamento['Método'], valor)
+                    self._indice_datas.adicionar(lancamento['Data'], posicao + deslocamento)
+            else:
+                # Outro processo gravou no meio: a próxima leitura sincroniza tudo
+                self._versao = None
+        return versao_anterior, versao_nova
+
+
+class CatalogoConfiguracoes:
+    """Categorias, métodos e tipos cadastrados, relidos só quando a aba Configurações muda.
+
+    A cada consulta compara a versão do armazenamento; se ela mudou, relê a grade e só
+    troca o catálogo (e incrementa `versao`) quando o conteúdo é de fato diferente.
+    Consumidores podem usar `versao` como chave de objetos derivados, como teclados.
+    """
+
+    def __init__(self, armazenamento):
+        self.armazenamento = armazenamento
+        self._trava = threading.Lock()
+        self._versao_armazenamento = None
+        self._configuracoes = None
+        self.versao = 0
+
+    def configuracoes(self):
+        """Dicionário de configurações atual (somente leitura)"""
+        versao_armazenamento = self.armazenamento.versao_configuracoes()
+        with self._trava:
+            if versao_armazenamento != self._versao_armazenamento:
+                with DURACAO_ARMAZENAMENTO.medir(operacao='carregar_configuracoes', backend=type(self.armazenamento).__name__):
+                    configuracoes = self.armazenamento.carregar_configuracoes()
+                if configuracoes != self._configuracoes:
+                    self._configuracoes = configuracoes
+                    self.versao += 1
+                self._versao_armazenamento = versao_armazenamento
+            return self._configuracoes
+
+
+_armazenamento = None
+_armazenamento_trava = threading.Lock()
+_livro_caixa = None
+_catalogo = None
+_armazenamentos_contas = {}
+_livros_contas = {}
+
+
+def arquivo_conta(conta, extensao):
+    """Caminho do armazenamento próprio da conta (contas/<conta>.<extensao>)"""
+    conta = str(conta)
+    if not _CONTA_VALIDA.fullmatch(conta):
+        raise ValueError(f"Conta inválida: {conta!r}")
+    os.makedirs(DIRETORIO_CONTAS, exist_ok=True)
+    return os.path.join(DIRETORIO_CONTAS, f"{conta}.{extensao}")
+
+
+def _criar_planilha_vazia(arquivo_excel):
+    """Planilha só com os cabeçalhos, para o backend Excel de uma conta nova"""
+    temporario = f"{arquivo_excel}.tmp"
+    with open(temporario, 'wb') as f, pd.ExcelWriter(f, engine='openpyxl') as writer:
+        pd.DataFrame(columns=COLUNAS).to_excel(writer, sheet_name='Lançamentos', index=False)
+        pd.DataFrame().to_excel(writer, sheet_name='Configurações', index=False, header=False)
+    os.replace(temporario, arquivo_excel)
+
+
+def criar_armazenamento_local(conta=None):
+    """Cria o backend local configurado em ARMAZENAMENTO ("sqlite" ou "excel").
+
+    Com conta, o backend é o arquivo próprio da conta em DIRETORIO_CONTAS, criado vazio
+    na primeira utilização.
+    """
+    backend = os.getenv('ARMAZENAMENTO', 'sqlite').lower()
+    if conta is not None:
+        if backend == 'excel':
+            arquivo = arquivo_conta(conta, 'xlsx')
+            with _trava_arquivo(f"{arquivo}.criacao.lock"):
+                if not os.path.exists(arquivo):
+                    _criar_planilha_vazia(arquivo)
+            return ArmazenamentoExcel(arquivo)
+        if backend == 'sqlite':
+            return ArmazenamentoSQLite(arquivo_conta(conta, 'db'))
+        raise ValueError(f"Backend de armazenamento desconhecido: {backend}")
+    if backend == 'excel':
+        return ArmazenamentoExcel()
+    if backend == 'sqlite':
+        # App e bot podem subir juntos: só um deles faz a migração inicial
+        with _trava_arquivo(f"{ARQUIVO_DB}.migracao.lock"):
+            if not os.path.exists(ARQUIVO_DB) and os.path.exists(ARQUIVO_EXCEL):
+                migrar_excel_para_sqlite()
+        return ArmazenamentoSQLite()
+    raise ValueError(f"Backend de armazenamento desconhecido: {backend}")
+
+
+def _criar_armazenamento(conta=None):
+    endereco = os.getenv('SERVICO_LANCAMENTOS')
+    if endereco:
+        from servico_lancamentos import ArmazenamentoServico
+        return ArmazenamentoServico(endereco, conta)
+    return criar_armazenamento_local(conta)
+
+
+def obter_armazenamento(conta=None):
+    """Retorna o armazenamento do processo (ou o da conta, se informada).
+
+    Com SERVICO_LANCAMENTOS definido (host:porta), todas as leituras e gravações passam
+    pelo serviço local de lançamentos; caso contrário, usa o backend local.
+    """
+    global _armazenamento
+    with _armazenamento_trava:
+        if conta is not None:
+            conta = str(conta)
+            if conta not in _armazenamentos_contas:
+                _armazenamentos_contas[conta] = _criar_armazenamento(conta)
+            return _armazenamentos_contas[conta]
+        if _armazenamento is None:
+            _armazenamento = _criar_armazenamento()
+        return _armazenamento
+
+
+def definir_armazenamento(armazenamento):
+    """Troca o armazenamento do processo (e descarta livros-caixa e catálogo associados)"""
+    global _armazenamento, _livro_caixa, _catalogo
+    with _armazenamento_trava:
+        _armazenamento = armazenamento
+        _livro_caixa = None
+        _catalogo = None
+        _armazenamentos_contas.clear()
+        _livros_contas.clear()
+
+
+def obter_livro_caixa(conta=None):
+    """Retorna o livro-caixa residente do processo sobre o backend configurado.
+
+    Com conta, o livro-caixa próprio dela: lançamentos, trava, rollup e índices separados
+    dos das demais contas, carregados na primeira utilização.
+    """
+    global _livro_caixa
+    armazenamento = obter_armazenamento(conta)
+    with _armazenamento_trava:
+        if conta is not None:
+            conta = str(conta)
+            if conta not in _livros_contas:
+                _livros_contas[conta] = LivroCaixa(armazenamento)
+            return _livros_contas[conta]
+        if _livro_caixa is None:
+            _livro_caixa = LivroCaixa(armazenamento)
+        return _livro_caixa
+
+
+def livro_caixa_carregado(conta=None):
+    """Livro-caixa (da conta) já criado no processo, ou None; não cria arquivos nem conexões"""
+    with _armazenamento_trava:
+        if conta is not None:
+            return _livros_contas.get(str(conta))
+        return _livro_caixa
+
+
+def obter_catalogo():
+    """Retorna o catálogo de configurações do processo sobre o backend configurado"""
+    global _catalogo
+    armazenamento = obter_armazenamento()
+    with _armazenamento_trava:
+        if _catalogo is None:
+            _catalogo = CatalogoConfiguracoes(armazenamento)
+        return _catalogo
+
+
+def carregar_lancamentos():
+    """Carrega os lançamentos do backend configurado"""
+    return obter_armazenamento().carregar_lancamentos()
+
+
+def adicionar_lancamento(data, descricao, categoria, tipo, valor, metodo, status='Realizado'):
+    """Adiciona um novo lançamento no backend configurado"""
+    obter_armazenamento().adicionar_lancamento(data, descricao, categoria, tipo, valor, metodo, status)
+
+
+def adicionar_lancamentos(lancamentos):
+    """Adiciona vários lançamentos (registros de novo_lancamento) em um único commit"""
+    obter_armazenamento().adicionar_lancamentos(lancamentos)
+
+
+def carregar_configuracoes():
+    """Categorias, métodos e tipos do backend configurado, via catálogo do processo"""
+    return obter_catalogo().configuracoes()
+
+
+def versao_lancamentos():
+    """Versão atual dos lançamentos no backend configurado"""
+    return obter_armazenamento().versao_lancamentos()
+
+
+def totais_por_tipo(inicio=None, fim=None):
+    """Soma de Valor por Tipo entre os dias inicio e fim no backend configurado"""
+    return obter_armazenamento().totais_por_tipo(inicio, fim)
+
+
+def carregar_periodo(inicio=None, fim=None):
+    """Lançamentos entre os dias inicio e fim no backend configurado"""
+    return obter_armazenamento().carregar_periodo(inicio, fim)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manutenção do armazenamento de lançamentos")
+    parser.add_argument('comando', choices=['migrar', 'exportar', 'compactar', 'resumo'])
+    parser.add_argument('--excel', default=ARQUIVO_EXCEL, help="Caminho da planilha")
+    parser.add_argument('--db', default=ARQUIVO_DB, help="Caminho do banco SQLite")
+    parser.add_argument('--conta', help="Resumo do armazenamento de uma conta (contas/<conta>)")
+    args = parser.parse_args()
+
+    if args.comando == 'migrar':
+        total = migrar_excel_para_sqlite(args.excel, args.db)
+        print(f"✅ {total} lançamentos migrados de {args.excel} para {args.db}")
+    elif args.comando == 'exportar':
+        total = exportar_sqlite_para_excel(args.db, args.excel)
+        print(f"✅ {total} lançamentos exportados de {args.db} para {args.excel}")
+    elif args.comando == 'resumo':
+        # Fora da memória: só um bloco de lançamentos por vez, qualquer que seja o histórico
+        if args.conta is not None:
+            origem = criar_armazenamento_local(args.conta)
+        elif os.getenv('ARMAZENAMENTO', 'sqlite').lower() == 'excel':
+            origem = ArmazenamentoExcel(args.excel)
+        else:
+            origem = ArmazenamentoSQLite(args.db)
+        resumo = agregacoes.resumo(origem.ler_em_blocos())
+        print(f"💚 Receitas: R$ {resumo['receitas']:,.2f}")
+        print(f"❤️ Despesas: R$ {resumo['despesas']:,.2f}")
+        print(f"💙 Saldo: R$ {resumo['receitas'] - resumo['despesas']:,.2f}")
+        for titulo, chave in [("Despesas por Categoria", 'despesas_por_categoria'),
+                              ("Receitas por Categoria", 'receitas_por_categoria'),
+                              ("Métodos de Pagamento", 'por_metodo')]:
+            print(f"\n{titulo}:")
+            for nome, total in resumo[chave].items():
+                print(f"   {nome:<20} R$ {total:>14,.2f}")
+    else:
+        total = ArmazenamentoExcel(args.excel).compactar()
+        if total is None:
+            print("⚠️  Outra compactação já está em andamento.")
+            sys.exit(1)
+        print(f"✅ {total} lançamentos incorporados à planilha")
+
+
+if __name__ == '__main__':
+    main()
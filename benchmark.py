@@ -0,0 +1,274 @@
+"""
+Benchmark dos caminhos críticos do app e do bot sobre ledgers sintéticos.
+
+Gera planilhas planilha_financeira.xlsx realistas (abas Lançamentos e Configurações)
+com o número de linhas pedido, carrega cada uma nos backends de armazenamento e mede:
+carregar_lancamentos, as leituras por período, o resumo em blocos, os dois adicionar_lancamento (app e
+bot), calcular_saldo, a consulta do /historico, o filtro da aba Visualizar Lançamentos
+e os agrupamentos da aba Resumo (recalculados e pelo livro-caixa). O resultado vai para um relatório JSON, para comparar execuções e backends.
+
+Uso:
+    python benchmark.py --linhas 1000 10000 100000 --backends sqlite excel
+    python benchmark.py --comparar benchmark_anterior.json
+    python benchmark.py --gerar planilha_sintetica.xlsx --linhas 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+import agregacoes
+import armazenamento
+from indices import ConsultaLancamentos
+
+# Configurações usadas nas planilhas sintéticas
+NECESSIDADES = ['Moradia', 'Alimentação', 'Saúde', 'Transporte', 'Educação', 'Contas']
+DESEJOS = ['Lazer', 'Restaurantes', 'Viagem', 'Compras', 'Assinaturas']
+INVESTIMENTOS = ['Ações', 'Renda Fixa', 'Previdência']
+METODOS = ['Pix', 'Crédito', 'Débito', 'Dinheiro', 'Boleto']
+TIPOS = ['Receita', 'Despesa']
+DESCRICOES = ['Almoço', 'Mercado', 'Aluguel', 'Uber', 'Farmácia', 'Cinema', 'Salário',
+              'Freelance', 'Luz', 'Internet', 'Academia', 'Streaming', 'Padaria', 'Aporte']
+
+# Tamanhos padrão (linhas de lançamentos)
+TAMANHOS_PADRAO = [1_000, 10_000, 100_000]
+
+
+def gerar_lancamentos(linhas, semente=42, hoje=None):
+    """DataFrame sintético de lançamentos: ~3 anos de histórico e ~2 meses futuros"""
+    rng = np.random.default_rng(semente)
+    hoje = pd.Timestamp(hoje or datetime.now().date())
+    categorias = NECESSIDADES + DESEJOS + INVESTIMENTOS
+
+    dias = rng.integers(-3 * 365, 60, linhas)
+    segundos = rng.integers(0, 86_400, linhas)
+    datas = hoje + pd.to_timedelta(dias, unit='D') + pd.to_timedelta(segundos, unit='s')
+    tipos = np.where(rng.random(linhas) < 0.2, 'Receita', 'Despesa')
+    valores = np.round(rng.lognormal(mean=4.0, sigma=1.0, size=linhas), 2)
+    valores = np.where(tipos == 'Receita', valores * 10, valores).round(2)
+
+    df = pd.DataFrame({
+        'Data': datas,
+        'Descrição': rng.choice(DESCRICOES, linhas),
+        'Categoria': rng.choice(categorias, linhas),
+        'Tipo': tipos,
+        'Valor': valores,
+        'Método': rng.choice(METODOS, linhas),
+        'Status': 'Realizado',
+    })
+    # Histórico em ordem de inserção aproximadamente cronológica
+    return df.sort_values('Data', kind='stable').reset_index(drop=True)
+
+
+def gerar_grade_configuracoes():
+    """Grade da aba Configurações (cabeçalho + uma coluna por grupo)"""
+    colunas = [NECESSIDADES, DESEJOS, INVESTIMENTOS, METODOS, TIPOS]
+    altura = max(len(coluna) for coluna in colunas)
+    linhas = [['Necessidades', 'Desejos', 'Investimentos', 'Métodos', 'Tipos']]
+    for i in range(altura):
+        linhas.append([coluna[i] if i < len(coluna) else None for coluna in colunas])
+    return pd.DataFrame(linhas)
+
+
+def gerar_planilha(caminho, linhas, semente=42):
+    """Grava uma planilha sintética em modo streaming (write_only), com memória limitada"""
+    df = gerar_lancamentos(linhas, semente)
+    grade = gerar_grade_configuracoes()
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Lançamentos')
+    ws.append(armazenamento.COLUNAS)
+    for data, descricao, categoria, tipo, valor, metodo, status in df.itertuples(index=False, name=None):
+        ws.append([data.to_pydatetime(), descricao, categoria, tipo, float(valor), metodo, status])
+
+    wc = wb.create_sheet('Configurações')
+    for linha in grade.itertuples(index=False, name=None):
+        wc.append([None if pd.isna(valor) else valor for valor in linha])
+
+    wb.save(caminho)
+    return df, grade
+
+
+def _estatisticas(tempos):
+    tempos_ms = sorted(t * 1000 for t in tempos)
+    return {
+        'repeticoes': len(tempos_ms),
+        'mediana_ms': round(statistics.median(tempos_ms), 3),
+        'p95_ms': round(tempos_ms[min(len(tempos_ms) - 1, int(0.95 * len(tempos_ms)))], 3),
+        'min_ms': round(tempos_ms[0], 3),
+        'max_ms': round(tempos_ms[-1], 3),
+    }
+
+
+def medir(funcao, repeticoes):
+    """Executa funcao `repeticoes` vezes e retorna as estatísticas de tempo"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return _estatisticas(tempos)
+
+
+def _agrupamentos_tab3(df):
+    """Agrupamentos da aba Resumo recalculados sobre o histórico inteiro (referência para o resumo do livro-caixa)"""
+    return agregacoes.resumo([df])
+
+
+def _filtro_tab2(livro, hoje):
+    """Filtro típico da aba Visualizar Lançamentos: últimos 90 dias, algumas categorias, 1ª página por Valor"""
+    consulta = livro.consulta()
+    faixa = consulta.filtrar(
+        hoje - pd.Timedelta(days=90), hoje,
+        Tipo=['Receita', 'Despesa'],
+        Categoria=NECESSIDADES[:3] + DESEJOS[:2]
+    )
+    return consulta.pagina(faixa, numero=1, tamanho=50, coluna='Valor', decrescente=True), consulta.totais_por_tipo(faixa)
+
+
+def _preparar_backend(nome, diretorio, df, grade, linhas):
+    if nome == 'sqlite':
+        backend = armazenamento.ArmazenamentoSQLite(os.path.join(diretorio, f"ledger_{linhas}.db"))
+        backend.importar(df, grade)
+        return backend
+    if nome == 'excel':
+        caminho = os.path.join(diretorio, f"ledger_{linhas}.xlsx")
+        if not os.path.exists(caminho):
+            gerar_planilha(caminho, linhas)
+        return armazenamento.ArmazenamentoExcel(caminho)
+    raise ValueError(f"Backend desconhecido: {nome}")
+
+
+def executar_cenario(nome_backend, linhas, repeticoes, diretorio):
+    """Mede todos os caminhos críticos para um backend e um tamanho de ledger"""
+    import bot_telegram
+
+    df, grade = gerar_lancamentos(linhas), gerar_grade_configuracoes()
+    backend = _preparar_backend(nome_backend, diretorio, df, grade, linhas)
+    armazenamento.definir_armazenamento(backend)
+    livro = armazenamento.obter_livro_caixa()
+    hoje = pd.Timestamp(datetime.now().date())
+
+    resultados = {}
+
+    # Leitura completa do armazenamento (o que cada processo fazia por consulta)
+    resultados['carregar_lancamentos'] = medir(backend.carregar_lancamentos, max(1, repeticoes // 2))
+
+    # Leituras por período direto no backend (no SQLite, só as partições do intervalo)
+    resultados['carregar_periodo_30_dias'] = medir(lambda: backend.carregar_periodo(hoje - pd.Timedelta(days=30), hoje), repeticoes)
+    resultados['totais_por_tipo_backend'] = medir(lambda: backend.totais_por_tipo(fim=hoje), repeticoes)
+
+    # Resumo da aba 3 em fluxo, direto do disco, com memória limitada a um bloco
+    resultados['resumo_em_blocos'] = medir(lambda: agregacoes.resumo(backend.ler_em_blocos()), max(1, repeticoes // 2))
+
+    # Hidratação do livro-caixa, feita uma vez por processo
+    resultados['sincronizar_livro_caixa'] = medir(lambda: (armazenamento.definir_armazenamento(backend), armazenamento.obter_livro_caixa().sincronizar()), 1)
+    livro = armazenamento.obter_livro_caixa()
+
+    # adicionar_lancamento do app (grava e aplica no livro-caixa do processo)
+    contador = iter(range(10 ** 9))
+    resultados['adicionar_lancamento_app'] = medir(
+        lambda: livro.adicionar_lancamento(hoje, f"bench app {next(contador)}", 'Lazer', 'Despesa', 12.5, 'Pix'),
+        repeticoes
+    )
+
+    # adicionar_lancamento do bot (tarefa de escrita com group commit, fora do event loop)
+    async def inserir_pelo_bot():
+        await bot_telegram.iniciar_servicos(None)
+        tempos = []
+        for i in range(repeticoes):
+            inicio = time.perf_counter()
+            await bot_telegram.adicionar_lancamento(datetime.now(), f"bench bot {i}", 'Lazer', 'Despesa', 7.0, 'Pix')
+            tempos.append(time.perf_counter() - inicio)
+        await bot_telegram.GRAVADORES.parar()
+        return tempos
+    resultados['adicionar_lancamento_bot'] = _estatisticas(asyncio.run(inserir_pelo_bot()))
+
+    resultados['calcular_saldo'] = medir(bot_telegram.calcular_saldo, repeticoes)
+    resultados['historico'] = medir(lambda: bot_telegram.ultimos_realizados(5), repeticoes)
+    resultados['indice_tab2'] = medir(lambda: ConsultaLancamentos(livro.lancamentos()), max(1, repeticoes // 2))
+    resultados['filtro_tab2'] = medir(lambda: _filtro_tab2(livro, hoje), repeticoes)
+    resultados['agrupamentos_tab3'] = medir(lambda: _agrupamentos_tab3(livro.lancamentos()), repeticoes)
+    resultados['resumo_tab3'] = medir(livro.resumo, repeticoes)
+
+    return [
+        {'backend': nome_backend, 'linhas': linhas, 'operacao': operacao, **estatisticas}
+        for operacao, estatisticas in resultados.items()
+    ]
+
+
+def comparar(resultados, caminho_anterior, tolerancia=0.2):
+    """Compara as medianas com um relatório anterior e lista as operações mais lentas"""
+    with open(caminho_anterior, encoding='utf-8') as f:
+        anteriores = {
+            (r['backend'], r['linhas'], r['operacao']): r['mediana_ms']
+            for r in json.load(f)['resultados']
+        }
+
+    regressoes = []
+    for resultado in resultados:
+        anterior = anteriores.get((resultado['backend'], resultado['linhas'], resultado['operacao']))
+        if not anterior:
+            continue
+        resultado['mediana_anterior_ms'] = anterior
+        resultado['variacao'] = round(resultado['mediana_ms'] / anterior - 1, 3)
+        if resultado['variacao'] > tolerancia:
+            regressoes.append(resultado)
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos caminhos críticos do app e do bot")
+    parser.add_argument('--linhas', type=int, nargs='+', default=TAMANHOS_PADRAO, help="Tamanhos de ledger a medir")
+    parser.add_argument('--backends', nargs='+', default=['sqlite', 'excel'], choices=['sqlite', 'excel'])
+    parser.add_argument('--repeticoes', type=int, default=20, help="Repetições por operação")
+    parser.add_argument('--saida', default='benchmark_resultados.json', help="Relatório JSON de saída")
+    parser.add_argument('--comparar', metavar='RELATORIO', help="Relatório anterior para detectar regressões")
+    parser.add_argument('--gerar', metavar='ARQUIVO', help="Só gera uma planilha sintética (com o maior --linhas) e sai")
+    args = parser.parse_args()
+
+    if args.gerar:
+        linhas = max(args.linhas)
+        inicio = time.perf_counter()
+        gerar_planilha(args.gerar, linhas)
+        print(f"✅ Planilha com {linhas} lançamentos gerada em {args.gerar} ({time.perf_counter() - inicio:.1f}s)")
+        return
+
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix='benchmark_lancamentos_') as diretorio:
+        for nome_backend in args.backends:
+            for linhas in args.linhas:
+                print(f"⏱️  {nome_backend} com {linhas} lançamentos...")
+                for resultado in executar_cenario(nome_backend, linhas, args.repeticoes, diretorio):
+                    resultados.append(resultado)
+                    print(f"   {resultado['operacao']:<26} mediana {resultado['mediana_ms']:>10.3f} ms   p95 {resultado['p95_ms']:>10.3f} ms")
+
+    regressoes = comparar(resultados, args.comparar) if args.comparar else []
+    for r in regressoes:
+        print(f"⚠️  Regressão: {r['backend']} {r['linhas']} {r['operacao']} "
+              f"{r['mediana_anterior_ms']:.3f} ms → {r['mediana_ms']:.3f} ms ({r['variacao']:+.0%})")
+
+    relatorio = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'pandas': pd.__version__,
+        'repeticoes': args.repeticoes,
+        'resultados': resultados,
+    }
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"\n📄 Relatório salvo em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,422 @@
+"""
+Servidor local que imita a Bot API do Telegram, para medir o bot sem rede.
+
+Atende o subconjunto de métodos usado pelo bot_telegram.py (getMe, getUpdates,
+setWebhook, deleteWebhook, getWebhookInfo, sendMessage). Mensagens de usuários
+simulados são entregues ao bot por long polling (getUpdates) ou por POST no webhook
+registrado, e cada sendMessage do bot é registrado como resposta ao chat.
+
+Pela linha de comando, sobe o servidor, inicia o bot_telegram.py apontado para ele
+(BOT_API_URL) e mede a latência de ponta a ponta (mensagem enviada → resposta do bot)
+e a vazão com vários usuários simultâneos, cada um mandando a próxima mensagem só
+depois de receber a resposta da anterior.
+
+Uso:
+    python bot_api_local.py --modo polling --usuarios 10 --repeticoes 20
+    python bot_api_local.py --modo webhook --concorrentes 8 --comandos /saldo /historico
+    python bot_api_local.py --apenas-servidor   # para um bot iniciado à parte
+
+O bot usa os lançamentos do diretório atual: rode em uma cópia dos dados.
+"""
+import argparse
+import json
+import os
+import queue
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+# Endereço padrão do servidor local
+HOST_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 8081
+
+# Token usado pelo bot durante as medições (não é validado)
+TOKEN_LOCAL = "123456:LOCAL"
+
+# Usuário do bot devolvido por getMe
+USUARIO_BOT = {'id': 123456, 'is_bot': True, 'first_name': "Controle Financeiro", 'username': "controle_local_bot"}
+
+# Espera máxima por uma resposta do bot a cada mensagem
+TIMEOUT_RESPOSTA = 30
+
+# Métodos da Bot API atendidos, em /bot<token>/<método>
+METODOS = ('getMe', 'getUpdates', 'setWebhook', 'deleteWebhook', 'getWebhookInfo', 'sendMessage')
+_CAMINHO_METODO = re.compile(r'^/bot[^/]+/(\w+)$')
+
+
+class ErroBotApi(Exception):
+    """Erro devolvido pela Bot API local ({"ok": false})"""
+
+
+class BotApiLocal:
+    """Bot API em memória: fila de updates, webhook registrado e respostas por chat"""
+
+    def __init__(self, host=HOST_PADRAO, porta=PORTA_PADRAO):
+        self._condicao = threading.Condition()
+        self._atualizacoes = []
+        self._proximo_update = 1
+        self._proxima_mensagem = 1
+        self._webhook = None
+        self._entregas = None
+        self._respostas = {}
+        # Sinalizado quando o bot começa a receber updates (getUpdates ou setWebhook)
+        self.pronto = threading.Event()
+
+        self.servidor = ThreadingHTTPServer((host, porta), _TratadorBotApi)
+        self.servidor.daemon_threads = True
+        self.servidor.api = self
+
+    @property
+    def url(self):
+        host, porta = self.servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def iniciar(self):
+        threading.Thread(target=self.servidor.serve_forever, name='bot_api_local', daemon=True).start()
+        return self
+
+    def parar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        if self._entregas is not None:
+            self._entregas.shutdown(wait=False, cancel_futures=True)
+
+    # Lado dos usuários simulados
+
+    def enviar_texto(self, chat_id, texto):
+        """Entrega ao bot uma mensagem de texto do usuário chat_id; retorna o update_id"""
+        with self._condicao:
+            update_id = self._proximo_update
+            self._proximo_update += 1
+            mensagem = {
+                'message_id': self._proxima_mensagem,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private', 'first_name': f"Usuário {chat_id}"},
+                'from': {'id': chat_id, 'is_bot': False, 'first_name': f"Usuário {chat_id}"},
+                'text': texto,
+            }
+            self._proxima_mensagem += 1
+            if texto.startswith('/'):
+                comando = texto.split(maxsplit=1)[0]
+                mensagem['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(comando)}]
+            update = {'update_id': update_id, 'message': mensagem}
+            self._fila_respostas(chat_id)
+
+            if self._webhook is not None:
+                self._entregas.submit(self._entregar, self._webhook, update)
+            else:
+                self._atualizacoes.append(update)
+                self._condicao.notify_all()
+        return update_id
+
+    def aguardar_resposta(self, chat_id, timeout=TIMEOUT_RESPOSTA):
+        """Próxima resposta do bot ao chat: (instante perf_counter, texto); None se esgotar o tempo.
+
+        Se a entrega do update ao webhook falhar, a resposta vem com texto None.
+        """
+        try:
+            return self._fila_respostas(chat_id).get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _fila_respostas(self, chat_id):
+        with self._condicao:
+            if chat_id not in self._respostas:
+                self._respostas[chat_id] = queue.Queue()
+            return self._respostas[chat_id]
+
+    def _entregar(self, webhook, update):
+        requisicao = urllib.request.Request(
+            webhook['url'],
+            data=json.dumps(update).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        if webhook.get('secret_token'):
+            requisicao.add_header('X-Telegram-Bot-Api-Secret-Token', webhook['secret_token'])
+        try:
+            with urllib.request.urlopen(requisicao, timeout=TIMEOUT_RESPOSTA) as resposta:
+                resposta.read()
+        except OSError as e:
+            print(f"Erro ao entregar update {update['update_id']} no webhook: {e}")
+            # Quem espera a resposta não deve contar a falha como lentidão do bot
+            self._fila_respostas(update['message']['chat']['id']).put((time.perf_counter(), None))
+
+    # Métodos da Bot API (chamados pelo bot)
+
+    def getMe(self, parametros):
+        return USUARIO_BOT
+
+    def getUpdates(self, parametros):
+        offset = int(parametros.get('offset') or 0)
+        timeout = min(float(parametros.get('timeout') or 0), TIMEOUT_RESPOSTA)
+        limite = int(parametros.get('limit') or 100)
+        self.pronto.set()
+        with self._condicao:
+            # offset confirma (descarta) os updates anteriores a ele
+            self._atualizacoes = [u for u in self._atualizacoes if u['update_id'] >= offset]
+            if not self._atualizacoes and timeout > 0:
+                self._condicao.wait_for(lambda: self._atualizacoes, timeout=timeout)
+            return self._atualizacoes[:limite]
+
+    def setWebhook(self, parametros):
+        url = parametros.get('url')
+        if not url:
+            raise ErroBotApi("Bad Request: url não informada")
+        with self._condicao:
+            self._webhook = {
+                'url': url,
+                'secret_token': parametros.get('secret_token'),
+                'allowed_updates': parametros.get('allowed_updates'),
+                'max_connections': int(parametros.get('max_connections') or 40),
+            }
+            if self._entregas is not None:
+                self._entregas.shutdown(wait=False)
+            # Como no Telegram, max_connections limita as entregas simultâneas
+            self._entregas = ThreadPoolExecutor(max_workers=self._webhook['max_connections'], thread_name_prefix='webhook')
+            pendentes, self._atualizacoes = self._atualizacoes, []
+            for update in pendentes:
+                self._entregas.submit(self._entregar, self._webhook, update)
+        self.pronto.set()
+        return True
+
+    def deleteWebhook(self, parametros):
+        with self._condicao:
+            self._webhook = None
+            if self._entregas is not None:
+                self._entregas.shutdown(wait=False)
+                self._entregas = None
+        return True
+
+    def getWebhookInfo(self, parametros):
+        with self._condicao:
+            webhook = self._webhook or {}
+            return {
+                'url': webhook.get('url', ''),
+                'has_custom_certificate': False,
+                'pending_update_count': len(self._atualizacoes),
+                'max_connections': webhook.get('max_connections', 40),
+                'allowed_updates': webhook.get('allowed_updates') or [],
+            }
+
+    def sendMessage(self, parametros):
+        instante = time.perf_counter()
+        chat_id = int(parametros['chat_id'])
+        with self._condicao:
+            message_id = self._proxima_mensagem
+            self._proxima_mensagem += 1
+        self._fila_respostas(chat_id).put((instante, parametros.get('text', '')))
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': USUARIO_BOT,
+            'text': parametros.get('text', ''),
+        }
+
+    def executar(self, metodo, parametros):
+        if metodo not in METODOS:
+            raise ErroBotApi(f"Not Found: método {metodo} não suportado pela Bot API local")
+        return getattr(self, metodo)(parametros)
+
+
+def _decodificar_parametros(corpo, tipo_conteudo):
+    """Parâmetros de uma chamada: JSON ou formulário com valores serializados em JSON"""
+    if not corpo:
+        return {}
+    if tipo_conteudo.startswith('application/json'):
+        return json.loads(corpo)
+    parametros = {}
+    for nome, valor in parse_qsl(corpo.decode('utf-8'), keep_blank_values=True):
+        if nome == 'text':
+            parametros[nome] = valor
+            continue
+        try:
+            parametros[nome] = json.loads(valor)
+        except ValueError:
+            parametros[nome] = valor
+    return parametros
+
+
+class _TratadorBotApi(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalhos e corpo saem em escritas separadas: sem isso, o Nagle somado ao ACK
+    # atrasado do cliente acrescenta dezenas de ms a cada chamada na conexão keep-alive
+    disable_nagle_algorithm = True
+
+    def _atender(self):
+        casamento = _CAMINHO_METODO.match(self.path.split('?')[0])
+        if casamento is None:
+            self._responder(404, {'ok': False, 'error_code': 404, 'description': "Not Found"})
+            return
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        corpo = self.rfile.read(tamanho) if tamanho else b''
+        try:
+            parametros = _decodificar_parametros(corpo, self.headers.get('Content-Type', ''))
+            resultado = self.server.api.executar(casamento.group(1), parametros)
+            self._responder(200, {'ok': True, 'result': resultado})
+        except ErroBotApi as e:
+            self._responder(400, {'ok': False, 'error_code': 400, 'description': str(e)})
+
+    do_GET = _atender
+    do_POST = _atender
+
+    def _responder(self, status, resposta):
+        corpo = json.dumps(resposta, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def _estatisticas(latencias):
+    latencias_ms = sorted(t * 1000 for t in latencias)
+    if not latencias_ms:
+        return {}
+    return {
+        'mensagens': len(latencias_ms),
+        'mediana_ms': round(statistics.median(latencias_ms), 3),
+        'p95_ms': round(latencias_ms[min(len(latencias_ms) - 1, int(0.95 * len(latencias_ms)))], 3),
+        'min_ms': round(latencias_ms[0], 3),
+        'max_ms': round(latencias_ms[-1], 3),
+    }
+
+
+def medir_carga(api, usuarios, comandos, repeticoes, primeiro_chat=1000):
+    """Cada usuário envia os comandos `repeticoes` vezes, esperando cada resposta.
+
+    Retorna as estatísticas de latência, a vazão (mensagens/s), os timeouts e as falhas
+    de entrega ao webhook (contadas à parte, fora das latências).
+    """
+    latencias = []
+    timeouts = []
+    falhas_entrega = []
+    trava = threading.Lock()
+
+    def usuario(chat_id):
+        for _ in range(repeticoes):
+            for comando in comandos:
+                inicio = time.perf_counter()
+                api.enviar_texto(chat_id, comando)
+                resposta = api.aguardar_resposta(chat_id)
+                with trava:
+                    if resposta is None:
+                        timeouts.append(comando)
+                    elif resposta[1] is None:
+                        falhas_entrega.append(comando)
+                    else:
+                        latencias.append(resposta[0] - inicio)
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=usuario, args=(primeiro_chat + i,)) for i in range(usuarios)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    return {
+        **_estatisticas(latencias),
+        'usuarios': usuarios,
+        'duracao_s': round(duracao, 3),
+        'mensagens_por_segundo': round(len(latencias) / duracao, 1) if duracao else 0.0,
+        'timeouts': len(timeouts),
+        'falhas_entrega': len(falhas_entrega),
+    }
+
+
+def iniciar_bot(api, modo, escuta_webhook, concorrentes):
+    """Inicia o bot_telegram.py apontado para a Bot API local"""
+    ambiente = {
+        **os.environ,
+        'TELEGRAM_BOT_TOKEN': TOKEN_LOCAL,
+        'BOT_API_URL': api.url,
+        'BOT_MODO': modo,
+        'ATUALIZACOES_CONCORRENTES': str(concorrentes),
+    }
+    if modo == 'webhook':
+        ambiente['WEBHOOK_ESCUTA'] = escuta_webhook
+        ambiente['WEBHOOK_URL'] = f"http://{escuta_webhook}/telegram"
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot_telegram.py')
+    return subprocess.Popen([sys.executable, script], env=ambiente)
+
+
+def parar_bot(processo):
+    processo.terminate()
+    try:
+        processo.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+        processo.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bot API local para medir o bot sem rede")
+    parser.add_argument('--host', default=HOST_PADRAO)
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--modo', choices=['polling', 'webhook'], default='polling', help="Modo em que o bot recebe os updates")
+    parser.add_argument('--escuta-webhook', default="127.0.0.1:8443", help="host:porta do servidor de webhook do bot")
+    parser.add_argument('--concorrentes', type=int, default=1, help="Updates processados ao mesmo tempo pelo bot")
+    parser.add_argument('--usuarios', type=int, default=10, help="Usuários simulados simultâneos")
+    parser.add_argument('--repeticoes', type=int, default=20, help="Rodadas de comandos por usuário")
+    parser.add_argument('--comandos', nargs='+', default=['/saldo', '/historico'], help="Mensagens enviadas por rodada")
+    parser.add_argument('--saida', help="Relatório JSON de saída")
+    parser.add_argument('--apenas-servidor', action='store_true', help="Só sobe a Bot API local (bot iniciado à parte)")
+    args = parser.parse_args()
+
+    api = BotApiLocal(args.host, args.porta).iniciar()
+    print(f"Bot API local em {api.url} (BOT_API_URL={api.url}, token qualquer)")
+
+    if args.apenas_servidor:
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        api.parar()
+        return
+
+    processo = iniciar_bot(api, args.modo, args.escuta_webhook, args.concorrentes)
+    try:
+        if not api.pronto.wait(timeout=60):
+            print("❌ O bot não começou a receber updates em 60s")
+            return
+        # Aquecimento: carrega teclados e caches antes da medição e, no modo webhook,
+        # espera o servidor do bot aceitar entregas (o setWebhook vem antes dele)
+        limite = time.monotonic() + 60
+        while time.monotonic() < limite:
+            api.enviar_texto(1, '/start')
+            resposta = api.aguardar_resposta(1)
+            if resposta is not None and resposta[1] is not None:
+                break
+            time.sleep(0.2)
+
+        print(f"⏱️  {args.usuarios} usuários × {args.repeticoes} rodadas de {' '.join(args.comandos)} ({args.modo})...")
+        resultado = medir_carga(api, args.usuarios, args.comandos, args.repeticoes)
+    finally:
+        parar_bot(processo)
+        api.parar()
+
+    print(f"   latência mediana {resultado.get('mediana_ms', 0):.3f} ms   p95 {resultado.get('p95_ms', 0):.3f} ms")
+    print(f"   vazão {resultado['mensagens_por_segundo']:.1f} mensagens/s   timeouts {resultado['timeouts']}"
+          f"   falhas de entrega {resultado['falhas_entrega']}")
+
+    if args.saida:
+        relatorio = {'modo': args.modo, 'concorrentes': args.concorrentes, 'comandos': args.comandos, **resultado}
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        print(f"\n📄 Relatório salvo em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,71 +1,293 @@
 import os
+import re
+import asyncio
+import functools
+import logging
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler
 import pandas as pd
-import openpyxl
 from datetime import datetime
 from dotenv import load_dotenv
+import armazenamento
+import log_estruturado
+import metricas
+from esquema import em_reais
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-# Caminho do arquivo Excel
-ARQUIVO_EXCEL = "planilha_financeira.xlsx"
-
 # Estados da conversa
 DESCRICAO, VALOR, TIPO, METODO, CATEGORIA = range(5)
+LOTE_LINHAS, LOTE_CONFIRMACAO = range(5, 7)
+
+# Máximo de lançamentos em um mesmo /lote
+TAMANHO_MAXIMO_LOTE = 100
+
+# Teclado de confirmação do /lote
+CONFIRMAR_LOTE = "✅ Confirmar"
+CANCELAR_LOTE = "❌ Cancelar"
+TECLADO_CONFIRMACAO_LOTE = ReplyKeyboardMarkup([[CONFIRMAR_LOTE, CANCELAR_LOTE]], one_time_keyboard=True, resize_keyboard=True)
+
+# Tipos de update tratados pelo bot: só mensagens (os demais nem são entregues)
+ATUALIZACOES_PERMITIDAS = [Update.MESSAGE]
+
+# Livro-caixa de cada conversa (CONTAS_BOT):
+#   compartilhada - um único livro-caixa, o mesmo do app Streamlit (padrão)
+#   usuario       - um livro-caixa por usuário do Telegram (contas/<id do usuário>)
+#   chat          - um livro-caixa por chat (os membros de um grupo usam o do grupo)
+MODOS_CONTAS = ('compartilhada', 'usuario', 'chat')
+MODO_CONTAS = os.getenv('CONTAS_BOT', 'compartilhada').lower()
+
+# Endereço local em que o servidor do webhook escuta (atrás do proxy HTTPS)
+WEBHOOK_ESCUTA_PADRAO = "127.0.0.1:8443"
+# Conexões simultâneas do Telegram ao webhook (o padrão do próprio Telegram); independe
+# de quantas atualizações o bot processa ao mesmo tempo
+CONEXOES_WEBHOOK_PADRAO = 40
+
+# Teclado com os tipos (fixos)
+TIPOS = ['Receita', 'Despesa']
+TECLADO_TIPOS = ReplyKeyboardMarkup([[tipo] for tipo in TIPOS], one_time_keyboard=True, resize_keyboard=True)
+
+# Teclados de métodos e categorias, reconstruídos só quando o catálogo muda
+_teclados = {'versao': None}
+
+# Executor limitado para as chamadas bloqueantes de armazenamento, fora do event loop
+EXECUTOR_ARMAZENAMENTO = ThreadPoolExecutor(
+    max_workers=int(os.getenv('THREADS_ARMAZENAMENTO', '4')),
+    thread_name_prefix='armazenamento'
+)
+
+# Máximo de lançamentos gravados em um mesmo commit
+TAMANHO_MAXIMO_GRUPO = 500
+
+# Latência por handler (comandos e cada estado da conversa) e por renderização de mensagem
+DURACAO_HANDLERS = metricas.histograma('bot_handler_duracao_segundos', "Duração de cada handler do bot")
+DURACAO_RENDERIZACAO = metricas.histograma('bot_renderizacao_duracao_segundos', "Montagem do texto das respostas")
+TAMANHO_GRUPOS = metricas.histograma(
+    'bot_grupo_commit_lancamentos', "Lançamentos gravados por commit do gravador",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, TAMANHO_MAXIMO_GRUPO)
+)
+
+CONSULTAS_CACHE = metricas.contador('bot_cache_respostas_total', "Consultas ao cache de respostas renderizadas")
+
+# Registros estruturados do bot (log_estruturado.py)
+LOGGER = logging.getLogger('bot')
+
+def conta_do_update(update):
+    """Conta do livro-caixa do update conforme CONTAS_BOT (None é o livro compartilhado)"""
+    if MODO_CONTAS == 'usuario' and update.effective_user is not None:
+        return str(update.effective_user.id)
+    if MODO_CONTAS in ('usuario', 'chat') and update.effective_chat is not None:
+        return str(update.effective_chat.id)
+    return None
+
+def tamanho_livro(conta=None):
+    # Para os registros de log: não cria o livro-caixa de uma conta que só mandou /start
+    livro = armazenamento.livro_caixa_carregado(conta)
+    return livro.tamanho() if livro is not None else 0
+
+def medir_handler(nome):
+    """Mede o handler no histograma e registra cada execução no log estruturado"""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        async def registrada(update, context):
+            conta = conta_do_update(update)
+            campos = {'conta': conta} if conta is not None else {}
+            with log_estruturado.span(LOGGER, nome, lambda: tamanho_livro(conta), **campos):
+                return await funcao(update, context)
+        return DURACAO_HANDLERS.cronometrar(handler=nome)(registrada)
+    return decorador
+
+async def em_executor(funcao, *args):
+    """Executa uma função bloqueante no executor de armazenamento"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(EXECUTOR_ARMAZENAMENTO, functools.partial(funcao, *args))
+
+class GravadorLancamentos:
+    """Tarefa única de escrita de uma conta, com group commit.
+    
+    Handlers enfileiram lançamentos e aguardam a confirmação; enquanto um commit está
+    em andamento, os lançamentos que chegam se acumulam na fila e são gravados juntos
+    no commit seguinte.
+    """
+    
+    def __init__(self, conta=None):
+        self.conta = conta
+        self._fila = None
+        self._tarefa = None
+    
+    def iniciar(self):
+        self._fila = asyncio.Queue()
+        self._tarefa = asyncio.create_task(self._executar())
+    
+    async def parar(self):
+        if self._tarefa is not None:
+            # Gravar o que ainda estiver na fila antes de encerrar
+            await self._fila.join()
+            self._tarefa.cancel()
+            self._tarefa = None
+    
+    async def adicionar(self, lancamento):
+        """Enfileira um lançamento e aguarda até ele estar gravado"""
+        return await self.adicionar_lote([lancamento])
+    
+    async def adicionar_lote(self, lancamentos):
+        """Enfileira vários lançamentos, sempre gravados juntos no mesmo commit"""
+        futuro = asyncio.get_running_loop().create_future()
+        await self._fila.put((lancamentos, futuro))
+        return await futuro
+    
+    async def _executar(self):
+        while True:
+            grupo = [await self._fila.get()]
+            total = len(grupo[0][0])
+            while total < TAMANHO_MAXIMO_GRUPO and not self._fila.empty():
+                grupo.append(self._fila.get_nowait())
+                total += len(grupo[-1][0])
+            
+            lancamentos = [lancamento for lote, _ in grupo for lancamento in lote]
+            TAMANHO_GRUPOS.observar(len(lancamentos))
+            try:
+                livro = await em_executor(armazenamento.obter_livro_caixa, self.conta)
+                campos = {'conta': self.conta} if self.conta is not None else {}
+                with log_estruturado.span(LOGGER, 'gravador', livro.tamanho, grupo=len(lancamentos), **campos):
+                    versao_anterior, versao_nova = await em_executor(livro.adicionar_lancamentos, lancamentos)
+                CACHE_RESPOSTAS.aplicar_gravacao(self.conta, versao_anterior, versao_nova, lancamentos)
+                for _, futuro in grupo:
+                    if not futuro.done():
+                        futuro.set_result(True)
+            except Exception as e:
+                for _, futuro in grupo:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+            finally:
+                for _ in grupo:
+                    self._fila.task_done()
+
+class GravadoresContas:
+    """Um gravador por conta, iniciado (no event loop) na primeira gravação dela.
+    
+    Contas diferentes gravam em paralelo, cada uma no próprio armazenamento; dentro
+    de uma conta, o group commit continua serializando as gravações.
+    """
+    
+    def __init__(self):
+        self._gravadores = {}
+    
+    def da_conta(self, conta):
+        gravador = self._gravadores.get(conta)
+        if gravador is None:
+            gravador = self._gravadores[conta] = GravadorLancamentos(conta)
+            gravador.iniciar()
+        return gravador
+    
+    async def parar(self):
+        for gravador in list(self._gravadores.values()):
+            await gravador.parar()
+        self._gravadores.clear()
+
+GRAVADORES = GravadoresContas()
+
+class CacheRespostas:
+    """Respostas já renderizadas do /saldo e do /historico, separadas por conta.
+    
+    Cada entrada vale para uma versão do livro-caixa da conta e um dia: a virada do dia
+    ou uma gravação feita por outro processo (ex.: o app) mudam a chave e a resposta é
+    renderizada de novo. Gravações do próprio bot descartam só as entradas afetadas
+    da conta (ver aplicar_gravacao).
+    """
+    
+    def __init__(self):
+        self._trava = threading.Lock()
+        # conta -> comando -> ((versão, dia), mensagem)
+        self._entradas = {}
+    
+    def obter(self, conta, comando, chave):
+        """Mensagem guardada para a chave (versão, dia), ou None"""
+        with self._trava:
+            entrada = self._entradas.get(conta, {}).get(comando)
+        acerto = entrada is not None and entrada[0] == chave
+        CONSULTAS_CACHE.incrementar(comando=comando, resultado='acerto' if acerto else 'falta')
+        return entrada[1] if acerto else None
+    
+    def guardar(self, conta, comando, chave, mensagem):
+        with self._trava:
+            self._entradas.setdefault(conta, {})[comando] = (chave, mensagem)
+    
+    def aplicar_gravacao(self, conta, versao_anterior, versao_nova, lancamentos):
+        """Atualiza as entradas da conta após uma gravação deste processo.
+        
+        O /historico só lista lançamentos até o dia da entrada: se todos os novos forem
+        posteriores, ele continua válido na nova versão. O /saldo muda sempre.
+        """
+        with self._trava:
+            entradas = self._entradas.get(conta, {})
+            for comando, ((versao, dia), mensagem) in list(entradas.items()):
+                posteriores = all(
+                    pd.Timestamp(lancamento['Data']).date() > dia
+                    for lancamento in lancamentos if pd.notna(lancamento['Data'])
+                )
+                if versao == versao_anterior and comando == 'historico' and posteriores:
+                    entradas[comando] = ((versao_nova, dia), mensagem)
+                else:
+                    del entradas[comando]
+
+CACHE_RESPOSTAS = CacheRespostas()
 
 # Funções auxiliares
 def carregar_configuracoes():
     """Carrega as configurações da planilha"""
     try:
-        df_config = pd.read_excel(ARQUIVO_EXCEL, sheet_name='Configurações', header=None)
-        
-        necessidades = df_config.iloc[1:, 0].dropna().tolist()
-        desejos = df_config.iloc[1:, 1].dropna().tolist()
-        investimentos = df_config.iloc[1:, 2].dropna().tolist()
-        metodos = df_config.iloc[1:, 3].dropna().tolist()
-        tipos = df_config.iloc[1:, 4].dropna().tolist()
-        
-        todas_categorias = necessidades + desejos + investimentos
-        
-        return {
-            'todas_categorias': todas_categorias,
-            'metodos': metodos,
-            'tipos': tipos
-        }
-    except Exception as e:
-        print(f"Erro ao carregar configurações: {e}")
+        return armazenamento.carregar_configuracoes()
+    except Exception:
+        LOGGER.exception("Erro ao carregar configurações")
         return None
 
-def adicionar_lancamento(data, descricao, categoria, tipo, valor, metodo):
-    """Adiciona um novo lançamento à planilha"""
-    try:
-        wb = openpyxl.load_workbook(ARQUIVO_EXCEL)
-        ws = wb['Lançamentos']
-        
-        ultima_linha = ws.max_row + 1
+def carregar_teclados():
+    """Retorna os teclados de métodos e categorias da versão atual do catálogo"""
+    config = carregar_configuracoes()
+    if config is None:
+        return None
+    
+    versao = armazenamento.obter_catalogo().versao
+    if _teclados['versao'] != versao:
+        # Criar teclado com os métodos
+        metodos = [[metodo] for metodo in config['metodos']]
         
-        ws[f'A{ultima_linha}'] = data
-        ws[f'B{ultima_linha}'] = descricao
-        ws[f'C{ultima_linha}'] = categoria
-        ws[f'D{ultima_linha}'] = tipo
-        ws[f'E{ultima_linha}'] = valor
-        ws[f'F{ultima_linha}'] = metodo
-        ws[f'G{ultima_linha}'] = 'Realizado'
+        # Criar teclado com as categorias (2 por linha para facilitar)
+        categorias = config['todas_categorias']
+        categorias = [categorias[i:i+2] for i in range(0, len(categorias), 2)]
         
-        wb.save(ARQUIVO_EXCEL)
-        wb.close()
+        _teclados.update({
+            'versao': versao,
+            'metodos': ReplyKeyboardMarkup(metodos, one_time_keyboard=True, resize_keyboard=True),
+            'categorias': ReplyKeyboardMarkup(categorias, one_time_keyboard=True, resize_keyboard=True),
+        })
+    
+    return _teclados
+
+async def adicionar_lancamento(data, descricao, categoria, tipo, valor, metodo, conta=None):
+    """Adiciona um novo lançamento ao livro-caixa da conta"""
+    try:
+        await GRAVADORES.da_conta(conta).adicionar(
+            armazenamento.novo_lancamento(data, descricao, categoria, tipo, valor, metodo)
+        )
         
         return True
-    except Exception as e:
-        print(f"Erro ao adicionar lançamento: {e}")
+    except Exception:
+        LOGGER.exception("Erro ao adicionar lançamento")
         return False
 
-def calcular_saldo():
-    """Calcula o saldo realizado e a transcorrer"""
+@armazenamento.DURACAO_AGREGACOES.cronometrar(agregacao='calcular_saldo')
+def calcular_saldo(conta=None):
+    """Calcula o saldo realizado e a transcorrer da conta"""
     try:
-        df = pd.read_excel(ARQUIVO_EXCEL, sheet_name='Lançamentos')
+        livro = armazenamento.obter_livro_caixa(conta)
+        df = livro.lancamentos()
         
         if df.empty:
             return None
@@ -84,65 +306,43 @@ def calcular_saldo():
             ultimo_dia_mes_seguinte = proximo_mes.replace(month=proximo_mes.month + 1, day=1) - pd.Timedelta(days=1)
         
         # Realizados
-        df_realizados = df[df['Data'].dt.date <= hoje.date()]
-        receitas_realizadas = df_realizados[df_realizados['Tipo'] == 'Receita']['Valor'].sum()
-        despesas_realizadas = df_realizados[df_realizados['Tipo'] == 'Despesa']['Valor'].sum()
+        realizados = livro.totais_por_tipo(fim=hoje)
+        receitas_realizadas = realizados.get('Receita', 0.0)
+        despesas_realizadas = realizados.get('Despesa', 0.0)
         saldo_realizado = receitas_realizadas - despesas_realizadas
         
         # A transcorrer
         amanha = hoje + pd.Timedelta(days=1)
-        df_transcorrer = df[
-            (df['Data'].dt.date >= amanha.date()) & 
-            (df['Data'].dt.date <= ultimo_dia_mes_seguinte.date())
-        ]
-        receitas_transcorrer = df_transcorrer[df_transcorrer['Tipo'] == 'Receita']['Valor'].sum()
-        despesas_transcorrer = df_transcorrer[df_transcorrer['Tipo'] == 'Despesa']['Valor'].sum()
-        
-        # Próxima receita (agrupada por data)
-        receitas_futuras = df[
-            (df['Data'].dt.date >= amanha.date()) & 
-            (df['Tipo'] == 'Receita')
-        ]
+        transcorrer = livro.totais_por_tipo(amanha, ultimo_dia_mes_seguinte)
+        receitas_transcorrer = transcorrer.get('Receita', 0.0)
+        despesas_transcorrer = transcorrer.get('Despesa', 0.0)
         
+        # Próxima receita e próxima despesa: primeiro dia a partir de amanhã no rollup
+        # diário, com o total do dia (busca binária, sem agrupar os lançamentos)
         proxima_receita = None
         proxima_receita_data = None
-        if not receitas_futuras.empty:
-            # Agrupar por data e somar os valores
-            receitas_agrupadas = receitas_futuras.groupby('Data')['Valor'].sum().reset_index()
-            receitas_agrupadas = receitas_agrupadas.sort_values('Data')
-            proxima_receita = receitas_agrupadas.iloc[0]['Valor']
-            proxima_receita_data = receitas_agrupadas.iloc[0]['Data']
-        
-        # Próxima despesa (agrupada por data)
-        despesas_futuras = df[
-            (df['Data'].dt.date >= amanha.date()) & 
-            (df['Tipo'] == 'Despesa')
-        ]
+        proxima = livro.proximo('Receita', amanha)
+        if proxima is not None:
+            proxima_receita_data, proxima_receita = proxima
         
         proxima_despesa = None
         proxima_despesa_data = None
-        if not despesas_futuras.empty:
-            # Agrupar por data e somar os valores
-            despesas_agrupadas = despesas_futuras.groupby('Data')['Valor'].sum().reset_index()
-            despesas_agrupadas = despesas_agrupadas.sort_values('Data')
-            proxima_despesa = despesas_agrupadas.iloc[0]['Valor']
-            proxima_despesa_data = despesas_agrupadas.iloc[0]['Data']
+        proxima = livro.proximo('Despesa', amanha)
+        if proxima is not None:
+            proxima_despesa_data, proxima_despesa = proxima
         
-        # Último lançamento (mais recente até a data atual)
-        df_ate_hoje = df[df['Data'].dt.date <= hoje.date()]
-        df_ordenado = df_ate_hoje.sort_values('Data', ascending=False)
-        ultimo_lancamento = None
+        # Último lançamento (mais recente até a data atual), pelo índice de datas
+        ultimo = livro.ultimo(ate=hoje)
         ultimo_lancamento_data = None
         ultimo_lancamento_descricao = None
         ultimo_lancamento_tipo = None
         ultimo_lancamento_valor = None
         
-        if not df_ordenado.empty:
-            ultimo = df_ordenado.iloc[0]
+        if ultimo is not None:
             ultimo_lancamento_data = ultimo['Data']
             ultimo_lancamento_descricao = ultimo['Descrição']
             ultimo_lancamento_tipo = ultimo['Tipo']
-            ultimo_lancamento_valor = ultimo['Valor']
+            ultimo_lancamento_valor = em_reais(ultimo['Valor'])
         
         return {
             'saldo_realizado': saldo_realizado,
@@ -157,75 +357,25 @@ def calcular_saldo():
             'ultimo_lancamento_tipo': ultimo_lancamento_tipo,
             'ultimo_lancamento_valor': ultimo_lancamento_valor
         }
-    except Exception as e:
-        print(f"Erro ao calcular saldo: {e}")
+    except Exception:
+        LOGGER.exception("Erro ao calcular saldo")
         return None
 
-# Comandos do bot
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Comando /start"""
-    mensagem = (
-        "🤖 *Bem-vindo ao Bot de Controle Financeiro!*\n\n"
-        "Comandos disponíveis:\n"
-        "/novo - Adicionar novo lançamento\n"
-        "/saldo - Ver saldo e resumo\n"
-        "/historico - Ver últimos 5 lançamentos\n"
-        "/cancelar - Cancelar operação atual\n"
-        "/ajuda - Ver esta mensagem"
-    )
-    await update.message.reply_text(mensagem, parse_mode='Markdown')
-
-async def ajuda(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Comando /ajuda"""
-    await start(update, context)
-
-async def historico(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Comando /historico - Mostra os últimos 5 lançamentos já realizados"""
-    try:
-        df = pd.read_excel(ARQUIVO_EXCEL, sheet_name='Lançamentos')
-        
-        if df.empty:
-            await update.message.reply_text("📭 Nenhum lançamento registrado ainda.")
-            return
-        
-        # Filtrar apenas lançamentos até hoje
-        hoje = pd.Timestamp(datetime.now().date())
-        df_realizados = df[df['Data'].dt.date <= hoje.date()]
-        
-        if df_realizados.empty:
-            await update.message.reply_text("📭 Nenhum lançamento realizado até hoje.")
-            return
-        
-        # Ordenar por data decrescente e pegar os últimos 5
-        df_ordenado = df_realizados.sort_values('Data', ascending=False).head(5)
-        
-        mensagem = "📝 *Últimos 5 Lançamentos:*\n\n"
-        
-        for idx, row in df_ordenado.iterrows():
-            data_formatada = row['Data'].strftime('%d/%m/%Y')            
-            mensagem += (
-                f"*{row['Tipo']}*\n"
-                f"📝 {row['Descrição']}\n"
-                f"💰 R$ {row['Valor']:,.2f}\n"
-                f"🏷️ {row['Categoria']}\n"
-                f"💳 {row['Método']}\n"
-                f"📅 {data_formatada}\n\n"
-            )
-        
-        await update.message.reply_text(mensagem, parse_mode='Markdown')
-        
-    except Exception as e:
-        print(f"Erro ao buscar histórico: {e}")
-        await update.message.reply_text("❌ Erro ao buscar histórico. Tente novamente.")
-
-async def saldo(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Comando /saldo"""
-    resultado = calcular_saldo()
+@armazenamento.DURACAO_AGREGACOES.cronometrar(agregacao='ultimos_realizados')
+def ultimos_realizados(quantidade=5, conta=None):
+    """Retorna os últimos lançamentos da conta até hoje (None se não houver lançamentos)"""
+    livro = armazenamento.obter_livro_caixa(conta)
     
-    if resultado is None:
-        await update.message.reply_text("📭 Nenhum lançamento registrado ainda.")
-        return
+    if livro.lancamentos().empty:
+        return None
     
+    # Os N mais recentes até hoje, do índice de datas (sem ordenar a tabela)
+    hoje = pd.Timestamp(datetime.now().date())
+    return livro.ultimos(quantidade, ate=hoje)
+
+@DURACAO_RENDERIZACAO.cronometrar(mensagem='saldo')
+def mensagem_saldo(resultado):
+    """Monta o texto do /saldo a partir do resultado de calcular_saldo"""
     mensagem = (
         "💰 *Resumo Financeiro*\n\n"
         f"✅ *Saldo:* R$ {resultado['saldo_realizado']:,.2f}\n\n"
@@ -268,8 +418,190 @@ async def saldo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         mensagem += "💳 *Próxima Despesa:* Nenhuma despesa futura registrada"
     
+    return mensagem
+
+def _sem_acentos(texto):
+    """Minúsculas e sem acentos, para comparar com o catálogo"""
+    texto = unicodedata.normalize('NFKD', texto.strip().lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+@DURACAO_RENDERIZACAO.cronometrar(mensagem='historico')
+def mensagem_historico(df_ordenado):
+    """Monta o texto do /historico a partir do resultado de ultimos_realizados"""
+    if df_ordenado is None:
+        return "📭 Nenhum lançamento registrado ainda."
+    
+    if df_ordenado.empty:
+        return "📭 Nenhum lançamento realizado até hoje."
+    
+    mensagem = "📝 *Últimos 5 Lançamentos:*\n\n"
+    
+    for idx, row in df_ordenado.iterrows():
+        data_formatada = row['Data'].strftime('%d/%m/%Y')            
+        mensagem += (
+            f"*{row['Tipo']}*\n"
+            f"📝 {row['Descrição']}\n"
+            f"💰 R$ {em_reais(row['Valor']):,.2f}\n"
+            f"🏷️ {row['Categoria']}\n"
+            f"💳 {row['Método']}\n"
+            f"📅 {data_formatada}\n\n"
+        )
+    return mensagem
+
+def resposta_saldo(conta=None):
+    """Texto do /saldo, renderizado uma vez por versão do livro-caixa e dia (None se não houver lançamentos)"""
+    chave = (armazenamento.obter_livro_caixa(conta).versao(), datetime.now().date())
+    mensagem = CACHE_RESPOSTAS.obter(conta, 'saldo', chave)
+    if mensagem is None:
+        resultado = calcular_saldo(conta)
+        if resultado is None:
+            # Sem lançamentos ou erro no cálculo: nada a guardar
+            return None
+        mensagem = mensagem_saldo(resultado)
+        CACHE_RESPOSTAS.guardar(conta, 'saldo', chave, mensagem)
+    return mensagem
+
+def resposta_historico(conta=None):
+    """Texto do /historico, renderizado uma vez por versão do livro-caixa e dia"""
+    chave = (armazenamento.obter_livro_caixa(conta).versao(), datetime.now().date())
+    mensagem = CACHE_RESPOSTAS.obter(conta, 'historico', chave)
+    if mensagem is None:
+        mensagem = mensagem_historico(ultimos_realizados(5, conta))
+        CACHE_RESPOSTAS.guardar(conta, 'historico', chave, mensagem)
+    return mensagem
+
+# Valor no /lote: 35 | 35,50 | 35.5 | 1.234,56 | R$35
+_VALOR_LOTE = re.compile(r'^(?:r\$)?(\d{1,3}(?:\.\d{3})+|\d+)(?:[.,](\d{1,2}))?$', re.IGNORECASE)
+
+def _valor_lote(token):
+    correspondencia = _VALOR_LOTE.match(token)
+    if correspondencia is None:
+        return None
+    inteiro, centavos = correspondencia.groups()
+    return float(f"{inteiro.replace('.', '')}.{centavos or 0}")
+
+def interpretar_lote(texto, config):
+    """Interpreta as linhas do /lote no formato `descrição valor tipo método categoria`.
+    
+    Tipo, método e categoria são conferidos com o catálogo (sem diferenciar maiúsculas
+    e acentos) e voltam com a grafia cadastrada. Retorna (lançamentos, erros).
+    """
+    tipos = {_sem_acentos(tipo): tipo for tipo in TIPOS}
+    metodos = {_sem_acentos(metodo): metodo for metodo in config['metodos']}
+    categorias = {_sem_acentos(categoria): categoria for categoria in config['todas_categorias']}
+    
+    lancamentos = []
+    erros = []
+    for numero, linha in enumerate(texto.splitlines(), start=1):
+        tokens = linha.split()
+        if not tokens:
+            continue
+        
+        # O valor é o último número seguido de um tipo (a descrição pode ter números)
+        posicao = next(
+            (i for i in range(len(tokens) - 2, 0, -1)
+             if _valor_lote(tokens[i]) is not None and _sem_acentos(tokens[i + 1]) in tipos),
+            None
+        )
+        if posicao is None:
+            erros.append(f"Linha {numero}: use o formato descrição valor tipo método categoria")
+            continue
+        
+        valor = _valor_lote(tokens[posicao])
+        if valor <= 0:
+            erros.append(f"Linha {numero}: o valor deve ser maior que zero")
+            continue
+        
+        # Método e categoria podem ter mais de uma palavra: testar cada divisão
+        resto = tokens[posicao + 2:]
+        divisao = next(
+            ((metodos[_sem_acentos(' '.join(resto[:k]))], categorias[_sem_acentos(' '.join(resto[k:]))])
+             for k in range(1, len(resto))
+             if _sem_acentos(' '.join(resto[:k])) in metodos and _sem_acentos(' '.join(resto[k:])) in categorias),
+            None
+        )
+        if divisao is None:
+            if not resto or not any(_sem_acentos(' '.join(resto[:k])) in metodos for k in range(1, len(resto) + 1)):
+                erros.append(f"Linha {numero}: método desconhecido")
+            else:
+                erros.append(f"Linha {numero}: categoria desconhecida")
+            continue
+        
+        metodo, categoria = divisao
+        lancamentos.append({
+            'descricao': ' '.join(tokens[:posicao]),
+            'valor': valor,
+            'tipo': tipos[_sem_acentos(tokens[posicao + 1])],
+            'metodo': metodo,
+            'categoria': categoria,
+        })
+    
+    return lancamentos, erros
+
+@DURACAO_RENDERIZACAO.cronometrar(mensagem='lote')
+def mensagem_lote(lancamentos):
+    """Resumo do /lote exibido para confirmação"""
+    mensagem = f"📋 Confira os {len(lancamentos)} lançamentos:\n\n"
+    for lancamento in lancamentos:
+        sinal = "+" if lancamento['tipo'] == 'Receita' else "-"
+        mensagem += (
+            f"{sinal} R$ {lancamento['valor']:,.2f} | {lancamento['descricao']} | "
+            f"{lancamento['metodo']} | {lancamento['categoria']}\n"
+        )
+    
+    receitas = sum(l['valor'] for l in lancamentos if l['tipo'] == 'Receita')
+    despesas = sum(l['valor'] for l in lancamentos if l['tipo'] == 'Despesa')
+    mensagem += (
+        f"\n💚 Receitas: R$ {receitas:,.2f}\n"
+        f"❤️ Despesas: R$ {despesas:,.2f}\n\n"
+        "Confirma a gravação?"
+    )
+    return mensagem
+
+# Comandos do bot
+@medir_handler('start')
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /start"""
+    mensagem = (
+        "🤖 *Bem-vindo ao Bot de Controle Financeiro!*\n\n"
+        "Comandos disponíveis:\n"
+        "/novo - Adicionar novo lançamento\n"
+        "/lote - Adicionar vários lançamentos de uma vez\n"
+        "/saldo - Ver saldo e resumo\n"
+        "/historico - Ver últimos 5 lançamentos\n"
+        "/cancelar - Cancelar operação atual\n"
+        "/ajuda - Ver esta mensagem"
+    )
     await update.message.reply_text(mensagem, parse_mode='Markdown')
 
+@medir_handler('ajuda')
+async def ajuda(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /ajuda"""
+    await start(update, context)
+
+@medir_handler('historico')
+async def historico(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /historico - Mostra os últimos 5 lançamentos já realizados"""
+    try:
+        mensagem = await em_executor(resposta_historico, conta_do_update(update))
+        await update.message.reply_text(mensagem, parse_mode='Markdown')
+        
+    except Exception:
+        LOGGER.exception("Erro ao buscar histórico")
+        await update.message.reply_text("❌ Erro ao buscar histórico. Tente novamente.")
+
+@medir_handler('saldo')
+async def saldo(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /saldo"""
+    mensagem = await em_executor(resposta_saldo, conta_do_update(update))
+    
+    if mensagem is None:
+        await update.message.reply_text("📭 Nenhum lançamento registrado ainda.")
+        return
+    
+    await update.message.reply_text(mensagem, parse_mode='Markdown')
+
+@medir_handler('novo')
 async def novo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Inicia o processo de adicionar novo lançamento"""
     await update.message.reply_text(
@@ -281,6 +613,7 @@ async def novo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     return DESCRICAO
 
+@medir_handler('descricao')
 async def receber_descricao(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Recebe a descrição"""
     context.user_data['descricao'] = update.message.text
@@ -293,6 +626,7 @@ async def receber_descricao(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     return VALOR
 
+@medir_handler('valor')
 async def receber_valor(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Recebe o valor"""
     try:
@@ -303,15 +637,10 @@ async def receber_valor(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         context.user_data['valor'] = valor
         
-        # Criar teclado com os tipos (fixos)
-        tipos = ['Receita', 'Despesa']
-        keyboard = [[tipo] for tipo in tipos]
-        reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
-        
         await update.message.reply_text(
             f"✅ Valor: *R$ {valor:.2f}*\n\n"
             "💵 Selecione o *tipo*:",
-            reply_markup=reply_markup,
+            reply_markup=TECLADO_TIPOS,
             parse_mode='Markdown'
         )
         return TIPO
@@ -319,12 +648,13 @@ async def receber_valor(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⚠️ Valor inválido. Use números (Ex: 50.00). Tente novamente:")
         return VALOR
 
+@medir_handler('tipo')
 async def receber_tipo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Recebe o tipo"""
     tipo = update.message.text
     
     # Validar se o tipo é válido
-    if tipo not in ['Receita', 'Despesa']:
+    if tipo not in TIPOS:
         await update.message.reply_text(
             "⚠️ Tipo inválido! Selecione apenas *Receita* ou *Despesa*.",
             parse_mode='Markdown'
@@ -333,45 +663,38 @@ async def receber_tipo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     context.user_data['tipo'] = tipo
     
-    config = carregar_configuracoes()
-    if config is None:
+    teclados = await em_executor(carregar_teclados)
+    if teclados is None:
         await update.message.reply_text("❌ Erro ao carregar configurações.")
         return ConversationHandler.END
     
-    # Criar teclado com os métodos
-    keyboard = [[metodo] for metodo in config['metodos']]
-    reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
-    
     await update.message.reply_text(
         f"✅ Tipo: *{tipo}*\n\n"
         "💳 Selecione o *método de pagamento*:",
-        reply_markup=reply_markup,
+        reply_markup=teclados['metodos'],
         parse_mode='Markdown'
     )
     return METODO
 
+@medir_handler('metodo')
 async def receber_metodo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Recebe o método"""
     context.user_data['metodo'] = update.message.text
     
-    config = carregar_configuracoes()
-    if config is None:
+    teclados = await em_executor(carregar_teclados)
+    if teclados is None:
         await update.message.reply_text("❌ Erro ao carregar configurações.")
         return ConversationHandler.END
     
-    # Criar teclado com as categorias (2 por linha para facilitar)
-    categorias = config['todas_categorias']
-    keyboard = [categorias[i:i+2] for i in range(0, len(categorias), 2)]
-    reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
-    
     await update.message.reply_text(
         f"✅ Método: *{update.message.text}*\n\n"
         "🏷️ Selecione a *categoria*:",
-        reply_markup=reply_markup,
+        reply_markup=teclados['categorias'],
         parse_mode='Markdown'
     )
     return CATEGORIA
 
+@medir_handler('categoria')
 async def receber_categoria(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Recebe a categoria e finaliza o lançamento"""
     context.user_data['categoria'] = update.message.text
@@ -384,7 +707,7 @@ async def receber_categoria(update: Update, context: ContextTypes.DEFAULT_TYPE):
     metodo = context.user_data['metodo']
     categoria = context.user_data['categoria']
     
-    if adicionar_lancamento(data, descricao, categoria, tipo, valor, metodo):
+    if await adicionar_lancamento(data, descricao, categoria, tipo, valor, metodo, conta_do_update(update)):
         mensagem = (
             "✅ *Lançamento adicionado com sucesso!*\n\n"
             f"📝 Descrição: {descricao}\n"
@@ -410,6 +733,7 @@ async def receber_categoria(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return ConversationHandler.END
 
+@medir_handler('cancelar')
 async def cancelar(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Cancela a operação atual"""
     context.user_data.clear()
@@ -419,17 +743,150 @@ async def cancelar(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     return ConversationHandler.END
 
+async def _processar_lote(update: Update, context: ContextTypes.DEFAULT_TYPE, texto):
+    """Valida as linhas recebidas e pede a confirmação do lote"""
+    config = await em_executor(carregar_configuracoes)
+    if config is None:
+        await update.message.reply_text("❌ Erro ao carregar configurações.")
+        return ConversationHandler.END
+    
+    lancamentos, erros = interpretar_lote(texto, config)
+    
+    if erros:
+        await update.message.reply_text(
+            "⚠️ Não consegui entender algumas linhas:\n\n"
+            + "\n".join(erros[:10])
+            + ("\n..." if len(erros) > 10 else "")
+            + "\n\nCorrija e envie o lote novamente, ou use /cancelar."
+        )
+        return LOTE_LINHAS
+    
+    if not lancamentos:
+        await update.message.reply_text("⚠️ Nenhum lançamento encontrado. Envie uma linha por lançamento:")
+        return LOTE_LINHAS
+    
+    if len(lancamentos) > TAMANHO_MAXIMO_LOTE:
+        await update.message.reply_text(
+            f"⚠️ Envie no máximo {TAMANHO_MAXIMO_LOTE} lançamentos por lote. Tente novamente:"
+        )
+        return LOTE_LINHAS
+    
+    context.user_data['lote'] = lancamentos
+    await update.message.reply_text(mensagem_lote(lancamentos), reply_markup=TECLADO_CONFIRMACAO_LOTE)
+    return LOTE_CONFIRMACAO
+
+@medir_handler('lote')
+async def lote(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /lote - vários lançamentos em uma mensagem, gravados em um único commit"""
+    # As linhas podem vir junto com o comando ou na mensagem seguinte
+    partes = update.message.text.split(maxsplit=1)
+    texto = partes[1] if len(partes) > 1 else ''
+    
+    if texto.strip():
+        return await _processar_lote(update, context, texto)
+    
+    await update.message.reply_text(
+        "📋 Envie os lançamentos, um por linha, no formato:\n"
+        "descrição valor tipo método categoria\n\n"
+        "Exemplo:\n"
+        "almoço 35,50 despesa pix alimentação\n"
+        "salário 5000 receita pix salário\n\n"
+        "Use /cancelar para cancelar."
+    )
+    return LOTE_LINHAS
+
+@medir_handler('lote_linhas')
+async def receber_lote(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Recebe as linhas do lote"""
+    return await _processar_lote(update, context, update.message.text)
+
+@medir_handler('lote_confirmacao')
+async def confirmar_lote(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Grava o lote confirmado com um único commit"""
+    lancamentos = context.user_data.pop('lote', [])
+    context.user_data.clear()
+    
+    if update.message.text != CONFIRMAR_LOTE or not lancamentos:
+        await update.message.reply_text("❌ Lote cancelado.", reply_markup=ReplyKeyboardRemove())
+        return ConversationHandler.END
+    
+    data = datetime.now()
+    try:
+        await GRAVADORES.da_conta(conta_do_update(update)).adicionar_lote([
+            armazenamento.novo_lancamento(
+                data, l['descricao'], l['categoria'], l['tipo'], l['valor'], l['metodo']
+            )
+            for l in lancamentos
+        ])
+        await update.message.reply_text(
+            f"✅ {len(lancamentos)} lançamentos adicionados com sucesso!",
+            reply_markup=ReplyKeyboardRemove()
+        )
+    except Exception:
+        LOGGER.exception("Erro ao adicionar lote")
+        await update.message.reply_text(
+            "❌ Erro ao adicionar o lote. Nenhum lançamento foi gravado.",
+            reply_markup=ReplyKeyboardRemove()
+        )
+    
+    return ConversationHandler.END
+
+async def iniciar_servicos(application):
+    """Carrega os lançamentos em memória (as tarefas de escrita sobem na primeira gravação)"""
+    # Carregar os lançamentos uma única vez; depois disso o livro-caixa só relê o
+    # armazenamento quando outro processo alterar os dados. Os livros-caixa por conta
+    # são carregados na primeira mensagem de cada conta.
+    if MODO_CONTAS == 'compartilhada':
+        try:
+            await em_executor(armazenamento.obter_livro_caixa().sincronizar)
+        except Exception:
+            LOGGER.exception("Erro ao carregar lançamentos")
+    
+    endereco_metricas = metricas.iniciar_servidor('bot')
+    if endereco_metricas:
+        LOGGER.info("Métricas disponíveis em http://%s/metrics", endereco_metricas)
+
+async def encerrar_servicos(application):
+    """Grava os lançamentos pendentes e libera o executor"""
+    await GRAVADORES.parar()
+    EXECUTOR_ARMAZENAMENTO.shutdown(wait=True)
+
 def main():
     """Função principal"""
+    log_estruturado.configurar('bot')
+    # O httpx registra cada chamada à Bot API (inclusive os long polls) em INFO
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    
     # Carregar token do arquivo .env
     TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
     
     if not TOKEN:
-        print("❌ ERRO: Token do Telegram não encontrado!")
+        LOGGER.error("❌ ERRO: Token do Telegram não encontrado!")
         return
     
+    if MODO_CONTAS not in MODOS_CONTAS:
+        LOGGER.error("❌ ERRO: CONTAS_BOT desconhecido: %s (use %s)", MODO_CONTAS, ', '.join(MODOS_CONTAS))
+        return
+    
+    # Updates processados ao mesmo tempo (1 = um por vez, na ordem de chegada)
+    concorrentes = max(1, int(os.getenv('ATUALIZACOES_CONCORRENTES', '1')))
+    
     # Criar a aplicação
-    application = Application.builder().token(TOKEN).build()
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .concurrent_updates(concorrentes)
+        .post_init(iniciar_servicos)
+        .post_shutdown(encerrar_servicos)
+    )
+    
+    # Servidor da Bot API alternativo (ex.: o bot_api_local.py, para medições offline)
+    api_url = os.getenv('BOT_API_URL')
+    if api_url:
+        api_url = api_url.rstrip('/')
+        builder = builder.base_url(f"{api_url}/bot").base_file_url(f"{api_url}/file/bot")
+    
+    application = builder.build()
     
     # Handler de conversa para adicionar lançamento
     conv_handler = ConversationHandler(
@@ -444,16 +901,49 @@ def main():
         fallbacks=[CommandHandler('cancelar', cancelar)]
     )
     
+    # Handler de conversa para adicionar vários lançamentos de uma vez
+    lote_handler = ConversationHandler(
+        entry_points=[CommandHandler('lote', lote)],
+        states={
+            LOTE_LINHAS: [MessageHandler(filters.TEXT & ~filters.COMMAND, receber_lote)],
+            LOTE_CONFIRMACAO: [MessageHandler(filters.TEXT & ~filters.COMMAND, confirmar_lote)],
+        },
+        fallbacks=[CommandHandler('cancelar', cancelar)]
+    )
+    
     # Adicionar handlers
     application.add_handler(CommandHandler('start', start))
     application.add_handler(CommandHandler('ajuda', ajuda))
     application.add_handler(CommandHandler('saldo', saldo))
     application.add_handler(CommandHandler('historico', historico))
     application.add_handler(conv_handler)
+    application.add_handler(lote_handler)
     
     # Iniciar o bot
-    print("Bot Telegram iniciado! Aguardando mensagens...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    modo = os.getenv('BOT_MODO', 'polling').lower()
+    if modo == 'webhook':
+        # WEBHOOK_URL é o endereço público (HTTPS) informado ao Telegram; o caminho dele
+        # é o mesmo atendido pelo servidor local em WEBHOOK_ESCUTA
+        webhook_url = os.getenv('WEBHOOK_URL')
+        if not webhook_url:
+            LOGGER.error("❌ ERRO: WEBHOOK_URL não definida para o modo webhook!")
+            return
+        host, _, porta = os.getenv('WEBHOOK_ESCUTA', WEBHOOK_ESCUTA_PADRAO).rpartition(':')
+        LOGGER.info("Bot Telegram iniciado em modo webhook (%s:%s)! Aguardando mensagens...", host, porta)
+        application.run_webhook(
+            listen=host or '127.0.0.1',
+            port=int(porta),
+            url_path=urlparse(webhook_url).path.lstrip('/'),
+            webhook_url=webhook_url,
+            secret_token=os.getenv('WEBHOOK_SEGREDO') or None,
+            allowed_updates=ATUALIZACOES_PERMITIDAS,
+            max_connections=max(1, int(os.getenv('WEBHOOK_CONEXOES', str(CONEXOES_WEBHOOK_PADRAO)))),
+        )
+    elif modo == 'polling':
+        LOGGER.info("Bot Telegram iniciado! Aguardando mensagens...")
+        application.run_polling(allowed_updates=ATUALIZACOES_PERMITIDAS)
+    else:
+        LOGGER.error("❌ ERRO: BOT_MODO desconhecido: %s (use polling ou webhook)", modo)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,137 @@
+"""
+Esquema tipado dos lançamentos em memória, compartilhado pelo app Streamlit e pelo Bot Telegram.
+
+Os backends (planilha, SQLite, serviço) continuam trocando lançamentos no formato da
+planilha: Valor em reais (float) e textos como objetos Python. Ao carregar, o
+LivroCaixa converte esse DataFrame para o esquema abaixo, mais compacto e com somas
+exatas:
+
+    Data                         datetime64[ns]
+    Descrição                    string (pyarrow, quando disponível)
+    Categoria, Tipo, Método,     category
+    Status
+    Valor                        int64, em centavos
+
+Reais só aparecem na exibição: use em_reais() sobre somas e valores de Valor.
+
+Valor ausente ou não numérico é recusado na gravação (para_centavos levanta
+ValueError); linhas já gravadas assim entram no esquema como 0, com um aviso no log.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    TIPO_TEXTO = pd.StringDtype('pyarrow')
+except ImportError:
+    TIPO_TEXTO = pd.StringDtype('python')
+
+# Tipo de cada coluna da aba Lançamentos, na ordem da planilha
+ESQUEMA_LANCAMENTOS = {
+    'Data': np.dtype('datetime64[ns]'),
+    'Descrição': TIPO_TEXTO,
+    'Categoria': 'category',
+    'Tipo': 'category',
+    'Valor': np.dtype('int64'),
+    'Método': 'category',
+    'Status': 'category',
+}
+
+COLUNAS_CATEGORICAS = [col for col, tipo in ESQUEMA_LANCAMENTOS.items() if tipo == 'category']
+
+CENTAVOS_POR_REAL = 100
+
+LOGGER = logging.getLogger(__name__)
+
+
+def para_centavos(valor, padrao=None):
+    """Converte um valor em reais (número ou série) para centavos inteiros.
+
+    Valor ausente, não numérico ou infinito levanta ValueError; com padrao (ex.: 0), é
+    substituído por ele.
+    """
+    if np.ndim(valor) == 0:
+        try:
+            reais = float(valor)
+        except (TypeError, ValueError):
+            reais = np.nan
+        if not np.isfinite(reais):
+            if padrao is None:
+                raise ValueError(f"Valor inválido: {valor!r}")
+            return padrao
+        return int(round(reais * CENTAVOS_POR_REAL))
+
+    originais = pd.Series(valor)
+    reais = pd.to_numeric(originais, errors='coerce').to_numpy(dtype='float64')
+    invalidos = ~np.isfinite(reais)
+    if invalidos.any():
+        if padrao is None:
+            exemplos = ', '.join(repr(v) for v in originais[invalidos].head(3))
+            raise ValueError(f"{int(invalidos.sum())} valores inválidos em Valor (ex.: {exemplos})")
+        centavos = np.rint(np.where(invalidos, 0.0, reais) * CENTAVOS_POR_REAL).astype('int64')
+        centavos[invalidos] = padrao
+        return centavos
+    return np.rint(reais * CENTAVOS_POR_REAL).astype('int64')
+
+
+def em_reais(centavos):
+    """Converte centavos (inteiro, array ou série) para reais"""
+    return centavos / CENTAVOS_POR_REAL
+
+
+def tipar_lancamentos(df):
+    """Converte um DataFrame no formato da planilha para o esquema tipado.
+
+    Colunas ausentes são criadas vazias; colunas extras são descartadas.
+    """
+    tipado = {}
+    for col, tipo in ESQUEMA_LANCAMENTOS.items():
+        serie = df[col] if col in df else pd.Series([None] * len(df), index=df.index, dtype=object)
+        if col == 'Data':
+            tipado[col] = pd.to_datetime(serie, errors='coerce', format='mixed').astype(tipo)
+        elif col == 'Valor':
+            try:
+                centavos = para_centavos(serie.values)
+            except ValueError as e:
+                # Linhas antigas (ex.: célula vazia na planilha): carregar mesmo assim, mas avisar
+                LOGGER.warning("%s; considerados R$ 0,00", e)
+                centavos = para_centavos(serie.values, padrao=0)
+            tipado[col] = pd.Series(centavos, index=df.index)
+        elif tipo == 'category':
+            tipado[col] = serie.astype('category')
+        else:
+            tipado[col] = serie.astype(tipo)
+    return pd.DataFrame(tipado).reset_index(drop=True)
+
+
+def destipar_lancamentos(df):
+    """Converte um DataFrame tipado de volta ao formato da planilha (Valor em reais)"""
+    planilha = df.copy()
+    for col in df.columns:
+        if col == 'Valor':
+            planilha[col] = em_reais(df[col].to_numpy(dtype='float64'))
+        elif col != 'Data':
+            # Ausentes viram None (pd.NA não é serializável nem gravável na planilha)
+            planilha[col] = df[col].astype(object).where(df[col].notna(), None)
+    return planilha
+
+
+def anexar_lancamentos(df, novos):
+    """Concatena dois DataFrames tipados mantendo as colunas categóricas.
+
+    As categorias novas são acrescentadas ao fim das existentes, sem recodificar o
+    DataFrame original (pd.concat com categorias diferentes cairia para object).
+    """
+    if df.empty:
+        return novos
+    df = df.copy(deep=False)
+    novos = novos.copy(deep=False)
+    for col in COLUNAS_CATEGORICAS:
+        atuais = df[col].cat.categories
+        faltantes = novos[col].cat.categories.difference(atuais, sort=False)
+        if len(faltantes):
+            df[col] = df[col].cat.add_categories(faltantes)
+        novos[col] = novos[col].cat.set_categories(df[col].cat.categories)
+    return pd.concat([df, novos], ignore_index=True)
@@ -0,0 +1,364 @@
+"""
+Importação em massa de extratos bancários (CSV ou OFX) para os lançamentos.
+
+O arquivo é lido em blocos, sem carregar o extrato inteiro em memória; cada bloco tem
+as colunas mapeadas para Data/Descrição/Categoria/Tipo/Valor/Método e é gravado com um
+único commit (LivroCaixa.adicionar_lancamentos), com progresso informado a cada bloco.
+
+Quando o extrato não traz Tipo, ele sai do sinal do valor (negativo = Despesa) e o
+Valor é gravado em módulo. Categoria e Método ausentes ou fora do catálogo recebem os
+valores padrão, que precisam estar cadastrados na aba Configurações (os menus do app e
+do bot só oferecem o que está no catálogo).
+
+Uso:
+    python importacao.py extrato.csv --categoria Outros --metodo Débito
+    python importacao.py extrato.ofx --categoria Outros --metodo Pix
+    python importacao.py extrato.csv --coluna Data="Data Lançamento" --coluna Valor=Quantia
+"""
+import argparse
+import codecs
+import csv
+import io
+import os
+import re
+import unicodedata
+
+import pandas as pd
+from dotenv import load_dotenv
+
+import armazenamento
+
+# Linhas do extrato gravadas por commit
+TAMANHO_BLOCO = 5000
+
+# Bytes lidos do início do arquivo para detectar codificação e separador
+TAMANHO_AMOSTRA = 64 * 1024
+
+# Nomes de colunas reconhecidos automaticamente (comparados sem acentos e em minúsculas)
+SINONIMOS_COLUNAS = {
+    'Data': ['data', 'date', 'data lancamento', 'data da transacao', 'data movimento'],
+    'Descrição': ['descricao', 'historico', 'description', 'memo', 'lancamento', 'detalhes', 'estabelecimento'],
+    'Categoria': ['categoria', 'category'],
+    'Tipo': ['tipo', 'type', 'natureza', 'credito/debito', 'd/c'],
+    'Valor': ['valor', 'amount', 'valor (r$)', 'quantia'],
+    'Método': ['metodo', 'forma de pagamento', 'meio de pagamento', 'method'],
+}
+
+# Campos das transações OFX e o mapeamento delas (o Tipo sai do sinal de TRNAMT)
+CAMPOS_OFX = ['DTPOSTED', 'TRNAMT', 'MEMO', 'NAME', 'TRNTYPE']
+MAPEAMENTO_OFX = {'Data': 'DTPOSTED', 'Valor': 'TRNAMT', 'Descrição': 'MEMO'}
+
+# Valores de Tipo reconhecidos no extrato
+TIPOS_EXTRATO = {
+    'receita': 'Receita', 'credito': 'Receita', 'credit': 'Receita', 'c': 'Receita', 'entrada': 'Receita',
+    'despesa': 'Despesa', 'debito': 'Despesa', 'debit': 'Despesa', 'd': 'Despesa', 'saida': 'Despesa',
+}
+
+
+def _normalizar(texto):
+    """Minúsculas e sem acentos, para comparar nomes de colunas e valores"""
+    texto = unicodedata.normalize('NFKD', str(texto).strip().lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def detectar_formato(nome):
+    """'ofx' ou 'csv', pela extensão do arquivo"""
+    return 'ofx' if str(nome).lower().endswith(('.ofx', '.qfx')) else 'csv'
+
+
+def _detectar_codificacao(amostra):
+    try:
+        # Um caractere multibyte pode ter sido cortado no fim da amostra
+        amostra[:-4].decode('utf-8')
+        return 'utf-8-sig' if amostra.startswith(b'\xef\xbb\xbf') else 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp1252'
+
+
+def _detectar_separador(texto):
+    # Só linhas completas da amostra
+    texto = texto[:texto.rfind('\n')] if '\n' in texto else texto
+    try:
+        return csv.Sniffer().sniff(texto, delimiters=';,\t|').delimiter
+    except csv.Error:
+        return ';' if texto.count(';') > texto.count(',') else ','
+
+
+def _abrir(origem):
+    """Abre um caminho em modo binário; objetos de arquivo (ex.: upload) são usados como estão"""
+    if isinstance(origem, (str, os.PathLike)):
+        return open(origem, 'rb'), True
+    return origem, False
+
+
+def _tamanho(arquivo):
+    posicao = arquivo.tell()
+    arquivo.seek(0, io.SEEK_END)
+    tamanho = arquivo.tell()
+    arquivo.seek(posicao)
+    return tamanho
+
+
+def ler_csv_em_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO, separador=None, codificacao=None):
+    """Gera (DataFrame do bloco com as colunas originais como texto, bytes lidos)"""
+    inicio = arquivo.tell()
+    amostra = arquivo.read(TAMANHO_AMOSTRA)
+    arquivo.seek(inicio)
+    codificacao = codificacao or _detectar_codificacao(amostra)
+    separador = separador or _detectar_separador(amostra.decode(codificacao, errors='ignore'))
+
+    leitor = pd.read_csv(
+        arquivo, sep=separador, encoding=codificacao, dtype=str, chunksize=tamanho_bloco,
+        skipinitialspace=True, skip_blank_lines=True
+    )
+    with leitor:
+        for bloco in leitor:
+            bloco.columns = [str(col).strip() for col in bloco.columns]
+            yield bloco, arquivo.tell()
+
+
+_TRANSACAO_OFX = re.compile(r'<STMTTRN>(.*?)</STMTTRN>', re.S | re.I)
+_CAMPO_OFX = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def ler_ofx_em_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO, tamanho_leitura=TAMANHO_AMOSTRA):
+    """Gera (DataFrame com as colunas de CAMPOS_OFX, bytes lidos) por bloco.
+
+    Lê o arquivo em pedaços e extrai só as transações (<STMTTRN>), aceitando tanto o
+    OFX 1.x (SGML, sem tags de fechamento nos campos) quanto o 2.x (XML). Sem MEMO,
+    a descrição vem de NAME.
+    """
+    inicio = arquivo.tell()
+    amostra = arquivo.read(TAMANHO_AMOSTRA)
+    arquivo.seek(inicio)
+    # OFX brasileiro costuma vir em CHARSET 1252
+    codificacao = 'cp1252' if b'CHARSET:1252' in amostra.upper() else _detectar_codificacao(amostra)
+    decodificador = codecs.getincrementaldecoder(codificacao)(errors='replace')
+
+    resto = ''
+    transacoes = []
+    while True:
+        pedaco = arquivo.read(tamanho_leitura)
+        resto += decodificador.decode(pedaco, final=not pedaco)
+
+        fim = 0
+        for transacao in _TRANSACAO_OFX.finditer(resto):
+            campos = {nome.upper(): valor.strip() for nome, valor in _CAMPO_OFX.findall(transacao.group(1))}
+            transacoes.append(campos)
+            fim = transacao.end()
+        resto = resto[fim:]
+
+        while len(transacoes) >= tamanho_bloco or (not pedaco and transacoes):
+            bloco = pd.DataFrame(transacoes[:tamanho_bloco]).reindex(columns=CAMPOS_OFX)
+            bloco['MEMO'] = bloco['MEMO'].fillna(bloco['NAME'])
+            transacoes = transacoes[tamanho_bloco:]
+            yield bloco, arquivo.tell()
+        if not pedaco:
+            return
+
+
+def mapear_colunas(colunas, mapeamento=None):
+    """Coluna do extrato usada para cada coluna de lançamentos (ou None).
+
+    O mapeamento explícito ({'Data': 'Data Lançamento', ...}) tem prioridade; as demais
+    colunas são reconhecidas pelos SINONIMOS_COLUNAS.
+    """
+    mapeamento = dict(mapeamento or {})
+    normalizadas = {_normalizar(col): col for col in colunas}
+    resultado = {}
+    for destino, sinonimos in SINONIMOS_COLUNAS.items():
+        origem = mapeamento.get(destino)
+        if origem is None:
+            origem = next((normalizadas[s] for s in sinonimos if s in normalizadas), None)
+        elif origem not in colunas:
+            raise ValueError(f"Coluna '{origem}' (para {destino}) não existe no extrato")
+        resultado[destino] = origem
+    return resultado
+
+
+def _para_valores(serie):
+    """Converte valores em texto ('1.234,56', '1.234', '-35.50', 'R$ 10,00') para float.
+
+    O separador decimal é o último entre vírgula e ponto; um ponto seguido só de grupos
+    de três dígitos ('1.234', '1.234.567') separa milhares, como nos extratos brasileiros.
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype('float64')
+    texto = serie.astype(str).str.replace(r'[R$\s]', '', regex=True)
+    # Formato brasileiro: vírgula depois do último ponto, ou só milhares sem centavos
+    brasileiro = (texto.str.rfind(',') > texto.str.rfind('.')) | texto.str.fullmatch(r'[+-]?\d{1,3}(\.\d{3})+')
+    convertido = texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    # Demais: ponto decimal, com vírgula (se houver) nos milhares ('1,234.56')
+    texto = convertido.where(brasileiro, texto.str.replace(',', '', regex=False))
+    return pd.to_numeric(texto, errors='coerce')
+
+
+def _para_datas(serie):
+    texto = serie.astype(str).str.strip()
+    # DTPOSTED do OFX: AAAAMMDD[HHMMSS[.XXX]][fuso]
+    if texto.str.match(r'^\d{8}').all():
+        return pd.to_datetime(texto.str[:8], format='%Y%m%d', errors='coerce')
+    # ISO (AAAA-MM-DD), que dayfirst inverteria
+    if texto.str.match(r'^\d{4}-\d{2}-\d{2}').all():
+        return pd.to_datetime(texto, format='ISO8601', errors='coerce')
+    return pd.to_datetime(texto, dayfirst=True, errors='coerce')
+
+
+def converter_bloco(bloco, colunas, categoria_padrao, metodo_padrao, status='Realizado'):
+    """Converte um bloco do extrato em DataFrame de lançamentos; retorna (válidos, descartados)"""
+    if colunas['Data'] is None or colunas['Valor'] is None:
+        raise ValueError("O extrato precisa ter colunas de Data e Valor (use o mapeamento de colunas)")
+
+    valores = _para_valores(bloco[colunas['Valor']])
+    if colunas['Tipo'] is not None:
+        tipos = bloco[colunas['Tipo']].map(lambda valor: TIPOS_EXTRATO.get(_normalizar(valor)) if pd.notna(valor) else None)
+        # Tipo desconhecido: decide pelo sinal
+        tipos = tipos.fillna(pd.Series(valores < 0, index=bloco.index).map({True: 'Despesa', False: 'Receita'}))
+    else:
+        tipos = pd.Series(valores < 0, index=bloco.index).map({True: 'Despesa', False: 'Receita'})
+
+    def texto(destino, padrao):
+        if colunas[destino] is None:
+            return pd.Series(padrao, index=bloco.index)
+        return bloco[colunas[destino]].fillna(padrao).astype(str).str.strip().replace('', padrao)
+
+    df = pd.DataFrame({
+        'Data': _para_datas(bloco[colunas['Data']]),
+        'Descrição': texto('Descrição', ''),
+        'Categoria': texto('Categoria', categoria_padrao),
+        'Tipo': tipos,
+        'Valor': valores.abs(),
+        'Método': texto('Método', metodo_padrao),
+        'Status': status,
+    })
+
+    validos = df['Data'].notna() & df['Valor'].notna() & (df['Valor'] > 0)
+    return df[validos], int((~validos).sum())
+
+
+def aplicar_catalogo(df, configuracoes, categoria_padrao, metodo_padrao):
+    """Troca Categoria e Método fora do catálogo pelos valores padrão; retorna (df, trocados).
+
+    A comparação não diferencia maiúsculas e acentos, e os valores reconhecidos ficam com
+    a grafia cadastrada. trocados conta as linhas com categoria ou método desconhecido.
+    """
+    desconhecidos = pd.Series(False, index=df.index)
+    for coluna, cadastrados, padrao in [
+        ('Categoria', configuracoes['todas_categorias'], categoria_padrao),
+        ('Método', configuracoes['metodos'], metodo_padrao),
+    ]:
+        grafias = {_normalizar(valor): valor for valor in cadastrados}
+        reconhecidos = df[coluna].map(lambda valor: grafias.get(_normalizar(valor)))
+        desconhecidos |= reconhecidos.isna()
+        df = df.assign(**{coluna: reconhecidos.fillna(padrao)})
+    return df, int(desconhecidos.sum())
+
+
+def validar_padroes(categoria_padrao, metodo_padrao, configuracoes=None):
+    """Confere a categoria e o método padrão com o catálogo de configurações.
+
+    Levanta ValueError se algum não estiver cadastrado; configuracoes é o dicionário de
+    armazenamento.carregar_configuracoes(), lido do armazenamento se omitido.
+    """
+    if configuracoes is None:
+        configuracoes = armazenamento.carregar_configuracoes()
+    if categoria_padrao not in configuracoes['todas_categorias']:
+        raise ValueError(f"Categoria padrão '{categoria_padrao}' não está cadastrada na aba Configurações")
+    if metodo_padrao not in configuracoes['metodos']:
+        raise ValueError(f"Método padrão '{metodo_padrao}' não está cadastrado na aba Configurações")
+
+
+def importar_extrato(origem, formato=None, mapeamento=None, categoria_padrao='Outros',
+                     metodo_padrao='Débito', tamanho_bloco=TAMANHO_BLOCO, separador=None,
+                     progresso=None, livro=None, configuracoes=None):
+    """Importa um extrato (caminho ou arquivo binário) com um commit por bloco.
+
+    A categoria e o método padrão são conferidos com o catálogo (validar_padroes) antes
+    de ler o arquivo; categorias e métodos do extrato fora do catálogo viram os padrões
+    (aplicar_catalogo). progresso(importados, fracao) é chamado após cada bloco gravado,
+    com a fração do arquivo já lida. Retorna {'importados', 'descartados',
+    'fora_do_catalogo', 'blocos'}.
+    """
+    if configuracoes is None:
+        configuracoes = armazenamento.carregar_configuracoes()
+    validar_padroes(categoria_padrao, metodo_padrao, configuracoes)
+    livro = livro or armazenamento.obter_livro_caixa()
+    formato = formato or detectar_formato(getattr(origem, 'name', origem))
+    arquivo, fechar = _abrir(origem)
+    resultado = {'importados': 0, 'descartados': 0, 'fora_do_catalogo': 0, 'blocos': 0}
+    try:
+        total_bytes = _tamanho(arquivo) or 1
+        if formato == 'ofx':
+            blocos = ler_ofx_em_blocos(arquivo, tamanho_bloco)
+            mapeamento = {**MAPEAMENTO_OFX, **(mapeamento or {})}
+        else:
+            blocos = ler_csv_em_blocos(arquivo, tamanho_bloco, separador)
+
+        colunas = None
+        for bloco, lidos in blocos:
+            if colunas is None:
+                colunas = mapear_colunas(list(bloco.columns), mapeamento)
+
+            df, descartados = converter_bloco(bloco, colunas, categoria_padrao, metodo_padrao)
+            df, fora_do_catalogo = aplicar_catalogo(df, configuracoes, categoria_padrao, metodo_padrao)
+            if not df.empty:
+                livro.adicionar_lancamentos(df.to_dict('records'))
+            resultado['importados'] += len(df)
+            resultado['descartados'] += descartados
+            resultado['fora_do_catalogo'] += fora_do_catalogo
+            resultado['blocos'] += 1
+            if progresso is not None:
+                progresso(resultado['importados'], min(1.0, lidos / total_bytes))
+    finally:
+        if fechar:
+            arquivo.close()
+
+    if progresso is not None:
+        progresso(resultado['importados'], 1.0)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa um extrato bancário (CSV ou OFX) para os lançamentos")
+    parser.add_argument('arquivo', help="Extrato .csv ou .ofx")
+    parser.add_argument('--formato', choices=['csv', 'ofx'], help="Padrão: pela extensão do arquivo")
+    parser.add_argument('--categoria', default='Outros', help="Categoria dos lançamentos sem categoria no extrato")
+    parser.add_argument('--metodo', default='Débito', help="Método dos lançamentos sem método no extrato")
+    parser.add_argument('--coluna', action='append', default=[], metavar='DESTINO=ORIGEM',
+                        help="Mapeia uma coluna do extrato, ex.: --coluna Data=\"Data Lançamento\"")
+    parser.add_argument('--separador', help="Separador do CSV (padrão: detectado)")
+    parser.add_argument('--bloco', type=int, default=TAMANHO_BLOCO, help="Linhas gravadas por commit")
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    mapeamento = {}
+    for item in args.coluna:
+        destino, _, origem = item.partition('=')
+        if destino not in SINONIMOS_COLUNAS or not origem:
+            parser.error(f"Mapeamento inválido: {item} (destinos: {', '.join(SINONIMOS_COLUNAS)})")
+        mapeamento[destino] = origem
+
+    # Falhar antes de ler o extrato, e não no meio da importação
+    try:
+        validar_padroes(args.categoria, args.metodo)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def progresso(importados, fracao):
+        print(f"\r⏳ {fracao:6.1%}  {importados} lançamentos importados", end='', flush=True)
+
+    resultado = importar_extrato(
+        args.arquivo, formato=args.formato, mapeamento=mapeamento,
+        categoria_padrao=args.categoria, metodo_padrao=args.metodo,
+        tamanho_bloco=args.bloco, separador=args.separador, progresso=progresso
+    )
+    print(f"\n✅ {resultado['importados']} lançamentos importados em {resultado['blocos']} commits"
+          f" ({resultado['descartados']} linhas descartadas)")
+    if resultado['fora_do_catalogo']:
+        print(f"⚠️ {resultado['fora_do_catalogo']} lançamentos com categoria ou método fora da aba Configurações"
+              f" gravados como {args.categoria} / {args.metodo}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,427 @@
+"""
+Índices em memória sobre os lançamentos, mantidos incrementalmente pelo LivroCaixa.
+"""
+import numpy as np
+import pandas as pd
+
+from esquema import em_reais
+
+
+def _para_dia(data):
+    """Converte uma data qualquer (Timestamp, datetime, date, str) em datetime64[D]"""
+    return pd.Timestamp(data).to_datetime64().astype('datetime64[D]')
+
+
+class _SerieDiaria:
+    """Totais diários de um Tipo (em centavos), ordenados por dia, com somas acumuladas.
+
+    Os arrays têm capacidade extra para que anexar um dia novo no fim custe O(1)
+    amortizado; dias anteriores ao último deslocam só a parte posterior do array.
+    """
+
+    def __init__(self, dias, totais):
+        n = len(dias)
+        capacidade = max(16, 2 * n)
+        self._dias = np.empty(capacidade, dtype='datetime64[D]')
+        self._dias[:n] = dias
+        # _acumulado[k] = soma dos totais dos k primeiros dias
+        self._acumulado = np.zeros(capacidade + 1, dtype='int64')
+        self._acumulado[1:n + 1] = np.cumsum(totais)
+        self.n = n
+
+    @property
+    def dias(self):
+        return self._dias[:self.n]
+
+    def _posicoes(self, inicio=None, fim=None):
+        """Faixa [i, j) de dias entre inicio e fim (inclusivos), por busca binária"""
+        dias = self.dias
+        i = 0 if inicio is None else int(np.searchsorted(dias, inicio, side='left'))
+        j = self.n if fim is None else int(np.searchsorted(dias, fim, side='right'))
+        return i, max(i, j)
+
+    def soma(self, inicio=None, fim=None):
+        i, j = self._posicoes(inicio, fim)
+        return int(self._acumulado[j] - self._acumulado[i])
+
+    def total_do_dia(self, posicao):
+        return int(self._acumulado[posicao + 1] - self._acumulado[posicao])
+
+    def adicionar(self, dia, valor):
+        n = self.n
+        posicao = int(np.searchsorted(self.dias, dia, side='left'))
+
+        if posicao < n and self._dias[posicao] == dia:
+            # Dia já existente: só as somas a partir dele mudam
+            self._acumulado[posicao + 1:n + 1] += valor
+            return
+
+        if n == len(self._dias):
+            self._dias = np.concatenate([self._dias, np.empty(n, dtype='datetime64[D]')])
+            self._acumulado = np.concatenate([self._acumulado, np.zeros(n, dtype='int64')])
+
+        self._dias[posicao + 1:n + 1] = self._dias[posicao:n]
+        self._dias[posicao] = dia
+        self._acumulado[posicao + 2:n + 2] = self._acumulado[posicao + 1:n + 1] + valor
+        self._acumulado[posicao + 1] = self._acumulado[posicao] + valor
+        self.n = n + 1
+
+
+class RollupDiario:
+    """Totais diários por Tipo com somas acumuladas.
+
+    Qualquer total de intervalo (até hoje, de amanhã ao fim do mês seguinte, uma janela
+    de filtro) sai com duas buscas binárias por Tipo, em O(log n), e cada lançamento
+    novo atualiza o rollup sem reprocessar o histórico. As somas são exatas, em
+    centavos; total() e totais() devolvem reais.
+    """
+
+    def __init__(self):
+        self._series = {}
+
+    @classmethod
+    def de_lancamentos(cls, df):
+        """Monta o rollup a partir de um DataFrame tipado de lançamentos (esquema.py)"""
+        rollup = cls()
+        if df.empty:
+            return rollup
+
+        diario = (
+            pd.DataFrame({
+                'Tipo': df['Tipo'].astype(object).values,
+                'Dia': df['Data'].values.astype('datetime64[D]'),
+                'Valor': df['Valor'].values,
+            })
+            .dropna(subset=['Tipo', 'Dia'])
+            .groupby(['Tipo', 'Dia'], sort=True)['Valor']
+            .sum()
+        )
+        for tipo, serie in diario.groupby(level='Tipo'):
+            rollup._series[tipo] = _SerieDiaria(
+                serie.index.get_level_values('Dia').values.astype('datetime64[D]'),
+                serie.values
+            )
+        return rollup
+
+    def adicionar(self, data, tipo, centavos):
+        """Aplica um novo lançamento (Valor em centavos) ao rollup"""
+        if pd.isna(data) or pd.isna(tipo):
+            return
+        dia = _para_dia(data)
+        serie = self._series.get(tipo)
+        if serie is None:
+            self._series[tipo] = _SerieDiaria(np.array([dia], dtype='datetime64[D]'), np.array([centavos], dtype='int64'))
+        else:
+            serie.adicionar(dia, centavos)
+
+    def total(self, tipo, inicio=None, fim=None):
+        """Soma em reais de um Tipo entre os dias inicio e fim (inclusivos; None = sem limite)"""
+        serie = self._series.get(tipo)
+        if serie is None:
+            return 0.0
+        inicio = _para_dia(inicio) if inicio is not None else None
+        fim = _para_dia(fim) if fim is not None else None
+        return em_reais(serie.soma(inicio, fim))
+
+    def totais(self, inicio=None, fim=None):
+        """Soma de cada Tipo entre os dias inicio e fim"""
+        return {tipo: self.total(tipo, inicio, fim) for tipo in self._series}
+
+    def proximo_dia(self, tipo, inicio):
+        """Primeiro dia a partir de inicio com lançamentos do Tipo e seu total em reais.
+
+        Uma busca binária na série do Tipo; retorna (Timestamp, total) ou None.
+        """
+        serie = self._series.get(tipo)
+        if serie is None:
+            return None
+        posicao, _ = serie._posicoes(_para_dia(inicio))
+        if posicao >= serie.n:
+            return None
+        return pd.Timestamp(serie.dias[posicao]), em_reais(serie.total_do_dia(posicao))
+
+
+class AgregadosResumo:
+    """Totais da aba Resumo materializados por (Tipo, Categoria) e por Método.
+
+    Montados com dois agrupamentos ao carregar o livro-caixa e atualizados em O(1) a
+    cada lançamento novo; resumo() só lê as tabelas (tamanho proporcional ao número de
+    categorias e métodos, não ao histórico) e fica guardado até a próxima inserção.
+    Somas exatas, em centavos, como agregacoes.resumo.
+    """
+
+    def __init__(self):
+        self._por_tipo_categoria = {}
+        self._por_metodo = {}
+        self._por_tipo = {}
+        self._resumo = None
+
+    @classmethod
+    def de_lancamentos(cls, df):
+        """Monta as tabelas a partir de um DataFrame tipado de lançamentos (esquema.py)"""
+        agregados = cls()
+        if df.empty:
+            return agregados
+
+        for tipo, total in df.groupby('Tipo', observed=True)['Valor'].sum().items():
+            agregados._por_tipo[tipo] = int(total)
+        for chave, total in df.groupby(['Tipo', 'Categoria'], observed=True)['Valor'].sum().items():
+            agregados._por_tipo_categoria[chave] = int(total)
+        for metodo, total in df.groupby('Método', observed=True)['Valor'].sum().items():
+            agregados._por_metodo[metodo] = int(total)
+        return agregados
+
+    def adicionar(self, tipo, categoria, metodo, centavos):
+        """Aplica um novo lançamento (Valor em centavos) às tabelas"""
+        centavos = int(centavos)
+        if not pd.isna(tipo):
+            self._por_tipo[tipo] = self._por_tipo.get(tipo, 0) + centavos
+            if not pd.isna(categoria):
+                chave = (tipo, categoria)
+                self._por_tipo_categoria[chave] = self._por_tipo_categoria.get(chave, 0) + centavos
+        if not pd.isna(metodo):
+            self._por_metodo[metodo] = self._por_metodo.get(metodo, 0) + centavos
+        self._resumo = None
+
+    @staticmethod
+    def _serie(totais, nome_indice):
+        """Série em reais, em ordem decrescente, como em agregacoes.resumo"""
+        if not totais:
+            return pd.Series(dtype='float64')
+        serie = pd.Series(totais, dtype='int64', name='Valor')
+        serie.index = pd.Index(list(totais), dtype=object, name=nome_indice)
+        return em_reais(serie).sort_values(ascending=False)
+
+    def resumo(self):
+        """Mesmo dicionário de agregacoes.resumo (somente leitura: é reaproveitado entre chamadas)"""
+        if self._resumo is None:
+            por_categoria = {'Despesa': {}, 'Receita': {}}
+            for (tipo, categoria), total in self._por_tipo_categoria.items():
+                if tipo in por_categoria:
+                    por_categoria[tipo][categoria] = total
+            self._resumo = {
+                'receitas': em_reais(self._por_tipo.get('Receita', 0)),
+                'despesas': em_reais(self._por_tipo.get('Despesa', 0)),
+                'despesas_por_categoria': self._serie(por_categoria['Despesa'], 'Categoria'),
+                'receitas_por_categoria': self._serie(por_categoria['Receita'], 'Categoria'),
+                'por_metodo': self._serie(self._por_metodo, 'Método'),
+            }
+        return self._resumo
+
+
+class IndiceDatas:
+    """Posições dos lançamentos ordenadas por Data, mantidas a cada inserção.
+
+    Responde "os N mais recentes até um dia" com uma busca binária e uma fatia, sem
+    ordenar a tabela. Lançamentos com a mesma Data ficam na ordem de inserção, e os
+    sem Data ficam de fora. Como em _SerieDiaria, a capacidade extra torna O(1)
+    amortizada a inserção no fim (o caso comum: lançamentos de hoje).
+    """
+
+    def __init__(self, datas, posicoes):
+        n = len(datas)
+        capacidade = max(16, 2 * n)
+        self._datas = np.empty(capacidade, dtype='datetime64[ns]')
+        self._datas[:n] = datas
+        self._posicoes = np.empty(capacidade, dtype='int64')
+        self._posicoes[:n] = posicoes
+        self.n = n
+
+    @classmethod
+    def de_lancamentos(cls, df):
+        """Monta o índice a partir de um DataFrame de lançamentos"""
+        datas = df['Data'].values.astype('datetime64[ns]') if 'Data' in df else np.array([], dtype='datetime64[ns]')
+        validas = np.flatnonzero(~np.isnat(datas))
+        ordem = validas[np.argsort(datas[validas], kind='stable')]
+        return cls(datas[ordem], ordem)
+
+    def adicionar(self, data, posicao):
+        """Registra o lançamento na posição do DataFrame (sempre a próxima linha)"""
+        if pd.isna(data):
+            return
+        data = pd.Timestamp(data).to_datetime64().astype('datetime64[ns]')
+        n = self.n
+        k = int(np.searchsorted(self._datas[:n], data, side='right'))
+
+        if n == len(self._datas):
+            self._datas = np.concatenate([self._datas, np.empty(n, dtype='datetime64[ns]')])
+            self._posicoes = np.concatenate([self._posicoes, np.empty(n, dtype='int64')])
+
+        self._datas[k + 1:n + 1] = self._datas[k:n]
+        self._posicoes[k + 1:n + 1] = self._posicoes[k:n]
+        self._datas[k] = data
+        self._posicoes[k] = posicao
+        self.n = n + 1
+
+    def ultimas(self, quantidade, ate=None):
+        """Posições dos N lançamentos mais recentes até o dia ate (inclusivo), do mais recente ao mais antigo"""
+        if ate is None:
+            j = self.n
+        else:
+            fim_exclusivo = (pd.Timestamp(ate).normalize() + pd.Timedelta(days=1)).to_datetime64()
+            j = int(np.searchsorted(self._datas[:self.n], fim_exclusivo, side='left'))
+        return self._posicoes[max(0, j - quantidade):j][::-1].copy()
+
+
+class ConsultaLancamentos:
+    """Motor de consulta vetorizado para os filtros de Visualizar Lançamentos.
+
+    Montado uma vez por versão dos lançamentos: as linhas ficam ordenadas por Data
+    (datetime64), e os códigos das colunas categóricas Tipo/Categoria/Método ganham
+    um bitmap pré-calculado por valor. Uma combinação de filtros se resolve com uma
+    fatia de datas por busca binária e um AND dos bitmaps, sem conversões por rerun.
+    """
+
+    COLUNAS_CATEGORICAS = ['Tipo', 'Categoria', 'Método']
+
+    # Acima de tantos valores selecionados, a máscara sai de uma tabela de códigos
+    # (um único gather) em vez do OR dos bitmaps
+    LIMITE_BITMAPS = 4
+
+    def __init__(self, df):
+        # Cópia para exibição com Valor em reais, feita uma vez
+        exibicao = df.copy(deep=False)
+        if 'Valor' in exibicao:
+            exibicao['Valor'] = em_reais(df['Valor'].values)
+        self.exibicao = exibicao
+        self.n = len(df)
+
+        datas = df['Data'].values.astype('datetime64[ns]') if 'Data' in df else np.array([], dtype='datetime64[ns]')
+        self._ordem = np.argsort(datas, kind='stable')
+        self.datas = datas[self._ordem]
+        # Centavos (int64): somas exatas
+        self._valores = df['Valor'].values.astype('int64')[self._ordem] if 'Valor' in df else np.zeros(0, dtype='int64')
+
+        self.opcoes = {}
+        self._posicao_opcao = {}
+        self._codigos = {}
+        self._bitmaps = {}
+        self._tem_ausentes = {}
+        for col in self.COLUNAS_CATEGORICAS:
+            if col not in exibicao:
+                continue
+            # Opções na ordem da primeira ocorrência, recodificadas a partir dos códigos
+            # da coluna categórica (sem comparar textos)
+            coluna = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype('category')
+            codigos_coluna = coluna.cat.codes.values
+            presentes = pd.unique(codigos_coluna[codigos_coluna >= 0])
+            categorias = list(coluna.cat.categories[presentes])
+            # Código -1 (valor ausente) cai na última posição da tabela e continua -1
+            recodificar = np.full(len(coluna.cat.categories) + 1, -1, dtype='int32')
+            recodificar[presentes] = np.arange(len(presentes))
+            codigos = recodificar[codigos_coluna][self._ordem]
+            self.opcoes[col] = categorias
+            self._posicao_opcao[col] = {valor: codigo for codigo, valor in enumerate(categorias)}
+            self._codigos[col] = codigos
+            self._bitmaps[col] = {valor: codigos == codigo for codigo, valor in enumerate(categorias)}
+            self._tem_ausentes[col] = bool((codigos < 0).any())
+
+        # Índices de ordenação por coluna, montados sob demanda (ver _ordem_coluna)
+        self._ordens_colunas = {}
+
+        validas = ~np.isnat(self.datas)
+        self.data_minima = pd.Timestamp(self.datas[validas][0]) if validas.any() else None
+        self.data_maxima = pd.Timestamp(self.datas[validas][-1]) if validas.any() else None
+
+    def _mascara(self, col, selecionados, i, j):
+        """Máscara (na faixa [i, j) da ordem por data) das linhas com col em selecionados"""
+        selecionados = [valor for valor in dict.fromkeys(selecionados) if valor in self._bitmaps[col]]
+        if len(selecionados) == len(self._bitmaps[col]):
+            # Todos selecionados: só ficam de fora os valores ausentes (como em isin)
+            return self._codigos[col][i:j] >= 0 if self._tem_ausentes[col] else None
+        if len(selecionados) <= self.LIMITE_BITMAPS:
+            mascara = np.zeros(j - i, dtype=bool)
+            for valor in selecionados:
+                mascara |= self._bitmaps[col][valor][i:j]
+            return mascara
+        tabela = np.zeros(len(self._bitmaps[col]) + 1, dtype=bool)
+        tabela[[self._posicao_opcao[col][valor] for valor in selecionados]] = True
+        # Código -1 (valor ausente) cai na última posição da tabela, sempre False
+        return tabela[self._codigos[col][i:j]]
+
+    def filtrar(self, inicio=None, fim=None, **filtros):
+        """Posições (no DataFrame original) das linhas que passam nos filtros.
+
+        inicio e fim são dias inclusivos; filtros nomeiam colunas categóricas com a
+        lista de valores aceitos, ex.: filtrar(inicio, fim, Tipo=[...], Categoria=[...]).
+        """
+        i = 0 if inicio is None else int(np.searchsorted(self.datas, pd.Timestamp(inicio).normalize().to_datetime64(), side='left'))
+        if fim is None:
+            j = self.n
+        else:
+            fim_exclusivo = (pd.Timestamp(fim).normalize() + pd.Timedelta(days=1)).to_datetime64()
+            j = int(np.searchsorted(self.datas, fim_exclusivo, side='left'))
+        j = max(i, j)
+
+        mascara = None
+        for col, selecionados in filtros.items():
+            mascara_col = self._mascara(col, selecionados, i, j)
+            if mascara_col is not None:
+                mascara = mascara_col if mascara is None else mascara & mascara_col
+
+        faixa = np.arange(i, j) if mascara is None else i + np.flatnonzero(mascara)
+        return faixa
+
+    def linhas(self, faixa):
+        """DataFrame das linhas selecionadas, na ordem original dos lançamentos"""
+        return self.exibicao.iloc[np.sort(self._ordem[faixa])]
+
+    def _ordem_coluna(self, coluna):
+        """Posições (na ordem por data) ordenadas por coluna; montada uma vez por coluna.
+
+        None ordena pela ordem original dos lançamentos; empates mantêm a ordem por data.
+        """
+        if coluna not in self._ordens_colunas:
+            if coluna is None:
+                chaves = self._ordem
+            elif coluna == 'Data':
+                chaves = np.arange(self.n)
+            else:
+                chaves = self._chaves_ordenacao(self.exibicao[coluna])[self._ordem]
+            self._ordens_colunas[coluna] = np.argsort(chaves, kind='stable')
+        return self._ordens_colunas[coluna]
+
+    @staticmethod
+    def _chaves_ordenacao(serie):
+        """Array ordenável de uma coluna: categorias viram a posição alfabética do rótulo"""
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            rotulos = serie.cat.categories.astype(str)
+            # Ausentes (código -1) caem na última posição: depois de todos os rótulos
+            posicao = np.append(np.argsort(np.argsort(rotulos, kind='stable')), len(rotulos))
+            return posicao[serie.cat.codes.values]
+        if pd.api.types.is_numeric_dtype(serie.dtype) or pd.api.types.is_datetime64_any_dtype(serie.dtype):
+            return serie.values
+        return serie.to_numpy(dtype=object, na_value='').astype(str)
+
+    def ordenar(self, faixa, coluna=None, decrescente=False):
+        """Posições da faixa ordenadas por coluna, sem reordenar a faixa a cada chamada.
+
+        Percorre o índice da coluna guardando só as posições da faixa (uma máscara em
+        O(n), sem ordenação), e devolve a ordem crescente ou decrescente.
+        """
+        if coluna == 'Data':
+            ordenadas = faixa
+        elif len(faixa) == self.n:
+            ordenadas = self._ordem_coluna(coluna)
+        else:
+            indice = self._ordem_coluna(coluna)
+            na_faixa = np.zeros(self.n, dtype=bool)
+            na_faixa[faixa] = True
+            ordenadas = indice[na_faixa[indice]]
+        return ordenadas[::-1] if decrescente else ordenadas
+
+    def pagina(self, faixa, numero=1, tamanho=50, coluna=None, decrescente=False):
+        """DataFrame só com as linhas da página (1 = primeira) da faixa ordenada"""
+        inicio = (numero - 1) * tamanho
+        posicoes = self.ordenar(faixa, coluna, decrescente)[inicio:inicio + tamanho]
+        return self.exibicao.iloc[self._ordem[posicoes]]
+
+    def totais_por_tipo(self, faixa):
+        """Soma de Valor (em reais) por Tipo das linhas selecionadas"""
+        if 'Tipo' not in self._codigos:
+            return {}
+        codigos = self._codigos['Tipo'][faixa]
+        validos = codigos >= 0
+        # Pesos float64 somam centavos inteiros sem erro até 2**53
+        somas = np.bincount(codigos[validos], weights=self._valores[faixa][validos], minlength=len(self.opcoes['Tipo']))
+        return {tipo: em_reais(int(soma)) for tipo, soma in zip(self.opcoes['Tipo'], somas)}
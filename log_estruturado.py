@@ -0,0 +1,181 @@
+"""
+Log estruturado do app Streamlit, do Bot Telegram e do serviço de lançamentos.
+
+Quem registra (handlers do bot, o event loop, threads do executor, reruns do Streamlit)
+só enfileira o registro (QueueHandler); uma thread por processo (QueueListener) formata
+e grava, de modo que nenhum handler espera pelo disco. Cada registro vai para:
+    - um arquivo JSON, um registro por linha, com rotação por tamanho;
+    - uma linha legível na saída de erro, que o start.py redireciona para o log do processo.
+
+Os campos de cada registro JSON são ts, nivel, processo, logger e msg, mais os campos
+passados em extra= (os spans incluem handler, duracao_ms e lancamentos, o tamanho do
+livro-caixa) e o traceback em excecao, quando houver.
+
+Arquivos padrão, ao lado deste módulo (sobrescritos por LOG_JSON_BOT, LOG_JSON_APP e
+LOG_JSON_SERVICO; "0" desliga o arquivo do processo):
+    bot      bot.jsonl
+    app      app.jsonl
+    servico  servico.jsonl
+
+LOG_TAMANHO_MAXIMO_MB (padrão 10) limita cada arquivo e LOG_COPIAS (padrão 5) é o número
+de arquivos rotacionados mantidos (<arquivo>.1 é o mais recente); LOG_NIVEL (padrão INFO)
+é o nível mínimo registrado.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+# Arquivo JSON padrão de cada processo
+ARQUIVOS_PADRAO = {
+    'bot': "bot.jsonl",
+    'app': "app.jsonl",
+    'servico': "servico.jsonl",
+}
+
+TAMANHO_MAXIMO_MB_PADRAO = 10
+COPIAS_PADRAO = 5
+
+# Linha legível na saída de erro (data e nível no início, como o logs.py espera)
+FORMATO_CONSOLE = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Atributos de todo LogRecord; o que não estiver aqui veio de extra= e vai para o JSON
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_ouvinte = None
+_trava = threading.Lock()
+
+
+class FormatadorJson(logging.Formatter):
+    """Um objeto JSON por registro, com os campos de extra= no primeiro nível"""
+
+    def __init__(self, processo):
+        super().__init__()
+        self.processo = processo
+
+    def format(self, record):
+        registro = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'processo': self.processo,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for campo, valor in vars(record).items():
+            if campo not in _ATRIBUTOS_PADRAO:
+                registro[campo] = valor
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            registro['excecao'] = record.exc_text
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+class _HandlerFila(QueueHandler):
+    """QueueHandler que mantém o traceback separado da mensagem.
+
+    A mensagem e o traceback são montados em quem registra (os argumentos e o frame da
+    exceção não devem cruzar threads), mas em campos próprios, para o JSON.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def arquivo_configurado(processo):
+    """Caminho do arquivo JSON do processo, ou None se desligado"""
+    padrao = ARQUIVOS_PADRAO.get(processo)
+    if padrao is not None:
+        padrao = str(Path(__file__).parent / padrao)
+    arquivo = os.getenv(f"LOG_JSON_{processo.upper()}", padrao or "0")
+    return None if arquivo in ("", "0") else arquivo
+
+
+def configurar(processo):
+    """Liga (uma vez por processo) o log estruturado no logger raiz.
+
+    Retorna o caminho do arquivo JSON em uso, ou None se ele estiver desligado.
+    """
+    global _ouvinte
+    with _trava:
+        if _ouvinte is not None:
+            return arquivo_configurado(processo)
+
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(FORMATO_CONSOLE))
+        destinos = [console]
+
+        arquivo = arquivo_configurado(processo)
+        falha_arquivo = None
+        if arquivo:
+            tamanho_maximo = float(os.getenv('LOG_TAMANHO_MAXIMO_MB', str(TAMANHO_MAXIMO_MB_PADRAO)))
+            try:
+                rotativo = RotatingFileHandler(
+                    arquivo,
+                    maxBytes=int(tamanho_maximo * 1024 * 1024),
+                    backupCount=int(os.getenv('LOG_COPIAS', str(COPIAS_PADRAO))),
+                    encoding='utf-8',
+                )
+                rotativo.setFormatter(FormatadorJson(processo))
+                destinos.append(rotativo)
+            except OSError as e:
+                falha_arquivo = e
+                arquivo = None
+
+        fila = queue.SimpleQueue()
+        raiz = logging.getLogger()
+        raiz.addHandler(_HandlerFila(fila))
+        raiz.setLevel(os.getenv('LOG_NIVEL', 'INFO').upper())
+
+        _ouvinte = QueueListener(fila, *destinos, respect_handler_level=True)
+        _ouvinte.start()
+        # Esvaziar a fila antes de o processo terminar
+        atexit.register(_ouvinte.stop)
+
+    if falha_arquivo is not None:
+        logging.getLogger(__name__).warning("Log JSON indisponível: %s", falha_arquivo)
+    return arquivo
+
+
+@contextmanager
+def span(logger, handler, lancamentos=None, **campos):
+    """Registra a execução do bloco com handler, duracao_ms e lancamentos.
+
+    Ao fim, um INFO; se o bloco lançar exceção, um ERROR com o traceback (a exceção
+    segue adiante). lancamentos pode ser um número ou uma função, chamada ao fim do
+    bloco; campos extras entram no registro.
+    """
+    inicio = time.perf_counter()
+    excecao = None
+    try:
+        yield
+    except Exception as e:
+        excecao = e
+        raise
+    finally:
+        extra = {'handler': handler, 'duracao_ms': round((time.perf_counter() - inicio) * 1000, 3), **campos}
+        if lancamentos is not None:
+            try:
+                extra['lancamentos'] = lancamentos() if callable(lancamentos) else lancamentos
+            except Exception:
+                pass
+        if excecao is not None:
+            logger.error("Falha em %s", handler, exc_info=excecao, extra=extra)
+        else:
+            logger.info("%s concluído", handler, extra=extra)
+
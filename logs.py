@@ -1,73 +1,499 @@
 """
-Script para visualizar os logs dos serviços em tempo real
+Script para visualizar os logs dos serviços em tempo real e consultá-los por período e nível
+
+Uso:
+    python logs.py                          # últimas linhas e acompanhamento de todos os logs
+    python logs.py bot -n 50                # só o log do bot, a partir das 50 últimas linhas
+    python logs.py --desde "2026-10-18 08:00" --ate "2026-10-18 09:00"
+    python logs.py servico --nivel ERROR    # registros de ERROR ou acima
+    python logs.py bot --json               # log estruturado (log_estruturado.py) do bot
+
+O acompanhamento é avisado pelo sistema de arquivos (watchdog, quando instalado; sem
+ele, um stat a cada INTERVALO_POLLING_SEGUNDOS) e continua no arquivo novo quando o log
+é rotacionado ou truncado.
+
+Consultas por período e nível usam um índice esparso gravado ao lado do log
+(<log>.idx): a cada TAMANHO_BLOCO_INDICE bytes, o offset da linha, o horário e o nível do
+registro em curso e os níveis que aparecem no bloco. A consulta atualiza o índice só com
+o que foi acrescentado desde a última vez, pula direto para o bloco do início do período
+e descarta blocos sem o nível pedido, sem varrer o arquivo inteiro.
 """
+import argparse
+import json
+import os
+import re
 import sys
-import time
+import threading
+from bisect import bisect_left
+from datetime import datetime
 from pathlib import Path
-import os
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+import log_estruturado
+
+# Diretório dos logs e arquivos de PID
+BASE_DIR = Path(__file__).parent
+
+# Logs de cada serviço: nome usado na linha de comando -> (rótulo, arquivo)
+LOGS = {
+    'streamlit': ("STREAMLIT", BASE_DIR / "streamlit.log"),
+    'bot': ("BOT", BASE_DIR / "bot_telegram.log"),
+    'servico': ("SERVICO", BASE_DIR / "servico_lancamentos.log"),
+}
+
+# Processo do log estruturado (JSON) de cada serviço
+PROCESSOS_JSON = {'streamlit': 'app', 'bot': 'bot', 'servico': 'servico'}
+
+# Tamanho dos trechos lidos do fim do arquivo para mostrar as últimas linhas
+TAMANHO_LEITURA_REVERSA = 8192
+
+# Intervalo entre verificações sem o watchdog (e, com ele, limite de espera por um aviso)
+INTERVALO_POLLING_SEGUNDOS = 0.5
+INTERVALO_SEGURANCA_SEGUNDOS = 5
+
+# Distância mínima, em bytes, entre duas entradas do índice esparso
+TAMANHO_BLOCO_INDICE = 64 * 1024
+VERSAO_INDICE = 1
+
+# Bytes iniciais guardados no índice para reconhecer um arquivo truncado e reescrito
+TAMANHO_ASSINATURA = 64
+
+NIVEIS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+SINONIMOS_NIVEIS = {'WARN': 'WARNING', 'FATAL': 'CRITICAL'}
+
+# Início de linha com data e hora (logging do Python, Streamlit, supervisor do start.py,
+# registros JSON do log_estruturado.py)
+_HORARIO = re.compile(rb'^(?:\[|\{"ts": ")?(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})(?:[.,](\d{1,6}))?')
+_NIVEL = re.compile(rb'\b(DEBUG|INFO|WARNING|WARN|ERROR|CRITICAL|FATAL)\b')
+# Linhas sem nível explícito que indicam erro ou aviso (tracebacks e mensagens dos scripts)
+_ERRO = re.compile(r'^(Traceback \(most recent call last\)|[\w.]*(Error|Exception)\b|❌|Erro\b)'.encode('utf-8'))
+_AVISO = re.compile(r'^⚠️'.encode('utf-8'))
+
 
 def tail_file(file_path, lines=20):
-    """Lê as últimas N linhas de um arquivo"""
+    """Lê as últimas N linhas de um arquivo, em trechos a partir do fim"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            # Ler todas as linhas e pegar as últimas N
-            all_lines = f.readlines()
-            return all_lines[-lines:]
-    except:
+        with open(file_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            posicao = f.tell()
+            trechos = []
+            quebras = 0
+            # Uma quebra a mais separa a linha anterior à primeira pedida
+            while posicao > 0 and quebras <= lines:
+                tamanho = min(TAMANHO_LEITURA_REVERSA, posicao)
+                posicao -= tamanho
+                f.seek(posicao)
+                trecho = f.read(tamanho)
+                trechos.append(trecho)
+                quebras += trecho.count(b'\n')
+    except OSError:
         return []
+    conteudo = b''.join(reversed(trechos))
+    ultimas = conteudo.splitlines(keepends=True)[-lines:] if lines > 0 else []
+    return [linha.decode('utf-8', errors='replace') for linha in ultimas]
+
+
+def _identidade(status):
+    return [status.st_dev, status.st_ino]
+
+
+class SeguidorLog:
+    """Acompanha um arquivo de log, entregando só as linhas completas acrescentadas.
+
+    Mantém o arquivo aberto entre leituras (no Windows, reabre a cada leitura para não
+    impedir a rotação). Se o caminho passa a apontar para outro arquivo (rotação por
+    renomeação), termina de ler o antigo e recomeça no novo; se o arquivo encolhe
+    (truncado), recomeça do início.
+    """
+
+    def __init__(self, caminho, do_fim=True):
+        self.caminho = Path(caminho)
+        self._arquivo = None
+        self._identidade = None
+        self._posicao = 0
+        self._resto = b''
+        self._manter_aberto = sys.platform != 'win32'
+        if do_fim:
+            try:
+                status = os.stat(self.caminho)
+                self._identidade = _identidade(status)
+                self._posicao = status.st_size
+            except OSError:
+                pass
+
+    def _ler_de(self, arquivo):
+        arquivo.seek(self._posicao)
+        dados = arquivo.read()
+        self._posicao += len(dados)
+        return dados
+
+    def _rotacionado(self):
+        """Arquivo antigo após a rotação por renomeação (<log>.1), se ainda for o mesmo"""
+        rotacionado = self.caminho.with_name(self.caminho.name + '.1')
+        try:
+            if _identidade(os.stat(rotacionado)) == self._identidade:
+                return open(rotacionado, 'rb')
+        except OSError:
+            pass
+        return None
+
+    def ler_novas(self):
+        """Linhas completas acrescentadas desde a última leitura"""
+        dados = b''
+        try:
+            status = os.stat(self.caminho)
+        except OSError:
+            status = None
+
+        if status is not None and self._identidade is not None and _identidade(status) != self._identidade:
+            # Rotação: o restante do arquivo antigo vem antes do conteúdo do novo
+            antigo = self._arquivo or self._rotacionado()
+            if antigo is not None:
+                with antigo:
+                    dados += self._ler_de(antigo)
+            self._arquivo = None
+            self._identidade = None
+            self._posicao = 0
+        elif status is None:
+            # Entre a renomeação e a criação do novo: drena o antigo ainda aberto
+            if self._arquivo is not None:
+                dados += self._ler_de(self._arquivo)
+            return self._linhas(dados)
+
+        if status.st_size < self._posicao:
+            # Truncado no lugar: recomeça do início
+            self._posicao = 0
+            self._resto = b''
+
+        if status.st_size > self._posicao or (self._arquivo is None and self._manter_aberto):
+            arquivo = self._arquivo
+            if arquivo is None:
+                try:
+                    arquivo = open(self.caminho, 'rb')
+                except OSError:
+                    return self._linhas(dados)
+                self._identidade = _identidade(os.fstat(arquivo.fileno()))
+            dados += self._ler_de(arquivo)
+            if self._manter_aberto:
+                self._arquivo = arquivo
+            else:
+                arquivo.close()
+        return self._linhas(dados)
+
+    def _linhas(self, dados):
+        if not dados:
+            return []
+        dados = self._resto + dados
+        completas, quebra, resto = dados.rpartition(b'\n')
+        if not quebra:
+            self._resto = dados
+            return []
+        self._resto = resto
+        return [linha.decode('utf-8', errors='replace') for linha in completas.split(b'\n')]
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+
+class _AvisoMudancas(FileSystemEventHandler if Observer is not None else object):
+    """Sinaliza o evento quando um dos logs acompanhados é alterado, criado ou movido"""
+
+    def __init__(self, caminhos, aviso):
+        self.caminhos = {os.path.abspath(caminho) for caminho in caminhos}
+        self.aviso = aviso
+
+    def on_any_event(self, event):
+        for caminho in (event.src_path, getattr(event, 'dest_path', '')):
+            if caminho and os.path.abspath(caminho) in self.caminhos:
+                self.aviso.set()
+                return
+
+
+def _nivel_da_linha(linha):
+    """Nível explícito na linha (perto do início) ou deduzido de erros e avisos; None se nenhum"""
+    encontrado = _NIVEL.search(linha, 0, 120)
+    if encontrado:
+        nivel = encontrado.group(1).decode('ascii')
+        return SINONIMOS_NIVEIS.get(nivel, nivel)
+    conteudo = linha.lstrip()
+    if _ERRO.match(conteudo):
+        return 'ERROR'
+    if _AVISO.match(conteudo):
+        return 'WARNING'
+    return None
+
+
+def _horario_da_linha(linha):
+    encontrado = _HORARIO.match(linha)
+    if not encontrado:
+        return None
+    data, hora, fracao = encontrado.groups()
+    fracao = (fracao or b'').ljust(6, b'0')
+    return f"{data.decode()}T{hora.decode()}.{fracao.decode()}"
+
+
+def _registro(linha, horario, nivel):
+    """Horário e nível do registro a que a linha pertence.
+
+    Uma linha com data e hora começa um registro; sem elas, herda o horário do anterior e,
+    se for continuação (indentada, como num traceback), também o nível.
+    """
+    horario_linha = _horario_da_linha(linha)
+    nivel_linha = _nivel_da_linha(linha)
+    if horario_linha is not None:
+        return horario_linha, nivel_linha or 'INFO'
+    if nivel_linha is not None:
+        return horario, nivel_linha
+    if linha[:1] in (b' ', b'\t') and nivel is not None:
+        return horario, nivel
+    return horario, 'INFO'
+
 
-def watch_logs():
+def _mascara(nivel):
+    return 1 << NIVEIS.index(nivel)
+
+
+def _caminho_indice(caminho):
+    return Path(caminho).with_name(Path(caminho).name + '.idx')
+
+
+def _indice_vazio(status, assinatura):
+    return {
+        'versao': VERSAO_INDICE,
+        'identidade': _identidade(status),
+        'assinatura': assinatura.hex(),
+        'indexado_ate': 0,
+        'estado': [None, None],
+        # [offset, horário, nível do registro em curso no offset, máscara de níveis do bloco]
+        'blocos': [],
+    }
+
+
+def atualizar_indice(caminho):
+    """Carrega o índice esparso do log e o estende até a última linha completa.
+
+    O índice é refeito do zero se o arquivo foi trocado (rotação), truncado ou
+    reescrito; se não puder ser gravado, é usado só em memória.
+    """
+    caminho = Path(caminho)
+    caminho_indice = _caminho_indice(caminho)
+    with open(caminho, 'rb') as f:
+        status = os.fstat(f.fileno())
+        assinatura = f.read(TAMANHO_ASSINATURA)
+
+        try:
+            indice = json.loads(caminho_indice.read_text(encoding='utf-8'))
+            valido = (
+                indice.get('versao') == VERSAO_INDICE
+                and indice['identidade'] == _identidade(status)
+                and indice['indexado_ate'] <= status.st_size
+                and assinatura.startswith(bytes.fromhex(indice['assinatura']))
+            )
+        except (OSError, ValueError, KeyError):
+            valido = False
+        if not valido:
+            indice = _indice_vazio(status, assinatura)
+        elif len(indice['assinatura']) < 2 * TAMANHO_ASSINATURA:
+            indice['assinatura'] = assinatura.hex()
+
+        posicao = indice['indexado_ate']
+        if posicao == status.st_size:
+            return indice
+
+        blocos = indice['blocos']
+        horario, nivel = indice['estado']
+        proximo_bloco = blocos[-1][0] + TAMANHO_BLOCO_INDICE if blocos else 0
+        f.seek(posicao)
+        for linha in f:
+            if not linha.endswith(b'\n'):
+                break
+            if posicao >= proximo_bloco:
+                blocos.append([posicao, horario, nivel, _mascara(nivel) if nivel else 0])
+                proximo_bloco = posicao + TAMANHO_BLOCO_INDICE
+            horario, nivel = _registro(linha, horario, nivel)
+            blocos[-1][3] |= _mascara(nivel)
+            posicao += len(linha)
+
+    indice['indexado_ate'] = posicao
+    indice['estado'] = [horario, nivel]
+    try:
+        temporario = caminho_indice.with_name(caminho_indice.name + '.tmp')
+        temporario.write_text(json.dumps(indice, separators=(',', ':')), encoding='utf-8')
+        os.replace(temporario, caminho_indice)
+    except OSError:
+        pass
+    return indice
+
+
+def arquivos_do_log(caminho):
+    """O log e suas cópias rotacionadas (<log>.1, <log>.2, ...), da mais antiga para a atual"""
+    caminho = Path(caminho)
+    rotacionados = []
+    numero = 1
+    while caminho.with_name(f"{caminho.name}.{numero}").exists():
+        rotacionados.append(caminho.with_name(f"{caminho.name}.{numero}"))
+        numero += 1
+    existentes = [caminho] if caminho.exists() else []
+    return list(reversed(rotacionados)) + existentes
+
+
+def consultar(caminho, desde=None, ate=None, nivel_minimo=None):
+    """Gera as linhas do log com registros entre desde e ate (datetime) e nível >= nivel_minimo.
+
+    Supõe horários em ordem crescente no arquivo, como em logs acrescentados.
+    """
+    desde_texto = desde.isoformat(timespec='microseconds') if desde is not None else None
+    ate_texto = ate.isoformat(timespec='microseconds') if ate is not None else None
+    aceitos = sum(_mascara(nivel) for nivel in NIVEIS[NIVEIS.index(nivel_minimo):]) if nivel_minimo else None
+
+    indice = atualizar_indice(caminho)
+    blocos = indice['blocos']
+    if not blocos:
+        return
+
+    # Primeiro bloco que pode ter registros a partir de desde: o último que começa antes dele
+    inicio = 0
+    if desde_texto is not None:
+        horarios = [bloco[1] or '' for bloco in blocos]
+        inicio = max(0, bisect_left(horarios, desde_texto) - 1)
+
+    with open(caminho, 'rb') as f:
+        for i in range(inicio, len(blocos)):
+            offset, horario, nivel, mascara = blocos[i]
+            if ate_texto is not None and horario is not None and horario > ate_texto:
+                return
+            if aceitos is not None and not mascara & aceitos:
+                continue
+            fim = blocos[i + 1][0] if i + 1 < len(blocos) else indice['indexado_ate']
+            f.seek(offset)
+            for linha in f.read(fim - offset).splitlines(keepends=True):
+                horario, nivel = _registro(linha, horario, nivel)
+                if desde_texto is not None and (horario is None or horario < desde_texto):
+                    continue
+                if ate_texto is not None and horario is not None and horario > ate_texto:
+                    return
+                if aceitos is not None and not _mascara(nivel) & aceitos:
+                    continue
+                yield linha.decode('utf-8', errors='replace').rstrip('\r\n')
+
+
+def logs_json():
+    """Arquivos do log estruturado de cada serviço, só dos que estão ligados"""
+    arquivos = {}
+    for servico, (rotulo, _) in LOGS.items():
+        arquivo = log_estruturado.arquivo_configurado(PROCESSOS_JSON[servico])
+        if arquivo:
+            arquivos[servico] = (rotulo, Path(arquivo))
+    return arquivos
+
+
+def _servicos_em_execucao():
+    arquivos = [".supervisor.pid", ".streamlit.pid", ".bot.pid", ".servico.pid"]
+    return any((BASE_DIR / arquivo).exists() for arquivo in arquivos)
+
+
+def watch_logs(servicos=None, linhas=20, logs=LOGS):
     """Monitora os logs em tempo real"""
-    
-    base_dir = Path(__file__).parent
-    streamlit_log = base_dir / "streamlit.log"
-    bot_log = base_dir / "bot_telegram.log"
-    
+    servicos = servicos or list(logs)
+
     # Verificar se os serviços estão rodando
-    streamlit_pid = base_dir / ".streamlit.pid"
-    bot_pid = base_dir / ".bot.pid"
-    
-    if not streamlit_pid.exists() and not bot_pid.exists():
+    if not _servicos_em_execucao():
         print("⚠️  Nenhum serviço em execução.")
         print("Use 'python start.py' para iniciar os serviços.")
         return
-    
+
     print("📋 Monitorando logs dos serviços...")
     print("Pressione Ctrl+C para sair\n")
     print("="*80)
-    
-    # Posições atuais dos arquivos
-    streamlit_pos = 0
-    bot_pos = 0
-    
+
+    # Últimas linhas de cada log e acompanhamento a partir do fim
+    seguidores = []
+    for servico in servicos:
+        rotulo, caminho = logs[servico]
+        for linha in tail_file(caminho, linhas):
+            print(f"[{rotulo}] {linha.rstrip()}")
+        seguidores.append((rotulo, SeguidorLog(caminho)))
+
+    aviso = threading.Event()
+    observador = None
+    if Observer is not None:
+        observador = Observer()
+        caminhos = [logs[s][1] for s in servicos]
+        tratador = _AvisoMudancas(caminhos, aviso)
+        for diretorio in {os.path.dirname(os.path.abspath(caminho)) for caminho in caminhos}:
+            observador.schedule(tratador, diretorio, recursive=False)
+        observador.start()
+    espera = INTERVALO_SEGURANCA_SEGUNDOS if observador is not None else INTERVALO_POLLING_SEGUNDOS
+
     try:
         while True:
-            # Ler logs do Streamlit
-            if streamlit_log.exists():
-                with open(streamlit_log, 'r', encoding='utf-8', errors='ignore') as f:
-                    f.seek(streamlit_pos)
-                    new_lines = f.readlines()
-                    streamlit_pos = f.tell()
-                    
-                    for line in new_lines:
-                        print(f"[STREAMLIT] {line.rstrip()}")
-            
-            # Ler logs do Bot
-            if bot_log.exists():
-                with open(bot_log, 'r', encoding='utf-8', errors='ignore') as f:
-                    f.seek(bot_pos)
-                    new_lines = f.readlines()
-                    bot_pos = f.tell()
-                    
-                    for line in new_lines:
-                        print(f"[BOT] {line.rstrip()}")
-            
-            time.sleep(1)
-    
+            for rotulo, seguidor in seguidores:
+                for linha in seguidor.ler_novas():
+                    print(f"[{rotulo}] {linha.rstrip()}")
+            sys.stdout.flush()
+            aviso.wait(espera)
+            aviso.clear()
+
     except KeyboardInterrupt:
         print("\n\n✨ Monitoramento de logs encerrado.")
         print("\n💡 Os serviços continuam rodando em background.")
         print("   Use 'python stop.py' para parar os serviços.")
+    finally:
+        if observador is not None:
+            observador.stop()
+            observador.join()
+        for _, seguidor in seguidores:
+            seguidor.fechar()
+
+
+def consultar_logs(servicos, desde=None, ate=None, nivel_minimo=None, logs=LOGS):
+    """Imprime as linhas dos logs no período e nível pedidos, log a log"""
+    encontradas = 0
+    for servico in servicos or list(logs):
+        rotulo, caminho = logs[servico]
+        for arquivo in arquivos_do_log(caminho):
+            for linha in consultar(arquivo, desde, ate, nivel_minimo):
+                print(f"[{rotulo}] {linha}")
+                encontradas += 1
+    if not encontradas:
+        print("ℹ️  Nenhuma linha encontrada.")
+
+
+def _data_hora(texto):
+    try:
+        return datetime.fromisoformat(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data/hora inválida: {texto} (use AAAA-MM-DD HH:MM)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logs dos serviços em tempo real ou por período e nível")
+    parser.add_argument('servicos', nargs='*', metavar='servico',
+                        help=f"logs a mostrar ({', '.join(LOGS)}); padrão: todos")
+    parser.add_argument('-n', '--linhas', type=int, default=20, help="últimas linhas mostradas antes de acompanhar")
+    parser.add_argument('--desde', type=_data_hora, help="início do período (AAAA-MM-DD HH:MM)")
+    parser.add_argument('--ate', type=_data_hora, help="fim do período (AAAA-MM-DD HH:MM)")
+    parser.add_argument('--nivel', type=str.upper, choices=NIVEIS, help="nível mínimo dos registros")
+    parser.add_argument('--json', action='store_true', help="usa o log estruturado (JSON) dos serviços")
+    args = parser.parse_args()
+
+    logs = logs_json() if args.json else LOGS
+    desconhecidos = [servico for servico in args.servicos if servico not in logs]
+    if desconhecidos:
+        parser.error(f"serviço desconhecido ou sem log: {', '.join(desconhecidos)} (use {', '.join(logs)})")
+
+    if args.desde or args.ate or args.nivel:
+        consultar_logs(args.servicos, args.desde, args.ate, args.nivel, logs)
+    else:
+        watch_logs(args.servicos, args.linhas, logs)
+
 
 if __name__ == '__main__':
-    watch_logs()
+    main()
@@ -0,0 +1,223 @@
+"""
+Métricas de desempenho do app Streamlit, do Bot Telegram e do serviço de lançamentos.
+
+Cada processo registra spans de tempo (leituras e gravações no armazenamento,
+agregações, renderização de mensagens, handlers do bot, seções do app) em histogramas
+e contadores em memória, expostos no formato texto do Prometheus por um endpoint HTTP
+local (GET /metrics).
+
+Endereços padrão (sobrescritos por METRICAS_BOT, METRICAS_APP e METRICAS_SERVICO no
+formato host:porta; "0" desliga o endpoint do processo):
+    bot      127.0.0.1:9101
+    app      127.0.0.1:9102
+    servico  127.0.0.1:9103
+"""
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites superiores (em segundos) dos buckets dos histogramas de duração
+BUCKETS_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Endereço padrão do endpoint de cada processo
+ENDERECOS_PADRAO = {
+    'bot': "127.0.0.1:9101",
+    'app': "127.0.0.1:9102",
+    'servico': "127.0.0.1:9103",
+}
+
+
+def _rotulos_texto(rotulos):
+    if not rotulos:
+        return ""
+    pares = (f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos)
+    return "{" + ",".join(pares) + "}"
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histograma:
+    """Família de histogramas de duração, uma série por combinação de rótulos"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, buckets=BUCKETS_SEGUNDOS):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.buckets = tuple(buckets)
+        self._trava = threading.Lock()
+        # rótulos -> [contagens por bucket (+Inf no fim), soma]
+        self._series = {}
+
+    def observar(self, valor, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        posicao = bisect_left(self.buckets, valor)
+        with self._trava:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][posicao] += 1
+            serie[1] += valor
+
+    @contextmanager
+    def medir(self, **rotulos):
+        """Span de tempo: observa a duração do bloco, mesmo se ele lançar exceção"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def cronometrar(self, **rotulos):
+        """Decorador que mede cada chamada de uma função (síncrona ou async)"""
+        def decorador(funcao):
+            if asyncio.iscoroutinefunction(funcao):
+                @functools.wraps(funcao)
+                async def envoltorio_async(*args, **kwargs):
+                    with self.medir(**rotulos):
+                        return await funcao(*args, **kwargs)
+                return envoltorio_async
+
+            @functools.wraps(funcao)
+            def envoltorio(*args, **kwargs):
+                with self.medir(**rotulos):
+                    return funcao(*args, **kwargs)
+            return envoltorio
+        return decorador
+
+    def amostras(self):
+        with self._trava:
+            series = {chave: (list(contagens), soma) for chave, (contagens, soma) in self._series.items()}
+
+        linhas = []
+        for chave, (contagens, soma) in sorted(series.items()):
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float('inf'),), contagens):
+                acumulado += contagem
+                le = "+Inf" if limite == float('inf') else repr(limite)
+                linhas.append(f"{self.nome}_bucket{_rotulos_texto(chave + (('le', le),))} {acumulado}")
+            linhas.append(f"{self.nome}_sum{_rotulos_texto(chave)} {soma!r}")
+            linhas.append(f"{self.nome}_count{_rotulos_texto(chave)} {acumulado}")
+        return linhas
+
+
+class Contador:
+    """Família de contadores monotônicos, uma série por combinação de rótulos"""
+
+    tipo = 'counter'
+
+    def __init__(self, nome, ajuda):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._trava = threading.Lock()
+        self._series = {}
+
+    def incrementar(self, valor=1, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with self._trava:
+            self._series[chave] = self._series.get(chave, 0) + valor
+
+    def amostras(self):
+        with self._trava:
+            series = dict(self._series)
+        return [f"{self.nome}{_rotulos_texto(chave)} {valor!r}" for chave, valor in sorted(series.items())]
+
+
+class Registro:
+    """Conjunto de métricas de um processo"""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._metricas = {}
+
+    def _registrar(self, classe, nome, ajuda, **kwargs):
+        # Idempotente: o script do Streamlit é reexecutado a cada rerun
+        with self._trava:
+            metrica = self._metricas.get(nome)
+            if metrica is None:
+                metrica = self._metricas[nome] = classe(nome, ajuda, **kwargs)
+            elif not isinstance(metrica, classe):
+                raise ValueError(f"Métrica {nome} já registrada como {metrica.tipo}")
+            return metrica
+
+    def histograma(self, nome, ajuda, buckets=BUCKETS_SEGUNDOS):
+        return self._registrar(Histograma, nome, ajuda, buckets=buckets)
+
+    def contador(self, nome, ajuda):
+        return self._registrar(Contador, nome, ajuda)
+
+    def texto(self):
+        """Todas as métricas no formato de exposição texto do Prometheus"""
+        with self._trava:
+            metricas = sorted(self._metricas.values(), key=lambda metrica: metrica.nome)
+        linhas = []
+        for metrica in metricas:
+            linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            linhas.extend(metrica.amostras())
+        return "\n".join(linhas) + "\n"
+
+
+REGISTRO = Registro()
+histograma = REGISTRO.histograma
+contador = REGISTRO.contador
+
+
+class _TratadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        corpo = REGISTRO.texto().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        # Não poluir os logs do processo com cada coleta
+        pass
+
+
+_servidor = None
+_servidor_trava = threading.Lock()
+
+
+def endereco_configurado(processo):
+    """Endereço host:porta do endpoint do processo, ou None se desligado"""
+    endereco = os.getenv(f"METRICAS_{processo.upper()}", ENDERECOS_PADRAO.get(processo, "0"))
+    return None if endereco in ("", "0") else endereco
+
+
+def iniciar_servidor(processo):
+    """Sobe (uma vez por processo) o endpoint /metrics em uma thread daemon.
+
+    Retorna o endereço host:porta em uso, ou None se desligado ou indisponível.
+    """
+    global _servidor
+    with _servidor_trava:
+        if _servidor is not None:
+            host, porta = _servidor.server_address[:2]
+            return f"{host}:{porta}"
+
+        endereco = endereco_configurado(processo)
+        if endereco is None:
+            return None
+        host, _, porta = endereco.rpartition(':')
+        try:
+            _servidor = ThreadingHTTPServer((host or "127.0.0.1", int(porta)), _TratadorMetricas)
+        except OSError as e:
+            logging.getLogger(__name__).warning("Endpoint de métricas indisponível em %s: %s", endereco, e)
+            return None
+        _servidor.daemon_threads = True
+        threading.Thread(target=_servidor.serve_forever, name='metricas', daemon=True).start()
+        return endereco
@@ -0,0 +1,67 @@
+"""
+Funções de processo compartilhadas pelo start.py e pelo stop.py.
+
+Sem dependências pesadas (pandas, armazenamento): o stop.py só precisa delas para
+conferir e sinalizar PIDs.
+"""
+import os
+import subprocess
+import sys
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Tempo para um serviço encerrar após SIGTERM antes de ser morto
+TIMEOUT_PARADA_SEGUNDOS = 10
+
+
+def processo_vivo(pid):
+    """Indica se existe um processo (não zumbi) com o PID"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+        except psutil.Error:
+            return False
+    if sys.platform == 'win32':
+        saida = subprocess.run(['tasklist', '/FI', f'PID eq {pid}', '/NH'], capture_output=True, text=True).stdout
+        return str(pid) in saida.split()
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rpartition(')')[2].split()[0] != 'Z'
+    except (OSError, IndexError):
+        return True
+
+
+def amostrar_recursos(pid):
+    """Tempo de CPU acumulado (segundos) e memória residente (bytes) do processo.
+
+    Usa o psutil quando instalado e /proc no Linux; retorna None se indisponível.
+    """
+    if psutil is not None:
+        try:
+            processo = psutil.Process(pid)
+            with processo.oneshot():
+                tempos = processo.cpu_times()
+                return tempos.user + tempos.system, processo.memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # Campos depois do nome do processo: estado, ..., utime (12º) e stime (13º)
+            campos = f.read().rpartition(')')[2].split()
+        with open(f'/proc/{pid}/statm') as f:
+            paginas_residentes = int(f.read().split()[1])
+        if campos[0] == 'Z':
+            return None
+        cpu = (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+    return cpu, paginas_residentes * os.sysconf('SC_PAGE_SIZE')
@@ -0,0 +1,316 @@
+"""
+Serviço local de lançamentos, compartilhado pelo app Streamlit e pelo Bot Telegram.
+
+É o único processo que grava no armazenamento: mantém os lançamentos em memória
+(LivroCaixa), serializa todas as gravações e responde leituras e agregados aos dois
+front-ends, de modo que os dados são lidos uma vez por alteração, e não uma vez por
+consumidor. O start.py inicia o serviço e repassa o endereço aos demais processos pela
+variável de ambiente SERVICO_LANCAMENTOS.
+
+Protocolo: uma requisição JSON por linha ({"op": ..., "args": [...]}) e uma resposta
+JSON por linha ({"ok": true, "resultado": ...} ou {"ok": false, "erro": ...}). Com
+"conta" na requisição, as operações de lançamentos usam o livro-caixa próprio da conta
+(armazenamento.criar_armazenamento_local(conta)), carregado na primeira requisição; o
+catálogo de configurações é sempre o compartilhado.
+
+Uso:
+    python servico_lancamentos.py [--host 127.0.0.1] [--porta 8765]
+"""
+import argparse
+import json
+import logging
+import socket
+import socketserver
+import threading
+import time
+
+import pandas as pd
+from dotenv import load_dotenv
+
+import armazenamento
+import esquema
+import log_estruturado
+import metricas
+
+# Endereço padrão do serviço
+HOST_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 8765
+
+# Tempo máximo de espera por uma resposta do serviço
+TIMEOUT_SEGUNDOS = 30
+
+# Latência de cada operação atendida pelo serviço (inclui serialização)
+DURACAO_REQUISICOES = metricas.histograma('servico_requisicao_duracao_segundos', "Requisições atendidas pelo serviço")
+
+# Registros estruturados do serviço (log_estruturado.py)
+LOGGER = logging.getLogger('servico')
+
+
+class ErroServico(Exception):
+    """Erro informado pelo serviço de lançamentos"""
+
+
+def _para_tupla(valor):
+    """Versões chegam como listas JSON; tuplas podem ser usadas como chave de cache"""
+    if isinstance(valor, list):
+        return tuple(_para_tupla(item) for item in valor)
+    return valor
+
+
+def _df_para_colunas(df):
+    colunas = df.to_dict('list')
+    if 'Data' in colunas:
+        colunas['Data'] = [None if pd.isna(data) else data.isoformat() for data in df['Data']]
+    return {'colunas': list(df.columns), 'dados': colunas}
+
+
+def _colunas_para_df(payload):
+    df = pd.DataFrame(payload['dados'], columns=payload['colunas'])
+    if 'Data' in df.columns:
+        df['Data'] = pd.to_datetime(df['Data'], format='ISO8601')
+    return df
+
+
+def _lancamento_para_json(lancamento):
+    return {**lancamento, 'Data': pd.Timestamp(lancamento['Data']).isoformat()}
+
+
+def _lancamento_de_json(lancamento):
+    return {**lancamento, 'Data': pd.Timestamp(lancamento['Data'])}
+
+
+class ServicoLancamentos:
+    """Operações atendidas pelo serviço, sobre o livro-caixa do backend local"""
+
+    # Operações da conta de cada cliente (o livro-caixa dela)
+    _OPERACOES_CONTA = {
+        'versao_lancamentos', 'carregar_lancamentos', 'adicionar_lancamentos', 'totais_por_tipo', 'carregar_periodo',
+    }
+    # Operações que não dependem da conta (catálogo de configurações e sonda de vida)
+    _OPERACOES_COMPARTILHADAS = {'ping', 'versao_configuracoes', 'carregar_grade_configuracoes'}
+
+    def __init__(self, backend, criar_backend=armazenamento.criar_armazenamento_local):
+        self.backend = backend
+        self.livro = armazenamento.LivroCaixa(backend)
+        self._criar_backend = criar_backend
+        self._contas = {}
+        self._trava_contas = threading.Lock()
+
+    def _da_conta(self, conta):
+        """Serviço sobre o livro-caixa da conta (None é o compartilhado), criado na primeira requisição"""
+        if conta is None:
+            return self
+        conta = str(conta)
+        with self._trava_contas:
+            servico = self._contas.get(conta)
+            if servico is None:
+                servico = self._contas[conta] = ServicoLancamentos(self._criar_backend(conta), self._criar_backend)
+        return servico
+
+    def ping(self):
+        # Sonda de vida do supervisor (start.py): não toca no armazenamento
+        return True
+
+    def versao_lancamentos(self):
+        return self.livro.versao()
+
+    def carregar_lancamentos(self):
+        # Os clientes recebem o formato da planilha e aplicam o esquema no próprio livro-caixa
+        return _df_para_colunas(esquema.destipar_lancamentos(self.livro.lancamentos()))
+
+    def adicionar_lancamentos(self, lancamentos):
+        # O LivroCaixa serializa as gravações de todos os clientes
+        return self.livro.adicionar_lancamentos([_lancamento_de_json(l) for l in lancamentos])
+
+    def totais_por_tipo(self, inicio=None, fim=None):
+        return self.livro.totais_por_tipo(inicio, fim)
+
+    def carregar_periodo(self, inicio=None, fim=None):
+        # Lido direto do backend, que descarta as partições fora do período
+        return _df_para_colunas(self.backend.carregar_periodo(inicio, fim))
+
+    def versao_configuracoes(self):
+        return self.backend.versao_configuracoes()
+
+    def carregar_grade_configuracoes(self):
+        grade = self.backend.carregar_grade_configuracoes()
+        return grade.astype(object).where(grade.notna(), None).values.tolist()
+
+    def executar(self, operacao, args, conta=None):
+        # Só as operações listadas: atributos e métodos auxiliares não ficam expostos no socket
+        if operacao in self._OPERACOES_COMPARTILHADAS:
+            servico = self
+        elif operacao in self._OPERACOES_CONTA:
+            servico = self._da_conta(conta)
+        else:
+            raise ErroServico(f"Operação desconhecida: {operacao}")
+        return getattr(servico, operacao)(*args)
+
+
+class _TratadorRequisicoes(socketserver.StreamRequestHandler):
+    """Atende as requisições de uma conexão, uma por linha"""
+
+    def handle(self):
+        for linha in self.rfile:
+            inicio = time.perf_counter()
+            operacao = conta = None
+            try:
+                requisicao = json.loads(linha)
+                operacao = requisicao['op']
+                conta = requisicao.get('conta')
+                resultado = self.server.servico.executar(operacao, requisicao.get('args', []), conta)
+                resposta = {'ok': True, 'resultado': resultado}
+            except Exception as e:
+                resposta = {'ok': False, 'erro': f"{type(e).__name__}: {e}"}
+                extra = {
+                    'handler': str(operacao),
+                    'duracao_ms': round((time.perf_counter() - inicio) * 1000, 3),
+                }
+                if conta is not None:
+                    extra['conta'] = conta
+                try:
+                    extra['lancamentos'] = self.server.servico._da_conta(conta).livro.tamanho()
+                except Exception:
+                    pass
+                LOGGER.exception("Erro na operação %s", operacao, extra=extra)
+            self.wfile.write((json.dumps(resposta, ensure_ascii=False, default=str) + "\n").encode('utf-8'))
+            DURACAO_REQUISICOES.observar(time.perf_counter() - inicio, op=str(operacao), ok=resposta['ok'])
+            self.wfile.flush()
+
+
+class ServidorLancamentos(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, endereco, servico):
+        super().__init__(endereco, _TratadorRequisicoes)
+        self.servico = servico
+
+
+class ArmazenamentoServico(armazenamento.Armazenamento):
+    """Cliente do serviço de lançamentos com a mesma interface dos backends locais.
+
+    Com conta, todas as operações de lançamentos vão para o livro-caixa da conta.
+    """
+
+    def __init__(self, endereco, conta=None):
+        host, _, porta = endereco.rpartition(':')
+        self.endereco = (host or HOST_PADRAO, int(porta))
+        self.conta = None if conta is None else str(conta)
+        self._local = threading.local()
+
+    def _arquivo(self):
+        """Uma conexão persistente por thread"""
+        arquivo = getattr(self._local, 'arquivo', None)
+        if arquivo is None:
+            conexao = socket.create_connection(self.endereco, timeout=TIMEOUT_SEGUNDOS)
+            conexao.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            arquivo = conexao.makefile('rwb')
+            self._local.conexao = conexao
+            self._local.arquivo = arquivo
+        return arquivo
+
+    def _fechar(self):
+        for atributo in ('arquivo', 'conexao'):
+            objeto = getattr(self._local, atributo, None)
+            if objeto is not None:
+                try:
+                    objeto.close()
+                except OSError:
+                    pass
+                setattr(self._local, atributo, None)
+
+    def _chamar(self, operacao, *args):
+        requisicao = {'op': operacao, 'args': list(args)}
+        if self.conta is not None:
+            requisicao['conta'] = self.conta
+        requisicao = (json.dumps(requisicao, ensure_ascii=False) + "\n").encode('utf-8')
+        # Uma nova tentativa cobre conexões persistentes derrubadas pelo serviço
+        for tentativa in range(2):
+            try:
+                arquivo = self._arquivo()
+                arquivo.write(requisicao)
+                arquivo.flush()
+                linha = arquivo.readline()
+                if not linha:
+                    raise ConnectionError("Conexão encerrada pelo serviço de lançamentos")
+                break
+            except OSError:
+                self._fechar()
+                if tentativa:
+                    raise
+
+        resposta = json.loads(linha)
+        if not resposta['ok']:
+            raise ErroServico(resposta['erro'])
+        return resposta['resultado']
+
+    def carregar_lancamentos(self):
+        return _colunas_para_df(self._chamar('carregar_lancamentos'))
+
+    def adicionar_lancamentos(self, lancamentos):
+        versao_anterior, versao_nova = self._chamar(
+            'adicionar_lancamentos', [_lancamento_para_json(l) for l in lancamentos]
+        )
+        return _para_tupla(versao_anterior), _para_tupla(versao_nova)
+
+    def carregar_grade_configuracoes(self):
+        return pd.DataFrame(self._chamar('carregar_grade_configuracoes'))
+
+    def versao_lancamentos(self):
+        return _para_tupla(self._chamar('versao_lancamentos'))
+
+    def versao_configuracoes(self):
+        return _para_tupla(self._chamar('versao_configuracoes'))
+
+    def totais_por_tipo(self, inicio=None, fim=None):
+        inicio = pd.Timestamp(inicio).isoformat() if inicio is not None else None
+        fim = pd.Timestamp(fim).isoformat() if fim is not None else None
+        return self._chamar('totais_por_tipo', inicio, fim)
+
+    def carregar_periodo(self, inicio=None, fim=None):
+        inicio = pd.Timestamp(inicio).isoformat() if inicio is not None else None
+        fim = pd.Timestamp(fim).isoformat() if fim is not None else None
+        return _colunas_para_df(self._chamar('carregar_periodo', inicio, fim))
+
+
+def servico_responde(endereco, timeout=2.0):
+    """Indica se o serviço atende uma requisição (ping) dentro do timeout"""
+    host, _, porta = endereco.rpartition(':')
+    try:
+        with socket.create_connection((host or HOST_PADRAO, int(porta)), timeout=timeout) as conexao:
+            conexao.sendall(b'{"op": "ping", "args": []}\n')
+            with conexao.makefile('rb') as arquivo:
+                resposta = json.loads(arquivo.readline())
+    except (OSError, ValueError):
+        return False
+    return bool(resposta.get('ok'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço local de lançamentos")
+    parser.add_argument('--host', default=HOST_PADRAO)
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    args = parser.parse_args()
+
+    load_dotenv()
+    log_estruturado.configurar('servico')
+
+    # O serviço é o dono do armazenamento: usa sempre o backend local
+    servico = ServicoLancamentos(armazenamento.criar_armazenamento_local())
+    servico.livro.sincronizar()
+
+    endereco_metricas = metricas.iniciar_servidor('servico')
+    
+    with ServidorLancamentos((args.host, args.porta), servico) as servidor:
+        LOGGER.info("Serviço de lançamentos iniciado em %s:%s", args.host, args.porta)
+        if endereco_metricas:
+            LOGGER.info("Métricas disponíveis em http://%s/metrics", endereco_metricas)
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,80 +1,520 @@
 """
-Script para iniciar o aplicativo Streamlit e o Bot Telegram em background
+Script para iniciar o serviço de lançamentos, o aplicativo Streamlit e o Bot Telegram em background
+
+Uso:
+    python start.py                  # inicia os serviços em background e sai
+    python start.py --supervisionar  # inicia e continua rodando como supervisor
+    python start.py status           # estado, prontidão, CPU e memória de cada serviço
+
+No modo supervisionado o start.py fica em primeiro plano (use nohup, systemd ou um
+terminal separado) e, a cada INTERVALO_SUPERVISAO_SEGUNDOS:
+    - sonda a prontidão de cada serviço: ping no serviço de lançamentos,
+      /_stcore/health no Streamlit e o endpoint de métricas do bot;
+    - reinicia, com espera exponencial, serviços que encerraram, não ficaram prontos
+      a tempo ou deixaram de responder a FALHAS_SONDA_MAX sondas seguidas;
+    - amostra CPU e memória residente (RSS) de cada serviço;
+    - recicla o serviço cujo RSS passar do limite em LIMITE_MEMORIA_MB_<SERVICO>
+      (SERVICO, STREAMLIT ou BOT; ausente ou 0 = sem limite).
+
+O estado é gravado em .supervisor.json e lido pelo comando status. Ctrl+C ou
+'python stop.py' encerram o supervisor, que para os front-ends e depois o serviço.
 """
+import argparse
+import json
+import os
+import signal
 import subprocess
 import sys
-import os
+import threading
+import time
+import urllib.request
+from datetime import datetime
 from pathlib import Path
 
+import metricas
+from processos import TIMEOUT_PARADA_SEGUNDOS, amostrar_recursos, processo_vivo
+from servico_lancamentos import HOST_PADRAO, PORTA_PADRAO, servico_responde
+
+# Diretório dos arquivos de PID, logs e estado
+BASE_DIR = Path(__file__).parent
+
+ARQUIVO_PID_SUPERVISOR = BASE_DIR / ".supervisor.pid"
+ARQUIVO_ESTADO = BASE_DIR / ".supervisor.json"
+
+# Tempo máximo de espera para o serviço de lançamentos aceitar conexões
+TIMEOUT_SERVICO_SEGUNDOS = 30
+
+# Tempo máximo para um serviço (re)iniciado ficar pronto antes de ser reiniciado de novo
+TIMEOUT_PRONTIDAO_SEGUNDOS = 120
+
+# Intervalo entre sondas e amostras de recursos dos serviços prontos
+INTERVALO_SUPERVISAO_SEGUNDOS = 5
+
+# Timeout de cada sonda e sondas seguidas sem resposta até o serviço ser reiniciado
+TIMEOUT_SONDA_SEGUNDOS = 2
+FALHAS_SONDA_MAX = 3
+
+# Espera antes de reiniciar um serviço com falha: dobra a cada falha seguida, até o máximo
+BACKOFF_INICIAL_SEGUNDOS = 1
+BACKOFF_MAXIMO_SEGUNDOS = 60
+
+# Tempo pronto depois do qual um serviço volta a ter a espera inicial
+ESTAVEL_SEGUNDOS = 60
+
+# Amostras seguidas acima do limite de memória até o serviço ser reciclado
+AMOSTRAS_ACIMA_LIMITE = 3
+
+PORTA_STREAMLIT_PADRAO = 8501
+
+BYTES_POR_MB = 1024 * 1024
+
+
+def _sonda_http(url):
+    try:
+        with urllib.request.urlopen(url, timeout=TIMEOUT_SONDA_SEGUNDOS) as resposta:
+            return resposta.status == 200
+    except (OSError, ValueError):
+        return False
+
+
+def _ler_pid(arquivo):
+    try:
+        return int(arquivo.read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+
+class ProcessoServico:
+    """Um dos serviços iniciados pelo start.py: comando, log, PID, sonda e estado de supervisão"""
+
+    def __init__(self, nome, titulo, comando, arquivo_log, arquivo_pid, sonda, env=None, url=None):
+        self.nome = nome
+        self.titulo = titulo
+        self.comando = comando
+        self.arquivo_log = arquivo_log
+        self.arquivo_pid = arquivo_pid
+        self.sonda = sonda
+        self.env = env
+        self.url = url
+        limite_mb = float(os.getenv(f'LIMITE_MEMORIA_MB_{nome.upper()}', '0') or 0)
+        self.limite_rss = int(limite_mb * BYTES_POR_MB) if limite_mb > 0 else None
+
+        self.processo = None
+        self.estado = 'parado'
+        self.iniciado_em = None
+        self.pronto_desde = None
+        self.ultima_verificacao = None
+        self.reiniciar_em = None
+        self.falhas_seguidas = 0
+        self.falhas_sonda = 0
+        self.acima_limite = 0
+        self.reinicios = 0
+        self.reciclagens = 0
+        self.ultimo_erro = None
+        self.cpu_percentual = None
+        self.rss = None
+        self._amostra_anterior = None
+
+    @property
+    def pid(self):
+        return self.processo.pid if self.processo is not None else None
+
+    def iniciar(self):
+        """Inicia o processo, acrescentando a saída ao log (o logs.py acompanha rotações)"""
+        with open(self.arquivo_log, 'a', encoding='utf-8') as log:
+            # Marca com data e hora o início de cada execução no log
+            log.write(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] INFO 🚀 {self.titulo} iniciado\n")
+            log.flush()
+            self.processo = subprocess.Popen(
+                self.comando,
+                stdout=log,
+                stderr=log,
+                env=self.env,
+                cwd=BASE_DIR,
+                # Em sessão própria, o Ctrl+C do terminal chega só ao supervisor, que
+                # encerra os serviços na ordem
+                start_new_session=sys.platform != 'win32',
+                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+            )
+        self.arquivo_pid.write_text(str(self.processo.pid))
+        self.estado = 'iniciando'
+        self.iniciado_em = time.monotonic()
+        self.pronto_desde = None
+        self.ultima_verificacao = None
+        self.falhas_sonda = 0
+        self.acima_limite = 0
+        self.cpu_percentual = None
+        self.rss = None
+        self._amostra_anterior = None
+
+    def parar(self):
+        """SIGTERM e, se o processo não encerrar a tempo, SIGKILL"""
+        if self.processo is not None and self.processo.poll() is None:
+            self.processo.terminate()
+            try:
+                self.processo.wait(TIMEOUT_PARADA_SEGUNDOS)
+            except subprocess.TimeoutExpired:
+                self.processo.kill()
+                self.processo.wait()
+        self.estado = 'parado'
+        if self.arquivo_pid.exists():
+            self.arquivo_pid.unlink()
+
+    def amostrar(self, agora):
+        """Atualiza CPU (% de um núcleo desde a amostra anterior) e RSS do processo"""
+        amostra = amostrar_recursos(self.pid) if self.pid is not None else None
+        if amostra is None:
+            self.cpu_percentual = self.rss = None
+            self._amostra_anterior = None
+            return
+        cpu, self.rss = amostra
+        if self._amostra_anterior is not None:
+            cpu_anterior, instante_anterior = self._amostra_anterior
+            decorrido = agora - instante_anterior
+            if decorrido > 0:
+                self.cpu_percentual = 100 * (cpu - cpu_anterior) / decorrido
+        self._amostra_anterior = (cpu, agora)
+
+    def situacao(self):
+        """Estado do serviço para o arquivo lido pelo comando status"""
+        return {
+            'titulo': self.titulo,
+            'pid': self.pid,
+            'estado': self.estado,
+            'reinicios': self.reinicios,
+            'reciclagens': self.reciclagens,
+            'cpu_percentual': self.cpu_percentual,
+            'rss_mb': self.rss / BYTES_POR_MB if self.rss is not None else None,
+            'limite_mb': self.limite_rss / BYTES_POR_MB if self.limite_rss is not None else None,
+            'ultimo_erro': self.ultimo_erro,
+        }
+
+
+def definir_servicos():
+    """Serviços na ordem de início: o serviço de lançamentos antes dos front-ends"""
+    endereco_servico = os.getenv('SERVICO_LANCAMENTOS', f"{HOST_PADRAO}:{PORTA_PADRAO}")
+    host_servico, _, porta_servico = endereco_servico.rpartition(':')
+    porta_streamlit = os.getenv('PORTA_STREAMLIT', str(PORTA_STREAMLIT_PADRAO))
+
+    # Saída sem buffer, para o logs.py mostrar cada linha assim que ela é escrita
+    env_base = {**os.environ, 'PYTHONUNBUFFERED': '1'}
+    # App e bot leem e gravam pelo serviço
+    env_servicos = {**env_base, 'SERVICO_LANCAMENTOS': endereco_servico}
+
+    # Sem endpoint de métricas, a sonda do bot é só o processo estar vivo
+    metricas_bot = metricas.endereco_configurado('bot')
+    if metricas_bot:
+        sonda_bot = lambda: _sonda_http(f"http://{metricas_bot}/metrics")
+    else:
+        sonda_bot = lambda: True
+
+    return [
+        ProcessoServico(
+            'servico', "Serviço de lançamentos",
+            [sys.executable, "servico_lancamentos.py", "--host", host_servico, "--porta", porta_servico],
+            BASE_DIR / "servico_lancamentos.log", BASE_DIR / ".servico.pid",
+            lambda: servico_responde(endereco_servico, TIMEOUT_SONDA_SEGUNDOS),
+            env=env_base,
+        ),
+        ProcessoServico(
+            'streamlit', "Streamlit",
+            [sys.executable, "-m", "streamlit", "run", "app_lancamentos.py.py",
+             "--server.headless", "true", "--server.port", porta_streamlit],
+            BASE_DIR / "streamlit.log", BASE_DIR / ".streamlit.pid",
+            lambda: _sonda_http(f"http://127.0.0.1:{porta_streamlit}/_stcore/health"),
+            env=env_servicos,
+            url=f"http://localhost:{porta_streamlit}",
+        ),
+        ProcessoServico(
+            'bot', "Bot Telegram",
+            [sys.executable, "bot_telegram.py"],
+            BASE_DIR / "bot_telegram.log", BASE_DIR / ".bot.pid",
+            sonda_bot,
+            env=env_servicos,
+        ),
+    ]
+
+
+def _iniciar_em_ordem(servicos):
+    """Inicia os serviços aguardando o de lançamentos aceitar conexões antes dos front-ends.
+
+    Em caso de erro, para os que já tinham sido iniciados e relança a exceção.
+    """
+    iniciados = []
+    try:
+        for processo in servicos:
+            try:
+                processo.iniciar()
+                iniciados.append(processo)
+                if processo.nome == 'servico':
+                    # Aguardar o serviço responder antes de iniciar os front-ends
+                    limite = time.monotonic() + TIMEOUT_SERVICO_SEGUNDOS
+                    while not processo.sonda():
+                        if processo.processo.poll() is not None or time.monotonic() > limite:
+                            raise RuntimeError(f"serviço não respondeu (veja {processo.arquivo_log.name})")
+                        time.sleep(0.2)
+            except Exception as e:
+                raise RuntimeError(f"Erro ao iniciar {processo.titulo}: {e}") from e
+            print(f"✅ {processo.titulo} iniciado (PID: {processo.pid})")
+            if processo.url:
+                print(f"   Acesse: {processo.url}")
+    except Exception:
+        # Parar na ordem inversa os serviços que chegaram a iniciar
+        for processo in reversed(iniciados):
+            processo.parar()
+        raise
+
+
+def _servicos_em_execucao():
+    arquivos = [ARQUIVO_PID_SUPERVISOR, BASE_DIR / ".servico.pid", BASE_DIR / ".streamlit.pid", BASE_DIR / ".bot.pid"]
+    return any(arquivo.exists() for arquivo in arquivos)
+
+
 def start_services():
     """Inicia os serviços em background"""
-    
-    # Diretório atual
-    base_dir = Path(__file__).parent
-    
-    # Arquivos de PID e logs
-    streamlit_pid_file = base_dir / ".streamlit.pid"
-    bot_pid_file = base_dir / ".bot.pid"
-    streamlit_log_file = base_dir / "streamlit.log"
-    bot_log_file = base_dir / "bot_telegram.log"
-    
+
     # Verificar se já estão rodando
-    if streamlit_pid_file.exists() or bot_pid_file.exists():
+    if _servicos_em_execucao():
         print("⚠️  Serviços já estão em execução!")
         print("Use 'python stop.py' para parar os serviços antes de iniciá-los novamente.")
         return
-    
+
     print("🚀 Iniciando serviços...")
-    
-    # Iniciar Streamlit
-    try:
-        with open(streamlit_log_file, 'w', encoding='utf-8') as log:
-            streamlit_process = subprocess.Popen(
-                [sys.executable, "-m", "streamlit", "run", "app_lancamentos.py.py", "--server.headless", "true"],
-                stdout=log,
-                stderr=log,
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-            )
-        
-        # Salvar PID do Streamlit
-        with open(streamlit_pid_file, 'w') as f:
-            f.write(str(streamlit_process.pid))
-        
-        print(f"✅ Streamlit iniciado (PID: {streamlit_process.pid})")
-        print(f"   Acesse: http://localhost:8501")
-    except Exception as e:
-        print(f"❌ Erro ao iniciar Streamlit: {e}")
-        return
-    
-    # Iniciar Bot Telegram
+
     try:
-        with open(bot_log_file, 'w', encoding='utf-8') as log:
-            bot_process = subprocess.Popen(
-                [sys.executable, "bot_telegram.py"],
-                stdout=log,
-                stderr=log,
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-            )
-        
-        # Salvar PID do Bot
-        with open(bot_pid_file, 'w') as f:
-            f.write(str(bot_process.pid))
-        
-        print(f"✅ Bot Telegram iniciado (PID: {bot_process.pid})")
-    except Exception as e:
-        print(f"❌ Erro ao iniciar Bot Telegram: {e}")
-        # Parar Streamlit se o bot falhar
-        streamlit_process.terminate()
-        streamlit_pid_file.unlink()
+        _iniciar_em_ordem(definir_servicos())
+    except RuntimeError as e:
+        print(f"❌ {e}")
         return
-    
+
     print("\n" + "="*50)
     print("✨ Todos os serviços foram iniciados com sucesso!")
     print("="*50)
     print("\n📋 Comandos disponíveis:")
-    print("  • python logs.py      - Ver logs em tempo real")
-    print("  • python stop.py      - Parar todos os serviços")
+    print("  • python start.py status - Estado e uso de recursos dos serviços")
+    print("  • python logs.py         - Ver logs em tempo real")
+    print("  • python stop.py         - Parar todos os serviços")
     print("\n💡 Os serviços estão rodando em background.")
 
+
+class Supervisor:
+    """Mantém os serviços rodando: sondas, reinícios com espera e limite de memória"""
+
+    def __init__(self, servicos):
+        self.servicos = servicos
+        self._parar = threading.Event()
+        self._iniciado_em = datetime.now()
+
+    def _registrar(self, mensagem):
+        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {mensagem}", flush=True)
+
+    def solicitar_parada(self, *_):
+        self._parar.set()
+
+    def executar(self):
+        print("🚀 Iniciando serviços supervisionados...")
+        _iniciar_em_ordem(self.servicos)
+        ARQUIVO_PID_SUPERVISOR.write_text(str(os.getpid()))
+        print(f"🛡️  Supervisor em execução (PID: {os.getpid()}). Ctrl+C ou 'python stop.py' para parar.\n")
+
+        try:
+            while not self._parar.is_set():
+                agora = time.monotonic()
+                for servico in self.servicos:
+                    if self._parar.is_set():
+                        break
+                    self._verificar(servico, agora)
+                self._gravar_estado()
+                # Serviços iniciando ou aguardando reinício são verificados a cada segundo
+                pendentes = any(servico.estado != 'pronto' for servico in self.servicos)
+                self._parar.wait(1 if pendentes else INTERVALO_SUPERVISAO_SEGUNDOS)
+        finally:
+            self._encerrar()
+
+    def _verificar(self, servico, agora):
+        if servico.estado == 'aguardando':
+            if agora >= servico.reiniciar_em:
+                self._registrar(f"🔄 Reiniciando {servico.titulo}")
+                servico.iniciar()
+                servico.reinicios += 1
+            return
+
+        codigo = servico.processo.poll()
+        if codigo is not None:
+            self._falhou(servico, agora, f"encerrou com código {codigo}")
+            return
+
+        if (servico.ultima_verificacao is not None
+                and agora - servico.ultima_verificacao < INTERVALO_SUPERVISAO_SEGUNDOS
+                and servico.estado == 'pronto'):
+            return
+        servico.ultima_verificacao = agora
+
+        servico.amostrar(agora)
+        # O limite só vale depois de pronto: a carga inicial dos lançamentos tem picos de memória
+        acima = servico.rss is not None and servico.limite_rss is not None and servico.rss > servico.limite_rss
+        if servico.estado == 'pronto' and acima:
+            servico.acima_limite += 1
+            if servico.acima_limite >= AMOSTRAS_ACIMA_LIMITE:
+                self._reciclar(servico)
+                return
+        else:
+            servico.acima_limite = 0
+
+        pronto = servico.sonda()
+        if servico.estado == 'iniciando':
+            if pronto:
+                servico.estado = 'pronto'
+                servico.pronto_desde = agora
+                self._registrar(f"✅ {servico.titulo} pronto (PID: {servico.pid})")
+            elif agora - servico.iniciado_em > TIMEOUT_PRONTIDAO_SEGUNDOS:
+                self._falhou(servico, agora, f"não ficou pronto em {TIMEOUT_PRONTIDAO_SEGUNDOS}s")
+            return
+
+        if pronto:
+            servico.falhas_sonda = 0
+            if agora - servico.pronto_desde >= ESTAVEL_SEGUNDOS:
+                servico.falhas_seguidas = 0
+            return
+        servico.falhas_sonda += 1
+        if servico.falhas_sonda >= FALHAS_SONDA_MAX:
+            self._falhou(servico, agora, f"não respondeu a {FALHAS_SONDA_MAX} sondas seguidas")
+
+    def _falhou(self, servico, agora, motivo):
+        servico.parar()
+        servico.falhas_seguidas += 1
+        espera = min(BACKOFF_MAXIMO_SEGUNDOS, BACKOFF_INICIAL_SEGUNDOS * 2 ** (servico.falhas_seguidas - 1))
+        servico.estado = 'aguardando'
+        servico.reiniciar_em = agora + espera
+        servico.ultimo_erro = f"{datetime.now():%Y-%m-%d %H:%M:%S} {motivo}"
+        self._registrar(f"❌ {servico.titulo} {motivo}; reinício em {espera}s (veja {servico.arquivo_log.name})")
+
+    def _reciclar(self, servico):
+        """Reinicia sem espera um serviço acima do limite de memória (não conta como falha)"""
+        rss_mb = servico.rss / BYTES_POR_MB
+        limite_mb = servico.limite_rss / BYTES_POR_MB
+        self._registrar(f"♻️  Reciclando {servico.titulo}: {rss_mb:.0f} MB acima do limite de {limite_mb:.0f} MB")
+        servico.parar()
+        servico.iniciar()
+        servico.reciclagens += 1
+
+    def _gravar_estado(self):
+        estado = {
+            'pid': os.getpid(),
+            'iniciado_em': self._iniciado_em.isoformat(timespec='seconds'),
+            'atualizado_em': datetime.now().isoformat(timespec='seconds'),
+            'servicos': {servico.nome: servico.situacao() for servico in self.servicos},
+        }
+        temporario = ARQUIVO_ESTADO.with_suffix('.tmp')
+        temporario.write_text(json.dumps(estado, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(temporario, ARQUIVO_ESTADO)
+
+    def _encerrar(self):
+        print("\n🛑 Encerrando serviços...")
+        # Front-ends primeiro, o serviço de lançamentos por último
+        for servico in reversed(self.servicos):
+            if servico.estado != 'parado':
+                servico.parar()
+                print(f"✅ {servico.titulo} parado")
+        for arquivo in (ARQUIVO_ESTADO, ARQUIVO_PID_SUPERVISOR):
+            if arquivo.exists():
+                arquivo.unlink()
+        print("✨ Supervisor encerrado.")
+
+
+def supervisionar():
+    """Inicia os serviços e continua rodando como supervisor até Ctrl+C ou SIGTERM"""
+    if _servicos_em_execucao():
+        print("⚠️  Serviços já estão em execução!")
+        print("Use 'python stop.py' para parar os serviços antes de iniciá-los novamente.")
+        return
+
+    supervisor = Supervisor(definir_servicos())
+    signal.signal(signal.SIGINT, supervisor.solicitar_parada)
+    signal.signal(signal.SIGTERM, supervisor.solicitar_parada)
+    try:
+        supervisor.executar()
+    except RuntimeError as e:
+        print(f"❌ {e}")
+
+
+def mostrar_status():
+    """Estado de cada serviço conferido agora: processo vivo, sonda, CPU e memória"""
+    servicos = definir_servicos()
+
+    supervisor_pid = _ler_pid(ARQUIVO_PID_SUPERVISOR)
+    situacoes = {}
+    if supervisor_pid is not None and processo_vivo(supervisor_pid):
+        try:
+            estado = json.loads(ARQUIVO_ESTADO.read_text(encoding='utf-8'))
+            situacoes = estado['servicos']
+            print(f"🛡️  Supervisor em execução (PID: {supervisor_pid}, desde {estado['iniciado_em']})")
+        except (OSError, ValueError, KeyError):
+            print(f"🛡️  Supervisor em execução (PID: {supervisor_pid}), estado ainda não gravado")
+    elif supervisor_pid is not None:
+        print(f"⚠️  Supervisor não está em execução (PID obsoleto em {ARQUIVO_PID_SUPERVISOR.name})")
+    else:
+        print("ℹ️  Sem supervisor (use 'python start.py --supervisionar' para reinícios automáticos)")
+    print()
+
+    # Duas amostras com meio segundo de intervalo para estimar o uso de CPU
+    pids = {servico.nome: _ler_pid(servico.arquivo_pid) for servico in servicos}
+    vivos = {nome: pid is not None and processo_vivo(pid) for nome, pid in pids.items()}
+    inicio = time.monotonic()
+    primeiras = {nome: amostrar_recursos(pid) for nome, pid in pids.items() if vivos[nome]}
+    time.sleep(0.5)
+    decorrido = time.monotonic() - inicio
+
+    algum_vivo = False
+    for servico in servicos:
+        pid = pids[servico.nome]
+        situacao = situacoes.get(servico.nome, {})
+        if pid is None:
+            estado_supervisor = situacao.get('estado')
+            detalhe = "aguardando reinício" if estado_supervisor == 'aguardando' else "parado"
+            print(f"❌ {servico.titulo}: {detalhe}")
+        elif not vivos[servico.nome]:
+            print(f"❌ {servico.titulo}: parado (PID obsoleto {pid} em {servico.arquivo_pid.name})")
+        else:
+            algum_vivo = True
+            pronto = servico.sonda()
+            icone, detalhe = ("✅", "pronto") if pronto else ("⚠️ ", "em execução, sem resposta")
+            print(f"{icone} {servico.titulo}: {detalhe} (PID: {pid})")
+
+            primeira = primeiras.get(servico.nome)
+            segunda = amostrar_recursos(pid)
+            if primeira is not None and segunda is not None:
+                cpu = 100 * (segunda[0] - primeira[0]) / decorrido
+                print(f"   CPU: {cpu:.1f}%  RSS: {segunda[1] / BYTES_POR_MB:.1f} MB", end="")
+                if servico.limite_rss is not None:
+                    print(f" (limite: {servico.limite_rss / BYTES_POR_MB:.0f} MB)", end="")
+                print()
+            else:
+                print("   CPU e memória indisponíveis (fora do Linux, requer o psutil)")
+
+        if situacao.get('reinicios') or situacao.get('reciclagens'):
+            print(f"   Reinícios: {situacao['reinicios']}  Reciclagens por memória: {situacao['reciclagens']}")
+        if situacao.get('ultimo_erro'):
+            print(f"   Última falha: {situacao['ultimo_erro']}")
+
+    if not algum_vivo:
+        print("\nUse 'python start.py' para iniciar os serviços.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inicia os serviços do controle financeiro")
+    parser.add_argument('comando', nargs='?', choices=['iniciar', 'status'], default='iniciar')
+    parser.add_argument('--supervisionar', action='store_true',
+                        help="continua rodando, reiniciando serviços com falha")
+    args = parser.parse_args()
+
+    if args.comando == 'status':
+        mostrar_status()
+    elif args.supervisionar:
+        supervisionar()
+    else:
+        start_services()
+
+
 if __name__ == '__main__':
-    start_services()
+    main()
@@ -1,65 +1,97 @@
 """
-Script para parar o aplicativo Streamlit e o Bot Telegram
+Script para parar o aplicativo Streamlit, o Bot Telegram e o serviço de lançamentos
 """
 import os
 import sys
+import time
 from pathlib import Path
 import signal
 
+from processos import TIMEOUT_PARADA_SEGUNDOS, processo_vivo
+
+def _parar_pid(pid):
+    if sys.platform == 'win32':
+        os.system(f'taskkill /PID {pid} /F >nul 2>&1')
+    else:
+        os.kill(pid, signal.SIGTERM)
+
+def _parar_processo(pid_file, nome):
+    """Para o processo do arquivo de PID; retorna True se havia um processo em execução"""
+    if not pid_file.exists():
+        return False
+
+    try:
+        with open(pid_file, 'r') as f:
+            pid = int(f.read().strip())
+
+        # PID de um processo que já encerrou (ex.: após uma queda): só limpar o arquivo
+        if not processo_vivo(pid):
+            pid_file.unlink()
+            print(f"ℹ️  {nome} já não estava em execução (PID obsoleto: {pid})")
+            return False
+
+        _parar_pid(pid)
+
+        pid_file.unlink()
+        print(f"✅ {nome} parado (PID: {pid})")
+        return True
+    except Exception as e:
+        print(f"⚠️  Erro ao parar {nome}: {e}")
+        # Remover arquivo PID mesmo com erro
+        if pid_file.exists():
+            pid_file.unlink()
+        return False
+
+def _parar_supervisor(pid_file):
+    """Para o supervisor antes dos serviços, para que ele não os reinicie.
+
+    Com SIGTERM, o próprio supervisor para os serviços na ordem e remove os arquivos de
+    PID; no Windows (taskkill /F) os serviços são parados pelos arquivos de PID a seguir.
+    """
+    if not pid_file.exists():
+        return False
+
+    try:
+        pid = int(pid_file.read_text().strip())
+    except (OSError, ValueError):
+        pid = None
+
+    if pid is None or not processo_vivo(pid):
+        pid_file.unlink()
+        return False
+
+    _parar_pid(pid)
+    print(f"⏳ Aguardando o supervisor encerrar os serviços (PID: {pid})...")
+    limite = time.monotonic() + 3 * TIMEOUT_PARADA_SEGUNDOS
+    while processo_vivo(pid) and time.monotonic() < limite:
+        time.sleep(0.2)
+
+    if pid_file.exists():
+        pid_file.unlink()
+    print(f"✅ Supervisor parado (PID: {pid})")
+    return True
+
 def stop_services():
     """Para os serviços em execução"""
-    
+
     # Diretório atual
     base_dir = Path(__file__).parent
-    
-    # Arquivos de PID
-    streamlit_pid_file = base_dir / ".streamlit.pid"
-    bot_pid_file = base_dir / ".bot.pid"
-    
-    stopped = False
-    
-    # Parar Streamlit
-    if streamlit_pid_file.exists():
-        try:
-            with open(streamlit_pid_file, 'r') as f:
-                pid = int(f.read().strip())
-            
-            # Tentar parar o processo
-            if sys.platform == 'win32':
-                os.system(f'taskkill /PID {pid} /F >nul 2>&1')
-            else:
-                os.kill(pid, signal.SIGTERM)
-            
-            streamlit_pid_file.unlink()
-            print(f"✅ Streamlit parado (PID: {pid})")
-            stopped = True
-        except Exception as e:
-            print(f"⚠️  Erro ao parar Streamlit: {e}")
-            # Remover arquivo PID mesmo com erro
-            if streamlit_pid_file.exists():
-                streamlit_pid_file.unlink()
-    
-    # Parar Bot Telegram
-    if bot_pid_file.exists():
-        try:
-            with open(bot_pid_file, 'r') as f:
-                pid = int(f.read().strip())
-            
-            # Tentar parar o processo
-            if sys.platform == 'win32':
-                os.system(f'taskkill /PID {pid} /F >nul 2>&1')
-            else:
-                os.kill(pid, signal.SIGTERM)
-            
-            bot_pid_file.unlink()
-            print(f"✅ Bot Telegram parado (PID: {pid})")
-            stopped = True
-        except Exception as e:
-            print(f"⚠️  Erro ao parar Bot Telegram: {e}")
-            # Remover arquivo PID mesmo com erro
-            if bot_pid_file.exists():
-                bot_pid_file.unlink()
-    
+
+    stopped = _parar_supervisor(base_dir / ".supervisor.pid")
+
+    # Front-ends primeiro; o serviço de lançamentos por último, depois dos front-ends que o usam
+    processos = [
+        (base_dir / ".streamlit.pid", "Streamlit"),
+        (base_dir / ".bot.pid", "Bot Telegram"),
+        (base_dir / ".servico.pid", "Serviço de lançamentos"),
+    ]
+    for pid_file, nome in processos:
+        stopped = _parar_processo(pid_file, nome) or stopped
+
+    estado_supervisor = base_dir / ".supervisor.json"
+    if estado_supervisor.exists():
+        estado_supervisor.unlink()
+
     if not stopped:
         print("ℹ️  Nenhum serviço em execução.")
     else:
@@ -0,0 +1,56 @@
+"""
+Fixtures compartilhadas pelos testes: lançamentos sintéticos (os mesmos do benchmark.py)
+e backends locais gravados em diretórios temporários.
+"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import armazenamento  # noqa: E402
+import benchmark  # noqa: E402
+import esquema  # noqa: E402
+
+# Data fixa: os lançamentos sintéticos incluem ~2 meses futuros a partir dela
+HOJE = pd.Timestamp('2026-01-15')
+
+
+@pytest.fixture
+def lancamentos():
+    """Lançamentos no formato da planilha (Valor em reais), ordenados por Data"""
+    return benchmark.gerar_lancamentos(2_000, semente=7, hoje=HOJE)
+
+
+@pytest.fixture
+def tipados(lancamentos):
+    """Os mesmos lançamentos no esquema tipado, em ordem de inserção embaralhada"""
+    embaralhados = lancamentos.sample(frac=1, random_state=3).reset_index(drop=True)
+    return esquema.tipar_lancamentos(embaralhados)
+
+
+@pytest.fixture
+def grade():
+    return benchmark.gerar_grade_configuracoes()
+
+
+@pytest.fixture
+def configuracoes(grade):
+    return armazenamento._configuracoes_da_grade(grade)
+
+
+@pytest.fixture(params=['sqlite', 'excel'])
+def backend(request, tmp_path, grade):
+    """Backend local (SQLite ou planilha + journal) com 500 lançamentos sintéticos"""
+    arquivo_db = str(tmp_path / 'planilha_financeira.db')
+    armazenamento.ArmazenamentoSQLite(arquivo_db).importar(
+        benchmark.gerar_lancamentos(500, semente=11, hoje=HOJE), grade
+    )
+    if request.param == 'sqlite':
+        return armazenamento.ArmazenamentoSQLite(arquivo_db)
+
+    arquivo_excel = str(tmp_path / 'planilha_financeira.xlsx')
+    armazenamento.exportar_sqlite_para_excel(arquivo_db, arquivo_excel)
+    return armazenamento.ArmazenamentoExcel(arquivo_excel)
@@ -0,0 +1,80 @@
+"""
+Leituras da planilha + journal enquanto compactações trocam a planilha.
+"""
+import itertools
+
+import pandas as pd
+import pytest
+
+import armazenamento
+import benchmark
+import esquema
+from conftest import HOJE
+
+
+@pytest.fixture
+def excel(tmp_path, grade):
+    """Planilha com 200 lançamentos e 3 ainda no journal"""
+    arquivo_db = str(tmp_path / 'planilha_financeira.db')
+    armazenamento.ArmazenamentoSQLite(arquivo_db).importar(benchmark.gerar_lancamentos(200, semente=11, hoje=HOJE), grade)
+    arquivo_excel = str(tmp_path / 'planilha_financeira.xlsx')
+    armazenamento.exportar_sqlite_para_excel(arquivo_db, arquivo_excel)
+    backend = armazenamento.ArmazenamentoExcel(arquivo_excel)
+    for i in range(3):
+        backend.adicionar_lancamento(HOJE, f"Journal {i}", 'Lazer', 'Despesa', 10.0 + i, 'Pix')
+    return backend
+
+
+@pytest.fixture
+def travas(monkeypatch):
+    """Caminhos das travas obtidas durante o teste"""
+    obtidas = []
+    trava = armazenamento._trava_arquivo
+
+    def registrar(caminho, bloquear=True):
+        obtidas.append(caminho)
+        return trava(caminho, bloquear)
+
+    monkeypatch.setattr(armazenamento, '_trava_arquivo', registrar)
+    return obtidas
+
+
+def _sempre_trocada(backend, monkeypatch):
+    """A versão da planilha muda a cada consulta, como sob compactações seguidas"""
+    versoes = itertools.count()
+    monkeypatch.setattr(backend, '_versao_excel', lambda: next(versoes))
+
+
+def _em_ordem(df):
+    return df.sort_values(['Data', 'Descrição', 'Valor'], kind='stable').reset_index(drop=True)
+
+
+def test_ler_em_blocos_le_sob_a_trava_quando_a_planilha_sempre_muda(excel, travas, monkeypatch):
+    esperado = pd.concat([esquema.destipar_lancamentos(bloco) for bloco in excel.ler_em_blocos(50)], ignore_index=True)
+    assert excel._arquivo_trava_compactacao not in travas
+
+    _sempre_trocada(excel, monkeypatch)
+    blocos = list(excel.ler_em_blocos(50))
+    assert travas.count(excel._arquivo_trava_compactacao) == 1
+    lido = pd.concat([esquema.destipar_lancamentos(bloco) for bloco in blocos], ignore_index=True)
+    assert len(lido) == 203
+    pd.testing.assert_frame_equal(_em_ordem(lido), _em_ordem(esperado))
+
+
+def test_carregar_lancamentos_le_sob_a_trava_quando_a_planilha_sempre_muda(excel, travas, monkeypatch):
+    esperado = excel.carregar_lancamentos()
+    assert len(esperado) == 203
+    assert excel._arquivo_trava_compactacao not in travas
+
+    _sempre_trocada(excel, monkeypatch)
+    lido = excel.carregar_lancamentos()
+    assert travas.count(excel._arquivo_trava_compactacao) == 1
+    pd.testing.assert_frame_equal(_em_ordem(lido), _em_ordem(esperado))
+
+
+def test_leituras_depois_de_uma_compactacao(excel):
+    antes = _em_ordem(excel.carregar_lancamentos())
+    assert excel.compactar() == 3
+    pd.testing.assert_frame_equal(_em_ordem(excel.carregar_lancamentos()), antes)
+    blocos = pd.concat([esquema.destipar_lancamentos(bloco) for bloco in excel.ler_em_blocos(50)], ignore_index=True)
+    assert len(blocos) == len(antes)
@@ -0,0 +1,100 @@
+"""
+Conversões de esquema.py: centavos inteiros, esquema tipado e anexação de categorias.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import esquema
+
+
+@pytest.mark.parametrize('valor, centavos', [
+    (12.5, 1250),
+    (0.1 + 0.2, 30),
+    (1234.56, 123456),
+    (-7.01, -701),
+    ('12.34', 1234),
+    (np.float32(2.5), 250),
+    (np.int64(3), 300),
+    (0, 0),
+])
+def test_para_centavos_escalar(valor, centavos):
+    assert esquema.para_centavos(valor) == centavos
+    assert isinstance(esquema.para_centavos(valor), int)
+
+
+@pytest.mark.parametrize('valor', [None, np.nan, float('inf'), 'abc', '12,5', '', pd.NA])
+def test_para_centavos_recusa_invalidos(valor):
+    with pytest.raises(ValueError, match='Valor inválido'):
+        esquema.para_centavos(valor)
+    assert esquema.para_centavos(valor, padrao=0) == 0
+
+
+def test_para_centavos_serie_igual_ao_arredondamento_direto():
+    rng = np.random.default_rng(1)
+    reais = np.round(rng.lognormal(4, 2, 5_000) * rng.choice([-1, 1], 5_000), 2)
+    esperado = [int(round(valor * 100)) for valor in reais]
+    assert esquema.para_centavos(reais).tolist() == esperado
+    assert esquema.para_centavos(pd.Series(reais)).dtype == np.int64
+    assert esquema.para_centavos(pd.Series(reais.astype(str), dtype=object)).tolist() == esperado
+
+
+def test_para_centavos_serie_recusa_invalidos():
+    valores = pd.Series([1.5, None, 'abc', 2.25, np.inf], dtype=object)
+    with pytest.raises(ValueError, match='3 valores inválidos'):
+        esquema.para_centavos(valores)
+    assert esquema.para_centavos(valores, padrao=0).tolist() == [150, 0, 0, 225, 0]
+
+
+def test_tipar_e_destipar_voltam_ao_formato_da_planilha(lancamentos):
+    tipado = esquema.tipar_lancamentos(lancamentos)
+    for col, tipo in esquema.ESQUEMA_LANCAMENTOS.items():
+        if tipo == 'category':
+            assert isinstance(tipado[col].dtype, pd.CategoricalDtype), col
+        else:
+            assert tipado[col].dtype == tipo, col
+    assert (tipado['Valor'] == [int(round(valor * 100)) for valor in lancamentos['Valor']]).all()
+
+    planilha = esquema.destipar_lancamentos(tipado)
+    pd.testing.assert_frame_equal(planilha, lancamentos.astype({'Descrição': object}), check_dtype=False)
+    assert (planilha['Valor'] == lancamentos['Valor']).all()
+
+
+def test_tipar_colunas_ausentes_extras_e_valores_invalidos(caplog):
+    df = pd.DataFrame({
+        'Data': ['2026-01-10', '2026-01-11 08:30:00', None],
+        'Valor': [10.0, 'x', None],
+        'Extra': [1, 2, 3],
+    })
+    with caplog.at_level(logging.WARNING, logger='esquema'):
+        tipado = esquema.tipar_lancamentos(df)
+    assert list(tipado.columns) == list(esquema.ESQUEMA_LANCAMENTOS)
+    assert tipado['Valor'].tolist() == [1000, 0, 0]
+    assert tipado['Data'].isna().tolist() == [False, False, True]
+    assert tipado['Categoria'].isna().all()
+    assert '2 valores inválidos' in caplog.text
+
+    planilha = esquema.destipar_lancamentos(tipado)
+    assert planilha['Categoria'].tolist() == [None, None, None]
+
+
+def test_anexar_lancamentos_igual_a_tipar_tudo_de_uma_vez(lancamentos):
+    primeiros = lancamentos.iloc[:1500]
+    novos = lancamentos.iloc[1500:].copy()
+    novos.loc[novos.index[::3], 'Categoria'] = 'Presentes'
+    novos.loc[novos.index[1::5], 'Método'] = 'Vale'
+
+    anexado = esquema.anexar_lancamentos(esquema.tipar_lancamentos(primeiros), esquema.tipar_lancamentos(novos))
+    direto = esquema.tipar_lancamentos(pd.concat([primeiros, novos], ignore_index=True))
+
+    for col in esquema.COLUNAS_CATEGORICAS:
+        assert isinstance(anexado[col].dtype, pd.CategoricalDtype), col
+        # Categorias antigas mantêm os códigos; as novas vão para o fim
+        atuais = list(esquema.tipar_lancamentos(primeiros)[col].cat.categories)
+        assert list(anexado[col].cat.categories[:len(atuais)]) == atuais
+    pd.testing.assert_frame_equal(
+        esquema.destipar_lancamentos(anexado), esquema.destipar_lancamentos(direto), check_categorical=False
+    )
+    assert esquema.anexar_lancamentos(direto.iloc[:0], direto) is direto
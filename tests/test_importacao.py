@@ -0,0 +1,230 @@
+"""
+Importação de extratos: valores e datas em texto, CSV e OFX em blocos e os padrões do catálogo.
+"""
+import csv
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import armazenamento
+import benchmark
+import esquema
+import importacao
+from conftest import HOJE
+
+CATEGORIA = 'Contas'
+METODO = 'Débito'
+
+
+@pytest.mark.parametrize('texto, valor', [
+    ('1.234,56', 1234.56),
+    ('1.234', 1234.0),
+    ('1.234.567,89', 1234567.89),
+    ('-1.000', -1000.0),
+    ('12,5', 12.5),
+    ('R$ 10,00', 10.0),
+    ('-35.50', -35.5),
+    ('1,234.56', 1234.56),
+    ('100', 100.0),
+    ('0.5', 0.5),
+])
+def test_para_valores(texto, valor):
+    assert importacao._para_valores(pd.Series([texto], dtype=object)).tolist() == [valor]
+
+
+def test_para_valores_invalidos_e_numericos():
+    assert importacao._para_valores(pd.Series(['abc', None, ''], dtype=object)).isna().all()
+    assert importacao._para_valores(pd.Series([1, -2])).tolist() == [1.0, -2.0]
+
+
+@pytest.mark.parametrize('textos', [
+    ['05/01/2026', '31/12/2025'],
+    ['2026-01-05', '2025-12-31'],
+    ['20260105120000[-3:BRT]', '20251231'],
+])
+def test_para_datas(textos):
+    datas = importacao._para_datas(pd.Series(textos)).dt.normalize().tolist()
+    assert datas == [pd.Timestamp('2026-01-05'), pd.Timestamp('2025-12-31')]
+
+
+@pytest.fixture
+def extrato():
+    """Lançamentos sintéticos, com valores redondos acima de mil (escritos sem centavos)"""
+    df = benchmark.gerar_lancamentos(700, semente=21, hoje=HOJE)
+    df.loc[df.index[::10], 'Valor'] = np.arange(len(df.index[::10])) * 1_000 + 1_234.0
+    return df
+
+
+@pytest.fixture
+def livro(tmp_path, grade):
+    arquivo_db = str(tmp_path / 'planilha_financeira.db')
+    armazenamento.ArmazenamentoSQLite(arquivo_db).importar(benchmark.gerar_lancamentos(0), grade)
+    return armazenamento.LivroCaixa(armazenamento.ArmazenamentoSQLite(arquivo_db))
+
+
+def _brasileiro(valor):
+    """'1.234,56'; valores redondos sem centavos ('1.234')"""
+    texto = f"{abs(valor):,.0f}" if valor == int(valor) else f"{abs(valor):,.2f}"
+    texto = texto.replace(',', '_').replace('.', ',').replace('_', '.')
+    return ('-' if valor < 0 else '') + texto
+
+
+def _csv_brasileiro(df):
+    """Extrato de banco brasileiro: ';', cp1252, datas dd/mm/aaaa e sinal no valor"""
+    linhas = ['Data;Histórico;Valor (R$)']
+    for data, descricao, tipo, valor in df[['Data', 'Descrição', 'Tipo', 'Valor']].itertuples(index=False, name=None):
+        assinado = -valor if tipo == 'Despesa' else valor
+        linhas.append(f"{data:%d/%m/%Y};{descricao};{_brasileiro(assinado)}")
+    return ('\n'.join(linhas) + '\n').encode('cp1252')
+
+
+def _csv_ingles(df):
+    """Extrato em inglês: ',', utf-8, datas ISO, Tipo em coluna própria e milhares com vírgula"""
+    saida = io.StringIO()
+    escritor = csv.writer(saida)
+    escritor.writerow(['date', 'description', 'amount', 'type', 'method'])
+    for data, descricao, tipo, valor, metodo in df[['Data', 'Descrição', 'Tipo', 'Valor', 'Método']].itertuples(index=False, name=None):
+        escritor.writerow([f"{data:%Y-%m-%d}", descricao, f"{valor:,.2f}", 'credit' if tipo == 'Receita' else 'debit', metodo])
+    return saida.getvalue().encode('utf-8')
+
+
+def _esperado(df, metodo=METODO, categoria=CATEGORIA):
+    esperado = pd.DataFrame({
+        'Data': df['Data'].dt.normalize(),
+        'Descrição': df['Descrição'],
+        'Categoria': categoria,
+        'Tipo': df['Tipo'],
+        'Valor': df['Valor'],
+        'Método': metodo,
+        'Status': 'Realizado',
+    })
+    return _em_ordem(esperado)
+
+
+def _em_ordem(df):
+    return df.sort_values(['Data', 'Descrição', 'Valor'], kind='stable').reset_index(drop=True)
+
+
+@pytest.mark.parametrize('formato', ['brasileiro', 'ingles'])
+def test_importar_csv_igual_ao_extrato(extrato, livro, configuracoes, formato):
+    conteudo = _csv_brasileiro(extrato) if formato == 'brasileiro' else _csv_ingles(extrato)
+    # Linhas descartadas: data inválida e valor zero
+    conteudo += ('31/02/2026;Inválida;10,00\n05/01/2026;Zerada;0,00\n' if formato == 'brasileiro'
+                 else '2026-02-31,Invalid,10.00,debit,Pix\n2026-01-05,Zero,0.00,debit,Pix\n').encode('cp1252')
+    chamadas = []
+
+    resultado = importacao.importar_extrato(
+        io.BytesIO(conteudo), formato='csv', categoria_padrao=CATEGORIA, metodo_padrao=METODO,
+        tamanho_bloco=64, progresso=lambda importados, fracao: chamadas.append((importados, fracao)),
+        livro=livro, configuracoes=configuracoes
+    )
+
+    assert resultado == {
+        'importados': len(extrato), 'descartados': 2, 'fora_do_catalogo': 0, 'blocos': -(-(len(extrato) + 2) // 64)
+    }
+    assert chamadas[-1] == (len(extrato), 1.0)
+    assert [fracao for _, fracao in chamadas] == sorted(fracao for _, fracao in chamadas)
+
+    importados = _em_ordem(esquema.destipar_lancamentos(livro.lancamentos()))
+    esperado = _esperado(extrato, metodo=METODO if formato == 'brasileiro' else extrato['Método'])
+    pd.testing.assert_frame_equal(importados, esperado, check_dtype=False, check_categorical=False)
+
+
+def _ofx(df, xml=False):
+    """Extrato OFX 1.x (SGML, campos sem fechamento) ou 2.x (XML)"""
+    partes = ['OFXHEADER:100\nENCODING:USASCII\nCHARSET:1252\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>']
+    for i, (data, descricao, tipo, valor) in enumerate(df[['Data', 'Descrição', 'Tipo', 'Valor']].itertuples(index=False, name=None)):
+        valor = -valor if tipo == 'Despesa' else valor
+        campos = {
+            'TRNTYPE': 'CREDIT' if valor > 0 else 'DEBIT',
+            'DTPOSTED': f"{data:%Y%m%d%H%M%S}[-3:BRT]",
+            'TRNAMT': f"{valor:.2f}",
+            # Algumas transações só com NAME
+            'NAME' if i % 7 == 0 else 'MEMO': descricao,
+        }
+        fim = (lambda nome: f"</{nome}>") if xml else (lambda nome: '')
+        partes.append('<STMTTRN>\n' + ''.join(f"<{nome}>{texto}{fim(nome)}\n" for nome, texto in campos.items()) + '</STMTTRN>')
+    partes.append('</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n')
+    return '\n'.join(partes).encode('cp1252')
+
+
+@pytest.mark.parametrize('xml', [False, True])
+def test_ler_ofx_em_blocos_pedacos_pequenos(extrato, xml):
+    conteudo = _ofx(extrato, xml)
+    # Pedaços menores que uma transação: as tags ficam cortadas entre leituras
+    blocos = list(importacao.ler_ofx_em_blocos(io.BytesIO(conteudo), tamanho_bloco=50, tamanho_leitura=37))
+    assert [len(bloco) for bloco, _ in blocos[:-1]] == [50] * (len(blocos) - 1)
+    lidos = [lidos for _, lidos in blocos]
+    assert lidos == sorted(lidos) and lidos[-1] <= len(conteudo)
+
+    lido = pd.concat([bloco for bloco, _ in blocos], ignore_index=True)
+    assert lido['MEMO'].tolist() == extrato['Descrição'].tolist()
+    assert importacao._para_valores(lido['TRNAMT']).abs().tolist() == extrato['Valor'].tolist()
+    assert importacao._para_datas(lido['DTPOSTED']).tolist() == extrato['Data'].dt.normalize().tolist()
+
+
+def test_importar_ofx_igual_ao_extrato(extrato, livro, configuracoes):
+    resultado = importacao.importar_extrato(
+        io.BytesIO(_ofx(extrato)), formato='ofx', categoria_padrao=CATEGORIA, metodo_padrao=METODO,
+        tamanho_bloco=100, livro=livro, configuracoes=configuracoes
+    )
+    assert resultado['importados'] == len(extrato) and resultado['descartados'] == 0
+    importados = _em_ordem(esquema.destipar_lancamentos(livro.lancamentos()))
+    pd.testing.assert_frame_equal(importados, _esperado(extrato), check_dtype=False, check_categorical=False)
+
+
+def test_categorias_e_metodos_fora_do_catalogo_viram_os_padroes(extrato, livro, configuracoes):
+    df = extrato.iloc[:200].copy()
+    # Rótulos do próprio banco: um fora do catálogo e um cadastrado com outra grafia
+    categorias = np.where(np.arange(len(df)) % 4 == 0, 'Tarifas Bancárias', 'lazer')
+    metodos = np.where(np.arange(len(df)) % 5 == 0, 'Cheque', df['Método'].str.upper())
+    saida = io.StringIO()
+    escritor = csv.writer(saida)
+    escritor.writerow(['date', 'description', 'amount', 'category', 'method'])
+    for (data, descricao, tipo, valor), categoria, metodo in zip(
+            df[['Data', 'Descrição', 'Tipo', 'Valor']].itertuples(index=False, name=None), categorias, metodos):
+        escritor.writerow([f"{data:%Y-%m-%d}", descricao, -valor if tipo == 'Despesa' else valor, categoria, metodo])
+
+    resultado = importacao.importar_extrato(
+        io.BytesIO(saida.getvalue().encode('utf-8')), formato='csv', categoria_padrao=CATEGORIA,
+        metodo_padrao=METODO, tamanho_bloco=64, livro=livro, configuracoes=configuracoes
+    )
+
+    desconhecidos = (categorias == 'Tarifas Bancárias') | (metodos == 'Cheque')
+    assert resultado['importados'] == len(df)
+    assert resultado['fora_do_catalogo'] == int(desconhecidos.sum())
+
+    esperado = _esperado(
+        df, metodo=np.where(metodos == 'Cheque', METODO, df['Método']),
+        categoria=np.where(categorias == 'lazer', 'Lazer', CATEGORIA)
+    )
+    importados = _em_ordem(esquema.destipar_lancamentos(livro.lancamentos()))
+    assert set(importados['Categoria']) <= set(configuracoes['todas_categorias'])
+    assert set(importados['Método']) <= set(configuracoes['metodos'])
+    pd.testing.assert_frame_equal(importados, esperado, check_dtype=False, check_categorical=False)
+
+
+@pytest.mark.parametrize('categoria, metodo, mensagem', [
+    ('Outros', METODO, "Categoria padrão 'Outros'"),
+    (CATEGORIA, 'Cheque', "Método padrão 'Cheque'"),
+])
+def test_padroes_fora_do_catalogo_sao_recusados(extrato, livro, configuracoes, categoria, metodo, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        importacao.importar_extrato(
+            io.BytesIO(_csv_brasileiro(extrato)), formato='csv', categoria_padrao=categoria,
+            metodo_padrao=metodo, livro=livro, configuracoes=configuracoes
+        )
+    assert livro.lancamentos().empty
+
+
+def test_mapear_colunas(extrato):
+    colunas = ['Data Lançamento', 'HISTÓRICO', 'Quantia', 'Natureza']
+    assert importacao.mapear_colunas(colunas) == {
+        'Data': 'Data Lançamento', 'Descrição': 'HISTÓRICO', 'Categoria': None,
+        'Tipo': 'Natureza', 'Valor': 'Quantia', 'Método': None,
+    }
+    assert importacao.mapear_colunas(['Quando', 'Quanto'], {'Data': 'Quando', 'Valor': 'Quanto'})['Valor'] == 'Quanto'
+    with pytest.raises(ValueError, match="Coluna 'Outra'"):
+        importacao.mapear_colunas(colunas, {'Valor': 'Outra'})
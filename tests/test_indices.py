@@ -0,0 +1,300 @@
+"""
+Índices de indices.py comparados com o mesmo cálculo feito diretamente em pandas.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import agregacoes
+from esquema import em_reais
+from indices import AgregadosResumo, ConsultaLancamentos, IndiceDatas, RollupDiario
+
+TIPOS = ['Receita', 'Despesa']
+
+
+def _intervalos(df, quantidade=60, semente=0):
+    """Pares (inicio, fim) aleatórios sobre o período dos lançamentos, com limites abertos"""
+    rng = np.random.default_rng(semente)
+    primeiro = df['Data'].min().normalize() - pd.Timedelta(days=3)
+    dias = (df['Data'].max().normalize() - primeiro).days + 6
+    intervalos = [(None, None), (None, primeiro), (primeiro + pd.Timedelta(days=dias), None)]
+    for _ in range(quantidade):
+        inicio, fim = sorted(primeiro + pd.to_timedelta(rng.integers(0, dias, 2), unit='D'))
+        intervalos.append((inicio, fim))
+        intervalos.append((None, fim))
+        intervalos.append((inicio, None))
+    # Intervalo invertido: vazio
+    intervalos.append((primeiro + pd.Timedelta(days=10), primeiro))
+    return intervalos
+
+
+def _no_intervalo(df, inicio, fim):
+    dias = df['Data'].dt.normalize()
+    mascara = pd.Series(True, index=df.index)
+    if inicio is not None:
+        mascara &= dias >= inicio
+    if fim is not None:
+        mascara &= dias <= fim
+    return df[mascara]
+
+
+def _total_direto(df, tipo, inicio=None, fim=None):
+    selecionados = _no_intervalo(df, inicio, fim)
+    return em_reais(int(selecionados.loc[selecionados['Tipo'] == tipo, 'Valor'].sum()))
+
+
+def _proximo_direto(df, tipo, inicio):
+    dias = df.loc[(df['Tipo'] == tipo) & (df['Data'].dt.normalize() >= inicio), 'Data'].dt.normalize()
+    if dias.empty:
+        return None
+    dia = dias.min()
+    return dia, _total_direto(df, tipo, dia, dia)
+
+
+def _conferir_rollup(rollup, df):
+    for inicio, fim in _intervalos(df):
+        totais = rollup.totais(inicio, fim)
+        for tipo in TIPOS:
+            assert totais.get(tipo, 0.0) == _total_direto(df, tipo, inicio, fim), (tipo, inicio, fim)
+            assert rollup.total(tipo, inicio, fim) == _total_direto(df, tipo, inicio, fim)
+        if inicio is not None:
+            for tipo in TIPOS:
+                assert rollup.proximo_dia(tipo, inicio) == _proximo_direto(df, tipo, inicio), (tipo, inicio)
+
+
+def test_rollup_diario_igual_a_soma_direta(tipados):
+    _conferir_rollup(RollupDiario.de_lancamentos(tipados), tipados)
+
+
+def test_rollup_diario_incremental_igual_ao_montado_de_uma_vez(tipados):
+    metade = len(tipados) // 2
+    rollup = RollupDiario.de_lancamentos(tipados.iloc[:metade])
+    # Inserções fora de ordem: dias novos no meio e no começo das séries
+    for data, tipo, centavos in tipados.iloc[metade:][['Data', 'Tipo', 'Valor']].itertuples(index=False, name=None):
+        rollup.adicionar(data, tipo, centavos)
+    _conferir_rollup(rollup, tipados)
+
+
+def test_rollup_diario_vazio_e_tipo_desconhecido(tipados):
+    rollup = RollupDiario.de_lancamentos(tipados.iloc[:0])
+    assert rollup.totais() == {}
+    assert rollup.total('Receita') == 0.0
+    assert rollup.proximo_dia('Despesa', '2026-01-01') is None
+
+    rollup.adicionar(pd.Timestamp('2026-01-10 15:30'), 'Receita', 12_345)
+    rollup.adicionar(None, 'Receita', 1)
+    rollup.adicionar(pd.Timestamp('2026-01-10'), None, 1)
+    assert rollup.totais() == {'Receita': 123.45}
+    assert rollup.proximo_dia('Receita', '2026-01-10') == (pd.Timestamp('2026-01-10'), 123.45)
+    assert rollup.proximo_dia('Receita', '2026-01-11') is None
+
+
+@pytest.mark.parametrize('quantidade', [1, 40])
+def test_rollup_diario_mesmo_dia_acumula(quantidade):
+    rollup = RollupDiario()
+    for i in range(quantidade):
+        rollup.adicionar(pd.Timestamp('2026-03-01') + pd.Timedelta(minutes=i), 'Despesa', 100)
+    assert rollup.total('Despesa', '2026-03-01', '2026-03-01') == em_reais(100 * quantidade)
+    assert rollup.total('Despesa', '2026-03-02') == 0.0
+
+
+@pytest.fixture
+def com_ausentes(tipados):
+    """Lançamentos tipados com algumas Categorias e Métodos vazios (código -1)"""
+    df = tipados.copy()
+    df.loc[df.index[::97], 'Categoria'] = None
+    df.loc[df.index[5::113], 'Método'] = None
+    return df
+
+
+def _filtrar_direto(df, inicio=None, fim=None, **filtros):
+    selecionados = _no_intervalo(df, inicio, fim)
+    for col, valores in filtros.items():
+        selecionados = selecionados[selecionados[col].isin(valores)]
+    return selecionados
+
+
+def _filtros(df, semente=0):
+    """Combinações de filtros: poucos valores (OR de bitmaps), muitos (tabela de códigos),
+    todos, nenhum e valores inexistentes"""
+    rng = np.random.default_rng(semente)
+    categorias = list(df['Categoria'].dropna().unique())
+    metodos = list(df['Método'].dropna().unique())
+    combinacoes = [
+        {},
+        {'Tipo': TIPOS},
+        {'Tipo': ['Receita']},
+        {'Tipo': []},
+        {'Categoria': categorias},
+        {'Categoria': ['Inexistente']},
+        {'Categoria': categorias[:1] + ['Inexistente'], 'Método': metodos},
+    ]
+    for _ in range(20):
+        combinacoes.append({
+            'Tipo': list(rng.choice(TIPOS, rng.integers(1, 3), replace=False)),
+            'Categoria': list(rng.choice(categorias, rng.integers(1, len(categorias) + 1), replace=False)),
+            'Método': list(rng.choice(metodos, rng.integers(1, len(metodos) + 1), replace=False)),
+        })
+    return combinacoes
+
+
+def test_consulta_filtrar_igual_a_mascara_direta(com_ausentes):
+    consulta = ConsultaLancamentos(com_ausentes)
+    intervalos = _intervalos(com_ausentes, quantidade=5, semente=1)
+    for filtros in _filtros(com_ausentes):
+        for inicio, fim in intervalos:
+            faixa = consulta.filtrar(inicio, fim, **filtros)
+            esperado = _filtrar_direto(com_ausentes, inicio, fim, **filtros)
+            assert list(consulta.linhas(faixa).index) == list(esperado.index), (filtros, inicio, fim)
+
+            totais = consulta.totais_por_tipo(faixa)
+            for tipo in TIPOS:
+                direto = em_reais(int(esperado.loc[esperado['Tipo'] == tipo, 'Valor'].sum()))
+                assert totais.get(tipo, 0.0) == direto
+
+
+def test_consulta_opcoes_e_exibicao(com_ausentes):
+    consulta = ConsultaLancamentos(com_ausentes)
+    for col in ConsultaLancamentos.COLUNAS_CATEGORICAS:
+        assert consulta.opcoes[col] == list(com_ausentes[col].dropna().unique())
+    assert consulta.data_minima == com_ausentes['Data'].min()
+    assert consulta.data_maxima == com_ausentes['Data'].max()
+    assert (consulta.exibicao['Valor'] == com_ausentes['Valor'] / 100).all()
+
+
+def test_consulta_vazia():
+    consulta = ConsultaLancamentos(pd.DataFrame(columns=['Data', 'Tipo', 'Valor']).astype({'Data': 'datetime64[ns]', 'Valor': 'int64'}))
+    faixa = consulta.filtrar('2026-01-01', '2026-12-31', Tipo=['Receita'])
+    assert len(faixa) == 0
+    assert consulta.totais_por_tipo(faixa) == {}
+    assert consulta.data_minima is None
+
+
+def _ordenar_direto(df, coluna=None, decrescente=False):
+    """Ordem esperada da tabela paginada: estável sobre a ordem por Data (empates pela
+    ordem de inserção); sem coluna, a própria ordem de inserção"""
+    if coluna is None:
+        ordenado = df
+    else:
+        ordenado = df.sort_values('Data', kind='stable')
+        if coluna != 'Data':
+            chaves = ordenado[coluna]
+            if isinstance(chaves.dtype, pd.CategoricalDtype):
+                chaves = chaves.astype(object)
+            elif not pd.api.types.is_numeric_dtype(chaves.dtype):
+                chaves = chaves.astype(object).fillna('')
+            ordenado = ordenado.assign(_chave=chaves).sort_values('_chave', kind='stable', na_position='last')
+    return ordenado[::-1] if decrescente else ordenado
+
+
+@pytest.mark.parametrize('coluna', [None, 'Data', 'Descrição', 'Categoria', 'Tipo', 'Valor', 'Método'])
+@pytest.mark.parametrize('decrescente', [False, True])
+def test_consulta_pagina_igual_a_ordenacao_direta(com_ausentes, coluna, decrescente):
+    consulta = ConsultaLancamentos(com_ausentes)
+    inicio = com_ausentes['Data'].min().normalize() + pd.Timedelta(days=100)
+    fim = inicio + pd.Timedelta(days=200)
+    filtros = {'Categoria': list(com_ausentes['Categoria'].dropna().unique())[:6]}
+    for faixa, esperado in [
+        (consulta.filtrar(), com_ausentes),
+        (consulta.filtrar(inicio, fim, **filtros), _filtrar_direto(com_ausentes, inicio, fim, **filtros)),
+    ]:
+        ordenado = _ordenar_direto(esperado, coluna, decrescente)
+        tamanho = 37
+        paginas = -(-len(ordenado) // tamanho)
+        for numero in [1, 2, paginas, paginas + 1]:
+            pagina = consulta.pagina(faixa, numero, tamanho, coluna, decrescente)
+            esperada = ordenado.iloc[(numero - 1) * tamanho:numero * tamanho]
+            assert list(pagina.index) == list(esperada.index), (coluna, decrescente, numero)
+        assert len(consulta.ordenar(faixa, coluna, decrescente)) == len(ordenado)
+
+
+def _ultimas_diretas(df, quantidade, ate=None):
+    """Posições dos N mais recentes até o dia ate: ordenação estável por Data, do fim"""
+    validos = df[df['Data'].notna()]
+    if ate is not None:
+        validos = validos[validos['Data'].dt.normalize() <= pd.Timestamp(ate).normalize()]
+    ordenados = validos.sort_values('Data', kind='stable')
+    return list(ordenados.index[::-1][:quantidade])
+
+
+def _conferir_indice(indice, df):
+    for _, ate in _intervalos(df, quantidade=30, semente=2):
+        for quantidade in [1, 5, 50]:
+            assert list(indice.ultimas(quantidade, ate)) == _ultimas_diretas(df, quantidade, ate), (quantidade, ate)
+
+
+def test_indice_datas_igual_a_ordenacao_direta(tipados):
+    _conferir_indice(IndiceDatas.de_lancamentos(tipados), tipados)
+
+
+def test_indice_datas_incremental_igual_ao_montado_de_uma_vez(tipados):
+    df = tipados.copy()
+    # Vários lançamentos no mesmo instante: empates ficam na ordem de inserção
+    df.loc[df.index[::50], 'Data'] = pd.Timestamp('2025-06-01 12:00')
+    df.loc[df.index[7::300], 'Data'] = pd.NaT
+    metade = len(df) // 3
+    indice = IndiceDatas.de_lancamentos(df.iloc[:metade])
+    for posicao in range(metade, len(df)):
+        indice.adicionar(df['Data'].iloc[posicao], posicao)
+    _conferir_indice(indice, df)
+    assert list(IndiceDatas.de_lancamentos(df).ultimas(len(df))) == list(indice.ultimas(len(df)))
+    assert indice.n == df['Data'].notna().sum()
+
+
+def test_indice_datas_vazio():
+    indice = IndiceDatas.de_lancamentos(pd.DataFrame())
+    assert len(indice.ultimas(5)) == 0
+    indice.adicionar(pd.Timestamp('2026-01-10'), 0)
+    assert list(indice.ultimas(5, '2026-01-10')) == [0]
+    assert list(indice.ultimas(5, '2026-01-09')) == []
+
+
+def _resumo_direto(df):
+    """Totais da aba Resumo calculados diretamente sobre o DataFrame"""
+    def por(linhas, coluna):
+        somas = linhas.groupby(linhas[coluna].astype(object))['Valor'].sum()
+        return em_reais(somas.astype('int64'))
+
+    despesas = df[df['Tipo'] == 'Despesa']
+    receitas = df[df['Tipo'] == 'Receita']
+    return {
+        'receitas': em_reais(int(receitas['Valor'].sum())),
+        'despesas': em_reais(int(despesas['Valor'].sum())),
+        'despesas_por_categoria': por(despesas, 'Categoria'),
+        'receitas_por_categoria': por(receitas, 'Categoria'),
+        'por_metodo': por(df, 'Método'),
+    }
+
+
+def _conferir_resumo(resumo, df):
+    esperado = _resumo_direto(df)
+    assert resumo['receitas'] == esperado['receitas']
+    assert resumo['despesas'] == esperado['despesas']
+    for chave in ['despesas_por_categoria', 'receitas_por_categoria', 'por_metodo']:
+        serie = resumo[chave]
+        # Em ordem decrescente, como os gráficos esperam
+        assert serie.is_monotonic_decreasing, chave
+        assert serie.sort_index().to_dict() == esperado[chave].sort_index().to_dict(), chave
+
+
+def test_agregados_resumo_igual_a_agrupamento_direto(com_ausentes):
+    resumo = AgregadosResumo.de_lancamentos(com_ausentes).resumo()
+    _conferir_resumo(resumo, com_ausentes)
+    _conferir_resumo(agregacoes.resumo([com_ausentes]), com_ausentes)
+
+
+def test_agregados_resumo_incremental_igual_ao_montado_de_uma_vez(com_ausentes):
+    metade = len(com_ausentes) // 2
+    agregados = AgregadosResumo.de_lancamentos(com_ausentes.iloc[:metade])
+    # resumo() guardado entre inserções precisa ser invalidado a cada lançamento
+    agregados.resumo()
+    colunas = ['Tipo', 'Categoria', 'Método', 'Valor']
+    for tipo, categoria, metodo, centavos in com_ausentes.iloc[metade:][colunas].itertuples(index=False, name=None):
+        agregados.adicionar(tipo, categoria, metodo, centavos)
+    _conferir_resumo(agregados.resumo(), com_ausentes)
+
+
+def test_agregados_resumo_vazio():
+    resumo = AgregadosResumo().resumo()
+    assert resumo['receitas'] == 0.0 and resumo['despesas'] == 0.0
+    assert resumo['por_metodo'].empty and resumo['despesas_por_categoria'].empty
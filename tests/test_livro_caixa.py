@@ -0,0 +1,97 @@
+"""
+LivroCaixa mantido incrementalmente comparado com uma releitura completa do backend.
+"""
+import numpy as np
+import pandas as pd
+
+import armazenamento
+import benchmark
+import esquema
+from conftest import HOJE
+
+INSERCOES = 300
+
+
+def _novos_lancamentos(quantidade, semente=5):
+    """Lançamentos fora de ordem (passado e futuro), com uma Categoria e um Método novos"""
+    rng = np.random.default_rng(semente)
+    categorias = benchmark.NECESSIDADES + benchmark.DESEJOS + ['Presentes']
+    metodos = benchmark.METODOS + ['Vale']
+    dias = rng.integers(-3 * 365, 90, quantidade)
+    segundos = rng.integers(0, 86_400, quantidade)
+    return [
+        armazenamento.novo_lancamento(
+            HOJE + pd.Timedelta(days=int(dia), seconds=int(segundo)),
+            f"Teste {i}",
+            rng.choice(categorias),
+            rng.choice(benchmark.TIPOS),
+            round(float(rng.uniform(0.01, 5_000)), 2),
+            rng.choice(metodos),
+        )
+        for i, (dia, segundo) in enumerate(zip(dias, segundos))
+    ]
+
+
+def _em_ordem(df):
+    """Lançamentos no formato da planilha em ordem canônica (a ordem das linhas depende do backend)"""
+    planilha = esquema.destipar_lancamentos(df)
+    return planilha.sort_values(['Data', 'Descrição', 'Valor'], kind='stable').reset_index(drop=True)
+
+
+def _conferir(livro, relido):
+    pd.testing.assert_frame_equal(_em_ordem(livro.lancamentos()), _em_ordem(relido.lancamentos()))
+
+    inicio = HOJE - pd.Timedelta(days=400)
+    for intervalo in [(None, None), (None, HOJE), (HOJE + pd.Timedelta(days=1), None), (inicio, HOJE)]:
+        assert livro.totais_por_tipo(*intervalo) == relido.totais_por_tipo(*intervalo), intervalo
+        assert livro.consulta().totais_por_tipo(livro.consulta().filtrar(*intervalo)) == \
+            relido.consulta().totais_por_tipo(relido.consulta().filtrar(*intervalo))
+
+    for tipo in benchmark.TIPOS:
+        for dia in [inicio, HOJE, HOJE + pd.Timedelta(days=30)]:
+            assert livro.proximo(tipo, dia) == relido.proximo(tipo, dia)
+
+    for ate in [None, HOJE, inicio]:
+        assert _em_ordem(livro.ultimos(20, ate)).equals(_em_ordem(relido.ultimos(20, ate)))
+
+    resumo, esperado = livro.resumo(), relido.resumo()
+    assert (resumo['receitas'], resumo['despesas']) == (esperado['receitas'], esperado['despesas'])
+    for chave in ['despesas_por_categoria', 'receitas_por_categoria', 'por_metodo']:
+        assert resumo[chave].sort_index().to_dict() == esperado[chave].sort_index().to_dict(), chave
+
+
+def _argumentos(backend):
+    if isinstance(backend, armazenamento.ArmazenamentoSQLite):
+        return (backend.arquivo_db,)
+    return (backend.arquivo_excel,)
+
+
+def test_insercoes_incrementais_iguais_a_releitura(backend, monkeypatch):
+    livro = armazenamento.LivroCaixa(backend)
+    livro.lancamentos()
+
+    # Depois da primeira leitura, tudo precisa ser aplicado em memória, sem reler o backend
+    leituras = []
+    carregar = backend.carregar_lancamentos
+    monkeypatch.setattr(backend, 'carregar_lancamentos', lambda: leituras.append(1) or carregar())
+
+    rng = np.random.default_rng(9)
+    novos = _novos_lancamentos(INSERCOES)
+    inseridos = 0
+    while inseridos < len(novos):
+        grupo = novos[inseridos:inseridos + int(rng.integers(1, 6))]
+        if len(grupo) == 1:
+            livro.adicionar_lancamento(*(grupo[0][col] for col in armazenamento.COLUNAS))
+        else:
+            livro.adicionar_lancamentos(grupo)
+        inseridos += len(grupo)
+        # Leituras no meio das inserções: anexam os pendentes e remontam a consulta
+        if rng.random() < 0.1:
+            livro.ultimos(3)
+            livro.consulta()
+    assert leituras == []
+
+    relido = armazenamento.LivroCaixa(type(backend)(*_argumentos(backend)))
+    _conferir(livro, relido)
+    assert leituras == []
+    assert len(livro.lancamentos()) == 500 + INSERCOES
@@ -0,0 +1,174 @@
+"""
+Consulta indexada de logs.py comparada com uma varredura direta das linhas geradas.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import logs
+
+INICIO = datetime(2026, 1, 15, 8, 0, 0)
+
+
+def _gerar_registros(quantidade, inicio=INICIO, semente=0):
+    """Linhas de log em vários formatos e o (horário, nível) esperado de cada uma"""
+    rng = np.random.default_rng(semente)
+    linhas = []
+    momento = inicio
+    for i in range(quantidade):
+        momento += timedelta(milliseconds=int(rng.integers(0, 3_000)))
+        nivel = ['DEBUG', 'INFO', 'INFO', 'WARNING', 'WARN', 'ERROR', 'CRITICAL'][rng.integers(0, 7)]
+        esperado = logs.SINONIMOS_NIVEIS.get(nivel, nivel)
+        formato = rng.integers(0, 3)
+        if formato == 0:
+            linha = f"{momento:%Y-%m-%d %H:%M:%S},{momento.microsecond // 1000:03d} - bot - {nivel} - mensagem {i}"
+        elif formato == 1:
+            registro = {'ts': momento.isoformat(timespec='milliseconds'), 'nivel': nivel, 'processo': 'bot', 'msg': f"mensagem {i}"}
+            linha = json.dumps(registro)
+        else:
+            # Linhas do supervisor: segundos inteiros e sem nível explícito
+            if momento.microsecond:
+                momento = momento.replace(microsecond=0) + timedelta(seconds=1)
+            linha = f"[{momento:%Y-%m-%d %H:%M:%S}] serviço verificado {i}"
+            esperado = 'INFO'
+        linhas.append((linha, momento.isoformat(timespec='microseconds'), esperado))
+        atual = linhas[-1][1]
+
+        continuacao = rng.integers(0, 8)
+        if continuacao == 0:
+            linhas += [
+                ("Traceback (most recent call last):", atual, 'ERROR'),
+                (f'  File "bot_telegram.py", line {i}, in saldo', atual, 'ERROR'),
+                ("    calcular_saldo()", atual, 'ERROR'),
+                ("ValueError: falha", atual, 'ERROR'),
+            ]
+        elif continuacao == 1:
+            # Continuação indentada herda o nível; sem indentação, é INFO
+            linhas += [(f"    detalhe {i}", atual, esperado), (f"continuação {i}", atual, 'INFO')]
+        elif continuacao == 2:
+            linhas.append((f"⚠️ aviso {i}", atual, 'WARNING'))
+    return linhas
+
+
+def _conteudo(linhas):
+    return ''.join(linha + '\n' for linha, _, _ in linhas).encode('utf-8')
+
+
+def _consultar_direto(linhas, desde=None, ate=None, nivel_minimo=None):
+    desde = desde.isoformat(timespec='microseconds') if desde is not None else None
+    ate = ate.isoformat(timespec='microseconds') if ate is not None else None
+    aceitos = logs.NIVEIS[logs.NIVEIS.index(nivel_minimo):] if nivel_minimo else logs.NIVEIS
+    return [
+        linha for linha, horario, nivel in linhas
+        if (desde is None or (horario is not None and horario >= desde))
+        and (ate is None or horario is None or horario <= ate)
+        and nivel in aceitos
+    ]
+
+
+def _consultas(linhas, quantidade=40, semente=1):
+    rng = np.random.default_rng(semente)
+    horarios = [datetime.fromisoformat(horario) for _, horario, _ in linhas if horario is not None]
+    fim = horarios[-1]
+    consultas = [(None, None, None), (None, None, 'ERROR'), (INICIO - timedelta(days=1), None, None),
+                 (fim + timedelta(seconds=1), None, None), (None, INICIO - timedelta(days=1), None)]
+    for _ in range(quantidade):
+        desde, ate = sorted(horarios[i] for i in rng.integers(0, len(horarios), 2))
+        nivel = [None, *logs.NIVEIS][rng.integers(0, len(logs.NIVEIS) + 1)]
+        consultas += [(desde, ate, nivel), (desde, None, nivel), (None, ate, nivel),
+                      (desde + timedelta(microseconds=500), ate - timedelta(microseconds=500), nivel)]
+    return consultas
+
+
+def _conferir(caminho, linhas):
+    for desde, ate, nivel in _consultas(linhas):
+        assert list(logs.consultar(caminho, desde, ate, nivel)) == _consultar_direto(linhas, desde, ate, nivel), (desde, ate, nivel)
+
+
+@pytest.fixture(autouse=True)
+def blocos_pequenos(monkeypatch):
+    """Blocos de índice pequenos: muitos blocos e registros cortados entre eles"""
+    monkeypatch.setattr(logs, 'TAMANHO_BLOCO_INDICE', 512)
+
+
+def test_consultar_igual_a_varredura(tmp_path):
+    caminho = tmp_path / 'bot_telegram.log'
+    linhas = [("iniciando sem horário", None, 'INFO')] + _gerar_registros(1_500)
+    caminho.write_bytes(_conteudo(linhas))
+    _conferir(caminho, linhas)
+
+    indice = json.loads(logs._caminho_indice(caminho).read_text(encoding='utf-8'))
+    assert indice['indexado_ate'] == caminho.stat().st_size
+    assert len(indice['blocos']) > 100
+
+
+def test_indice_estendido_so_com_o_acrescentado(tmp_path):
+    caminho = tmp_path / 'bot_telegram.log'
+    linhas = _gerar_registros(800)
+    caminho.write_bytes(_conteudo(linhas))
+    logs.atualizar_indice(caminho)
+    anterior = json.loads(logs._caminho_indice(caminho).read_text(encoding='utf-8'))
+
+    novas = _gerar_registros(400, inicio=datetime.fromisoformat(linhas[-1][1]), semente=5)
+    conteudo = _conteudo(novas)
+    # A última linha ainda está sendo escrita: fica de fora até terminar
+    with open(caminho, 'ab') as f:
+        f.write(conteudo[:-10])
+    _conferir(caminho, linhas + novas[:-1])
+    indice = json.loads(logs._caminho_indice(caminho).read_text(encoding='utf-8'))
+    # Blocos já indexados não mudam; o último só ganha os níveis das linhas novas
+    assert indice['blocos'][:len(anterior['blocos']) - 1] == anterior['blocos'][:-1]
+    assert indice['blocos'][len(anterior['blocos']) - 1][:3] == anterior['blocos'][-1][:3]
+    assert indice['indexado_ate'] == caminho.stat().st_size - len(conteudo[:-10].rsplit(b'\n', 1)[1])
+
+    with open(caminho, 'ab') as f:
+        f.write(conteudo[-10:])
+    _conferir(caminho, linhas + novas)
+    assert json.loads(logs._caminho_indice(caminho).read_text(encoding='utf-8'))['indexado_ate'] == caminho.stat().st_size
+
+
+def test_indice_refeito_quando_o_log_e_reescrito(tmp_path):
+    caminho = tmp_path / 'bot_telegram.log'
+    caminho.write_bytes(_conteudo(_gerar_registros(600)))
+    logs.atualizar_indice(caminho)
+
+    # Truncado e reescrito no mesmo arquivo (mesmo inode), maior que antes
+    linhas = _gerar_registros(900, inicio=INICIO + timedelta(days=1), semente=9)
+    with open(caminho, 'r+b') as f:
+        f.truncate(0)
+        f.write(_conteudo(linhas))
+    _conferir(caminho, linhas)
+
+    # Truncado para menos do que já estava indexado
+    linhas = linhas[:50]
+    with open(caminho, 'r+b') as f:
+        f.truncate(0)
+        f.write(_conteudo(linhas))
+    _conferir(caminho, linhas)
+
+
+def test_consultar_copias_rotacionadas(tmp_path):
+    caminho = tmp_path / 'bot_telegram.log'
+    antigas = _gerar_registros(500)
+    caminho.write_bytes(_conteudo(antigas))
+    logs.atualizar_indice(caminho)
+
+    # Rotação: o índice do arquivo atual é de outro arquivo e precisa ser refeito
+    os.replace(caminho, tmp_path / 'bot_telegram.log.1')
+    novas = _gerar_registros(500, inicio=datetime.fromisoformat(antigas[-1][1]), semente=3)
+    caminho.write_bytes(_conteudo(novas))
+
+    arquivos = logs.arquivos_do_log(caminho)
+    assert arquivos == [tmp_path / 'bot_telegram.log.1', caminho]
+    for desde, ate, nivel in _consultas(antigas + novas, quantidade=20):
+        encontradas = [linha for arquivo in arquivos for linha in logs.consultar(arquivo, desde, ate, nivel)]
+        assert encontradas == _consultar_direto(antigas + novas, desde, ate, nivel), (desde, ate, nivel)
+
+
+def test_consultar_log_vazio(tmp_path):
+    caminho = tmp_path / 'bot_telegram.log'
+    caminho.write_bytes(b'')
+    assert list(logs.consultar(caminho, INICIO, None, 'ERROR')) == []
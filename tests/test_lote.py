@@ -0,0 +1,93 @@
+"""
+interpretar_lote do bot comparado com os lançamentos que geraram cada linha do /lote.
+"""
+import unicodedata
+
+import numpy as np
+import pytest
+
+from bot_telegram import interpretar_lote
+
+CONFIG = {
+    'metodos': ['Pix', 'Cartão de Crédito', 'Cartão', 'Débito', 'Vale Refeição'],
+    'todas_categorias': ['Alimentação', 'Renda Fixa', 'Saúde', 'Lazer', 'Crédito Pessoal', 'Salário'],
+}
+
+DESCRICOES = ['Almoço', 'Uber 99', 'Parcela 3 de 10', 'Venda 2 receita', 'Conta de luz', 'Pix 150 amigo', 'Mercado']
+
+# Texto do valor e o valor esperado
+VALORES = [
+    ('35', 35.0), ('35,5', 35.5), ('35.50', 35.5), ('1.234,56', 1234.56), ('1.234', 1234.0),
+    ('R$35', 35.0), ('r$1.234,5', 1234.5), ('0,01', 0.01), ('1234.56', 1234.56),
+]
+
+
+def _sem_acentos(texto):
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+
+
+def _grafia(rng, texto):
+    """O usuário digita sem acentos e com maiúsculas quaisquer"""
+    return [texto, texto.lower(), texto.upper(), _sem_acentos(texto).lower()][rng.integers(0, 4)]
+
+
+def _linhas_aleatorias(quantidade, semente=0):
+    rng = np.random.default_rng(semente)
+    linhas, esperados = [], []
+    for _ in range(quantidade):
+        descricao = DESCRICOES[rng.integers(0, len(DESCRICOES))]
+        texto_valor, valor = VALORES[rng.integers(0, len(VALORES))]
+        tipo = ['Receita', 'Despesa'][rng.integers(0, 2)]
+        metodo = CONFIG['metodos'][rng.integers(0, len(CONFIG['metodos']))]
+        categoria = CONFIG['todas_categorias'][rng.integers(0, len(CONFIG['todas_categorias']))]
+        linhas.append(' '.join([descricao, texto_valor, _grafia(rng, tipo), _grafia(rng, metodo), _grafia(rng, categoria)]))
+        esperados.append({'descricao': descricao, 'valor': valor, 'tipo': tipo, 'metodo': metodo, 'categoria': categoria})
+    return linhas, esperados
+
+
+def test_interpretar_lote_igual_aos_lancamentos_gerados():
+    linhas, esperados = _linhas_aleatorias(500)
+    # Linhas em branco e espaços extras não contam como lançamento
+    texto = '\n'.join(linhas[:250]) + '\n\n   \n' + '\n'.join('  ' + linha + '  ' for linha in linhas[250:])
+    lancamentos, erros = interpretar_lote(texto, CONFIG)
+    assert erros == []
+    assert lancamentos == esperados
+
+
+@pytest.mark.parametrize('linha, esperado', [
+    # Cartão sozinho também é método: a divisão precisa deixar uma categoria válida
+    ('Fatura 500 despesa cartao de credito credito pessoal',
+     {'descricao': 'Fatura', 'valor': 500.0, 'tipo': 'Despesa', 'metodo': 'Cartão de Crédito', 'categoria': 'Crédito Pessoal'}),
+    ('Fatura 500 despesa cartao credito pessoal',
+     {'descricao': 'Fatura', 'valor': 500.0, 'tipo': 'Despesa', 'metodo': 'Cartão', 'categoria': 'Crédito Pessoal'}),
+    # O valor é o último número seguido de um tipo
+    ('Venda 2 receita 50 RECEITA pix lazer',
+     {'descricao': 'Venda 2 receita', 'valor': 50.0, 'tipo': 'Receita', 'metodo': 'Pix', 'categoria': 'Lazer'}),
+])
+def test_interpretar_lote_casos_ambiguos(linha, esperado):
+    assert interpretar_lote(linha, CONFIG) == ([esperado], [])
+
+
+def test_interpretar_lote_erros_por_linha():
+    texto = '\n'.join([
+        'Almoço 35 despesa pix alimentação',
+        'Sem valor despesa pix alimentação',
+        '',
+        'Zerado 0,00 despesa pix alimentação',
+        'Almoço 35 despesa cheque alimentação',
+        'Almoço 35 despesa pix mercado',
+        'Almoço 35 despesa pix',
+        'Almoço 35,999 despesa pix alimentação',
+        '35 despesa pix alimentação',
+    ])
+    lancamentos, erros = interpretar_lote(texto, CONFIG)
+    assert [lancamento['descricao'] for lancamento in lancamentos] == ['Almoço']
+    assert erros == [
+        "Linha 2: use o formato descrição valor tipo método categoria",
+        "Linha 4: o valor deve ser maior que zero",
+        "Linha 5: método desconhecido",
+        "Linha 6: categoria desconhecida",
+        "Linha 7: categoria desconhecida",
+        "Linha 8: use o formato descrição valor tipo método categoria",
+        "Linha 9: use o formato descrição valor tipo método categoria",
+    ]
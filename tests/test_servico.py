@@ -0,0 +1,51 @@
+"""
+Operações aceitas pelo serviço de lançamentos.
+"""
+import threading
+
+import pandas as pd
+import pytest
+
+import armazenamento
+import benchmark
+import servico_lancamentos
+from conftest import HOJE
+
+
+@pytest.fixture
+def servidor(tmp_path, grade, monkeypatch):
+    """Serviço em uma porta livre sobre um banco SQLite temporário"""
+    monkeypatch.chdir(tmp_path)
+    arquivo_db = str(tmp_path / 'planilha_financeira.db')
+    armazenamento.ArmazenamentoSQLite(arquivo_db).importar(benchmark.gerar_lancamentos(50, semente=3, hoje=HOJE), grade)
+    servico = servico_lancamentos.ServicoLancamentos(armazenamento.ArmazenamentoSQLite(arquivo_db))
+    servidor = servico_lancamentos.ServidorLancamentos(('127.0.0.1', 0), servico)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def _endereco(servidor):
+    host, porta = servidor.server_address
+    return f"{host}:{porta}"
+
+
+def test_operacoes_pelo_socket(servidor):
+    cliente = servico_lancamentos.ArmazenamentoServico(_endereco(servidor))
+    assert len(cliente.carregar_lancamentos()) == 50
+    cliente.adicionar_lancamento(HOJE, 'Teste', 'Lazer', 'Despesa', 12.5, 'Pix')
+    assert len(cliente.carregar_lancamentos()) == 51
+    assert not cliente.carregar_grade_configuracoes().empty
+    assert set(cliente.totais_por_tipo(None, HOJE)) <= {'Receita', 'Despesa'}
+    assert isinstance(cliente.carregar_periodo(HOJE - pd.Timedelta(days=30), HOJE), pd.DataFrame)
+
+
+@pytest.mark.parametrize('operacao', ['livro', 'backend', '_da_conta', '_contas', 'executar', '__init__', 'inexistente'])
+def test_atributos_e_auxiliares_recusados(servidor, operacao):
+    with pytest.raises(servico_lancamentos.ErroServico, match='Operação desconhecida'):
+        servidor.servico.executar(operacao, [])
+
+    cliente = servico_lancamentos.ArmazenamentoServico(_endereco(servidor))
+    with pytest.raises(servico_lancamentos.ErroServico, match='Operação desconhecida'):
+        cliente._chamar(operacao)